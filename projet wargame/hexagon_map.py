@@ -1,5 +1,10 @@
+import sys
 import tkinter as tk
-import math
+from pathlib import Path
+
+# Shared hex geometry lives next to the viewers, in the parent folder
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from wargame_hex import HexLayout
 
 # --- Constants ---
 GRID_WIDTH = 10
@@ -11,10 +16,11 @@ HEX_FILL = "white"
 
 # --- Calculated dimensions ---
 # For pointy-top hexagons
-HEX_HEIGHT = 2 * HEX_SIZE
-HEX_WIDTH = math.sqrt(3) * HEX_SIZE
-VERT_SPACING = HEX_HEIGHT * 3/4
-HORIZ_SPACING = HEX_WIDTH
+LAYOUT = HexLayout(HEX_SIZE)
+HEX_HEIGHT = LAYOUT.hex_height
+HEX_WIDTH = LAYOUT.hex_width
+VERT_SPACING = LAYOUT.vert_spacing
+HORIZ_SPACING = LAYOUT.horiz_spacing
 
 # --- Main Application Class ---
 class HexagonGrid(tk.Tk):
@@ -33,31 +39,21 @@ class HexagonGrid(tk.Tk):
 
     def draw_hexagon(self, center_x, center_y, size):
         """Draws a single pointy-top hexagon on the canvas."""
-        points = []
-        for i in range(6):
-            angle_deg = 60 * i + 30  # +30 degrees to make it pointy-top
-            angle_rad = math.pi / 180 * angle_deg
-            px = center_x + size * math.cos(angle_rad)
-            py = center_y + size * math.sin(angle_rad)
-            points.append((px, py))
-        
+        # Corner offsets come from a precomputed table, no trig per hex
+        layout = LAYOUT if size == HEX_SIZE else HexLayout(size)
+        points = layout.polygon(center_x, center_y)
+
         self.canvas.create_polygon(points, outline=HEX_OUTLINE, fill=HEX_FILL, width=2)
 
     def draw_grid(self):
-        """Draws the 10x10 grid of hexagons."""
+        """Draws the GRID_WIDTH x GRID_HEIGHT grid of hexagons."""
         start_x = HEX_WIDTH / 2 + 10
         start_y = HEX_HEIGHT / 2 + 10
+        layout = HexLayout(HEX_SIZE, origin=(start_x, start_y))
 
-        for row in range(GRID_HEIGHT):
-            for col in range(GRID_WIDTH):
-                offset_x = 0
-                if row % 2 != 0:
-                    offset_x = HORIZ_SPACING / 2  # Offset every other row
-
-                center_x = start_x + col * HORIZ_SPACING + offset_x
-                center_y = start_y + row * VERT_SPACING
-
-                self.draw_hexagon(center_x, center_y, HEX_SIZE)
+        # Odd rows are offset by half a hex (handled by the layout)
+        for col, row, center_x, center_y in layout.centers(0, 0, GRID_WIDTH, GRID_HEIGHT):
+            self.draw_hexagon(center_x, center_y, HEX_SIZE)
 
 # --- Run the application ---
 if __name__ == "__main__":
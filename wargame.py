@@ -1,43 +1,92 @@
 import pygame
+import pygame.gfxdraw
 import pygame_gui
+import argparse
 import json
+import math
 import os
+import random
+from collections import OrderedDict
 from pathlib import Path
 
-class WargameMap:
+import wargame_terrain
+from wargame_catalog import MapCatalog
+from wargame_loader import MapLoader, map_cache_key
+from wargame_chunks import ChunkCache, ChunkedWorld
+from wargame_editor import editor_for_map
+from wargame_hex import HexLayout
+from wargame_movement import MovementRanges
+from wargame_profiler import add_profile_arguments, profiler_from_args
+from wargame_units import UNIT_KINDS, UNIT_MOVEMENT, UNIT_SIGHT, UnitLayer
+from wargame_visibility import FOG_EXPLORED, FOG_UNEXPLORED, Visibility
+
+
+# Événement posté par les threads de chargement quand une carte est prête
+MAP_LOADED = pygame.event.custom_type()
+
+
+def surface_bytes(surface):
+    """Taille en mémoire des pixels d'une surface"""
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+class WargameMap(wargame_terrain.WargameMap):
     """Représente une carte de wargame"""
-    def __init__(self, name, width, height, terrain_data):
-        self.name = name
-        self.width = width
-        self.height = height
-        self.terrain_data = terrain_data
+    def __init__(self, name, width, height, terrain_data, grid='square'):
+        super().__init__(name, width, height, terrain_data, grid)
         self.surface = None
 
-    def generate_surface(self, tile_size=50):
-        """Génère la surface visuelle de la carte"""
-        self.surface = pygame.Surface((self.width * tile_size, self.height * tile_size))
-
-        # Couleurs pour différents types de terrain
-        terrain_colors = {
-            'grass': (34, 139, 34),
-            'water': (0, 119, 190),
-            'mountain': (139, 137, 137),
-            'forest': (0, 100, 0),
-            'desert': (237, 201, 175),
-            'plains': (144, 238, 144)
-        }
+    def generate_surface(self, tile_size=50, region=None):
+        """Génère la surface visuelle de la carte, ou d'une région (x0, y0, x1, y1) en tuiles"""
+        x0, y0, x1, y1 = region if region else (0, 0, self.width, self.height)
+        surface = pygame.Surface(((x1 - x0) * tile_size, (y1 - y0) * tile_size))
+
+        # Couleur de chaque identifiant de la palette
+        colors = self.terrain.color_table(
+            wargame_terrain.TERRAIN_COLORS,
+            wargame_terrain.UNKNOWN_TERRAIN_COLOR
+        )
+        width, height = x1 - x0, y1 - y0
+        if width <= 0 or height <= 0:
+            if region is None:
+                self.surface = surface
+            return surface
+
+        # Identifiants de la région, ligne par ligne
+        if x0 == 0 and x1 == self.width:
+            ids = bytes(self.terrain.cells[y0 * self.width:y1 * self.width])
+        else:
+            ids = b''.join(self.terrain.row_ids(y)[x0:x1] for y in range(y0, y1))
+
+        # Agrandissement exact: chaque identifiant répété tile_size fois en
+        # largeur (tile_size affectations par tranche), puis chaque ligne
+        # répétée tile_size fois en hauteur
+        row_pixels = width * tile_size
+        expanded = bytearray(len(ids) * tile_size)
+        for i in range(tile_size):
+            expanded[i::tile_size] = ids
+        pixels = b''.join(
+            expanded[y * row_pixels:(y + 1) * row_pixels] * tile_size
+            for y in range(height)
+        )
 
-        for y in range(self.height):
-            for x in range(self.width):
-                terrain_type = self.terrain_data[y][x]
-                color = terrain_colors.get(terrain_type, (255, 255, 255))
+        # Image 8 bits dont la palette donne directement la couleur de chaque terrain
+        tiles = pygame.image.frombuffer(pixels, surface.get_size(), 'P')
+        tiles.set_palette(colors + [(0, 0, 0)] * (256 - len(colors)))
+        surface.blit(tiles, (0, 0))
 
-                pygame.draw.rect(self.surface, color,
-                               (x * tile_size, y * tile_size, tile_size, tile_size))
-                pygame.draw.rect(self.surface, (0, 0, 0),
-                               (x * tile_size, y * tile_size, tile_size, tile_size), 1)
+        # Bordure de 1 pixel de chaque tuile, tracée ligne par ligne
+        surface_width, surface_height = surface.get_size()
+        for x in range(width):
+            surface.fill((0, 0, 0), (x * tile_size, 0, 1, surface_height))
+            surface.fill((0, 0, 0), (x * tile_size + tile_size - 1, 0, 1, surface_height))
+        for y in range(height):
+            surface.fill((0, 0, 0), (0, y * tile_size, surface_width, 1))
+            surface.fill((0, 0, 0), (0, y * tile_size + tile_size - 1, surface_width, 1))
 
-        return self.surface
+        if region is None:
+            self.surface = surface
+        return surface
 
 
 class WargameViewer:
@@ -65,10 +114,81 @@ class WargameViewer:
         self.min_zoom = 0.3
         self.max_zoom = 3.0
 
-        # Carte actuelle
+        # Carte actuelle, découpée en blocs rendus à la demande
         self.current_map = None
-        self.map_surface = None
-        self.scaled_surface = None
+        self.world = None
+        self.tile_size = 50
+        self.chunk_size = 16  # En tuiles
+        self.chunk_budget_mb = 256  # Budget du cache des blocs rendus
+        self.pan_direction = (0, 0)
+
+        # Vues zoomées: seule la zone autour de l'écran est mise à l'échelle.
+        # Petit cache indexé par niveau de zoom quantifié
+        self.view_margin = 200  # Marge autour de l'écran (pixels)
+        self.zoom_quantum = 0.001
+        self.view_budget_mb = 64
+        self.views = ChunkCache(
+            self.view_budget_mb * 1024 * 1024,
+            lambda view: surface_bytes(view[0])
+        )
+
+        # Cartes hexagonales: un sprite par terrain et par taille d'hexagone
+        # (taille quantifiée au demi-pixel), composés par un seul Surface.blits
+        self.hex_size_quantum = 0.5
+        self.hex_sprite_sets = OrderedDict()
+        self.max_hex_sprite_sets = 8
+
+        # Zone de déplacement affichée (clic droit sur une tuile), dessinée
+        # par-dessus la carte sans la redessiner
+        self.ranges = None
+        self.range_field = None
+        self.movement_points = 8
+        self.movement_profile = 'infantry'
+        self.range_color = (255, 255, 0, 90)
+        self.range_overlay = None  # (clé, surface, gauche, haut)
+        self.hex_highlights = {}  # Taille d'hexagone -> sprite de surbrillance
+
+        # Brouillard de guerre (touche F): en mode brouillard, le clic droit
+        # place ou retire un observateur. Le masque est posé en un seul blit
+        self.visibility = None
+        self.fog_enabled = False
+        self.fog_side = 0
+        self.sight_radius = 6
+        self.next_observer_id = 0
+        self.fog_alpha = {FOG_UNEXPLORED: 230, FOG_EXPLORED: 130}
+        self.fog_alpha_table = bytes(self.fog_alpha.get(state, 0) for state in range(256))
+        self.fog_overlay = None  # (clé, plage de tuiles, surface, gauche, haut)
+        self.hex_fog_sprites = {}  # Taille d'hexagone -> sprite par état de brouillard
+
+        # Tuile survolée: contour dessiné par-dessus la carte et lecture en bas de l'écran
+        self.hover_tile = None
+        self.hover_color = (255, 255, 255)
+        self.selection_color = (255, 200, 0)
+        self.status_text = ""
+
+        # Unités (touche U: déploiement de démonstration, touche M: manœuvres).
+        # Elles sont dessinées sur un calque transparent dont seules les tuiles
+        # des unités déplacées sont redessinées: le rendu du terrain n'est pas touché
+        self.units = None
+        self.demo_units = 1000
+        self.manoeuvres = False
+        self.moves_per_frame = 20
+        self.unit_colors = [(200, 30, 30), (30, 60, 200)]  # Par camp
+        self.unit_sprites = {}  # (camp, type, diamètre) -> sprite
+        self.unit_overlay = None  # (clé, plage de tuiles, surface, gauche, haut)
+        self.dirty_unit_tiles = set()
+
+        # Édition du terrain (touche E): le clic gauche peint, le clic molette
+        # déplace la carte. Les tuiles peintes sont redessinées en place dans
+        # les blocs et les vues en cache, sans régénérer la carte
+        self.edit_mode = False
+        self.editor = None
+        self.editors = {}  # Fichier de la carte -> éditeur, gardé d'une carte à l'autre
+        self.painting = False
+
+        # Chargement des cartes en arrière-plan (résultat reçu sous forme d'événement)
+        self.loader = MapLoader(self.prepare_map, self.on_map_prepared)
+        self.loading_map = None
 
         # Liste des maps disponibles
         self.available_maps = self.load_available_maps()
@@ -80,20 +200,35 @@ class WargameViewer:
         self.clock = pygame.time.Clock()
         self.running = True
 
+        # Rendu piloté par les événements: l'écran n'est recomposé que si l'état
+        # change (pan, zoom, interface, animation), un survol ou un déplacement
+        # d'unité n'envoie à l'affichage que les rectangles touchés, et au repos
+        # la boucle dort jusqu'au prochain événement. `continuous_rendering`
+        # rétablit le rendu de chaque image (mesures de performance)
+        self.continuous_rendering = False
+        self.frame_rate = 60
+        self.idle_timeout_ms = 250  # Réveil au repos (préchargement, chargement en cours)
+        self.needs_redraw = True
+        self.dirty_rects = []
+        self.ui_hovered = False
+
+        # Profilage (--profile): None tant qu'il n'est pas demandé
+        self.profiler = None
+        self.profile_font = None
+
     def load_available_maps(self):
         """Charge la liste des maps disponibles"""
         maps_dir = Path("maps")
         maps_dir.mkdir(exist_ok=True)
 
-        available_maps = []
-        for map_file in maps_dir.glob("*.json"):
-            available_maps.append(map_file.stem)
+        # Catalogue indexé: seules les cartes modifiées depuis le dernier lancement sont relues
+        self.catalog = MapCatalog(maps_dir)
+        available_maps = self.catalog.refresh()
 
         # Si aucune map n'existe, créer des maps par défaut
         if not available_maps:
             self.create_default_maps()
-            for map_file in maps_dir.glob("*.json"):
-                available_maps.append(map_file.stem)
+            available_maps = self.catalog.refresh()
 
         return available_maps if available_maps else ["Aucune map disponible"]
 
@@ -166,99 +301,984 @@ class WargameViewer:
 
     def create_ui(self):
         """Crée l'interface utilisateur"""
+        # Libellés du catalogue (nom et dimensions) -> nom de fichier de la carte
+        labels = self.catalog.labels(self.available_maps)
+        self.map_labels = dict(zip(labels, self.available_maps))
+
         # Menu déroulant pour sélectionner la map
         self.map_dropdown = pygame_gui.elements.UIDropDownMenu(
-            options_list=self.available_maps,
-            starting_option=self.available_maps[0] if self.available_maps else "Aucune map",
+            options_list=labels,
+            starting_option=labels[0] if labels else "Aucune map",
             relative_rect=pygame.Rect((10, 10), (250, 40)),
             manager=self.manager
         )
 
+        # Miniature de la carte sélectionnée (issue du catalogue)
+        self.preview_image = None
+        if self.available_maps and self.available_maps[0] != "Aucune map disponible":
+            self.show_preview(self.available_maps[0])
+
         # Texte d'instructions
-        instructions_text = (
+        self.instructions_label = pygame_gui.elements.UILabel(
+            relative_rect=pygame.Rect((10, 60), (800, 30)),
+            text=self.instructions_text(),
+            manager=self.manager
+        )
+
+        # Coordonnées et terrain de la tuile survolée
+        self.status_label = pygame_gui.elements.UILabel(
+            relative_rect=pygame.Rect((10, self.screen_height - 40), (600, 30)),
+            text="",
+            manager=self.manager
+        )
+
+    def instructions_text(self):
+        """Aide affichée sous le menu: commandes du mode courant et zoom"""
+        if self.edit_mode:
+            editor = self.editor
+            return (
+                f"Édition: clic gauche: Peindre ({editor.brush_terrain}, rayon {editor.brush_radius}) | "
+                "1-6: Terrain | [ ]: Pinceau | Ctrl+Z/Y: Annuler/Rétablir | "
+                "Ctrl+S: Enregistrer | Clic molette: Déplacer"
+            )
+        return (
             "Clic gauche + glisser: Déplacer la carte | "
             "Molette: Zoom/Dézoom | "
+            "Clic droit: Portée | "
+            "E: Édition | "
             f"Zoom: {self.zoom_level:.2f}x"
         )
 
-        self.instructions_label = pygame_gui.elements.UILabel(
-            relative_rect=pygame.Rect((10, 60), (800, 30)),
-            text=instructions_text,
+    def show_preview(self, map_name):
+        """Affiche la miniature d'une carte en haut à droite de l'écran"""
+        if self.preview_image is not None:
+            self.preview_image.kill()
+            self.preview_image = None
+
+        thumbnail = self.catalog.thumbnail_path(map_name)
+        if thumbnail is None:
+            return
+        image = pygame.image.load(str(thumbnail))
+        self.preview_image = pygame_gui.elements.UIImage(
+            relative_rect=pygame.Rect(
+                (self.screen_width - image.get_width() - 10, 10),
+                image.get_size()
+            ),
+            image_surface=image,
             manager=self.manager
         )
 
+    def prepare_map(self, map_name):
+        """Lit une map et rend les blocs visibles à l'ouverture (exécuté hors du thread principal)"""
+        map_path = wargame_terrain.find_map_file("maps", map_name)
+        if map_path is None:
+            raise FileNotFoundError(f"La map {map_name} n'existe pas")
+
+        wargame_map = wargame_terrain.load_map_file(map_path, WargameMap)
+        if wargame_map.grid == 'hex':
+            # Les cartes hexagonales sont composées à partir de sprites, sans blocs
+            return wargame_map, None
+
+        world = self.create_world(wargame_map)
+
+        # Blocs visibles une fois la carte centrée
+        scaled_tile_size = self.tile_size * self.zoom_level
+        half_width = self.screen_width / scaled_tile_size / 2 + 1
+        half_height = self.screen_height / scaled_tile_size / 2 + 1
+        visible = world.visible_chunks(
+            math.floor(wargame_map.width / 2 - half_width),
+            math.floor(wargame_map.height / 2 - half_height),
+            math.ceil(wargame_map.width / 2 + half_width),
+            math.ceil(wargame_map.height / 2 + half_height)
+        )
+        for cx, cy in visible:
+            world.get_chunk(cx, cy)
+
+        return wargame_map, world
+
+    def create_world(self, wargame_map):
+        """Découpe une carte en blocs, rendus seulement quand ils deviennent visibles"""
+        def render_chunk(x0, y0, x1, y1):
+            return wargame_map.generate_surface(self.tile_size, (x0, y0, x1, y1))
+
+        return ChunkedWorld(
+            wargame_map.width,
+            wargame_map.height,
+            render_chunk,
+            surface_bytes,
+            chunk_size=self.chunk_size,
+            budget_bytes=self.chunk_budget_mb * 1024 * 1024
+        )
+
     def load_map(self, map_name):
-        """Charge une map depuis un fichier JSON"""
-        map_path = Path("maps") / f"{map_name}.json"
+        """Charge une map immédiatement, dans le thread courant"""
+        try:
+            self.show_map(*self.prepare_map(map_name))
+        except FileNotFoundError as e:
+            print(e)
+        except Exception as e:
+            print(f"Erreur lors du chargement de la map: {e}")
+
+    def request_map(self, map_name):
+        """Charge une map en arrière-plan; remplace toute demande en cours"""
+        self.loading_map = map_name
+        self.loader.request(map_cache_key(map_name), map_name)
+
+        # Précharger les cartes voisines dans le menu déroulant
+        if map_name in self.available_maps:
+            index = self.available_maps.index(map_name)
+            neighbours = self.available_maps[max(index - 1, 0):index + 2]
+            self.loader.prefetch(
+                (map_cache_key(name), name) for name in neighbours if name != map_name
+            )
+
+    def on_map_prepared(self, map_name, result, error):
+        """Appelé depuis un thread de travail: poste le résultat dans la file d'événements"""
+        pygame.event.post(pygame.event.Event(
+            MAP_LOADED, map_name=map_name, result=result, error=error
+        ))
 
-        if not map_path.exists():
-            print(f"La map {map_name} n'existe pas")
+    def finish_loading(self, event):
+        """Affiche la carte préparée (thread principal)"""
+        # Ignorer un résultat arrivé après qu'une autre carte a été choisie
+        if event.map_name != self.loading_map:
             return
 
-        try:
-            with open(map_path, "r") as f:
-                map_data = json.load(f)
-
-            self.current_map = WargameMap(
-                name=map_data["name"],
-                width=map_data["width"],
-                height=map_data["height"],
-                terrain_data=map_data["terrain"]
+        self.loading_map = None
+        if isinstance(event.error, FileNotFoundError):
+            print(event.error)
+        elif event.error is not None:
+            print(f"Erreur lors du chargement de la map: {event.error}")
+        else:
+            self.show_map(*event.result)
+
+    def show_map(self, wargame_map, world):
+        """Affiche une map déjà préparée"""
+        previous_editor = self.editor
+        self.editor = editor_for_map(self.editors, wargame_map)
+        if previous_editor is not None and previous_editor is not self.editor \
+                and previous_editor.has_unsaved_changes():
+            print(f"Modifications non enregistrées de la map '{previous_editor.map.name}' "
+                  "gardées en mémoire (Ctrl+S pour les enregistrer)")
+        if self.editor.map is not wargame_map:
+            # Carte relue depuis son fichier: le terrain modifié en mémoire prime
+            wargame_map = self.editor.map
+            world = None if wargame_map.grid == 'hex' else self.create_world(wargame_map)
+        self.current_map = wargame_map
+        self.world = world
+        self.pan_direction = (0, 0)
+        self.views.clear()
+        self.hex_sprite_sets.clear()
+        self.hex_highlights.clear()
+        self.ranges = MovementRanges(wargame_map)
+        self.range_field = None
+        self.range_overlay = None
+        self.visibility = Visibility(wargame_map)
+        self.fog_overlay = None
+        self.hex_fog_sprites.clear()
+        self.hover_tile = None
+        self.units = UnitLayer(wargame_map)
+        self.unit_overlay = None
+        self.dirty_unit_tiles.clear()
+        self.manoeuvres = False
+        self.painting = False
+        if self.edit_mode:
+            self.edit_mode = False
+            self.instructions_label.set_text(self.instructions_text())
+
+        # Centrer la carte
+        map_width, map_height = self.map_pixel_size()
+        self.pan_x = (self.screen_width - map_width * self.zoom_level) // 2
+        self.pan_y = (self.screen_height - map_height * self.zoom_level) // 2
+
+        print(f"Map '{self.current_map.name}' chargée avec succès!")
+
+    def map_pixel_size(self):
+        """Dimensions de la carte en pixels, sans zoom"""
+        if self.current_map.grid == 'hex':
+            return HexLayout(self.tile_size / 2).pixel_size(self.current_map.width, self.current_map.height)
+        return self.current_map.width * self.tile_size, self.current_map.height * self.tile_size
+
+    def hex_layout(self):
+        """Disposition des hexagones à l'écran pour le zoom et le pan actuels"""
+        size = self.tile_size / 2 * self.zoom_level
+        size = max(round(size / self.hex_size_quantum) * self.hex_size_quantum, 1)
+        layout = HexLayout(size)
+        # Le coin supérieur gauche de la carte est en (pan_x, pan_y)
+        layout.origin = (self.pan_x + layout.hex_width / 2, self.pan_y + size)
+        return layout
+
+    def hex_sprites(self, size):
+        """Sprites anticrénelés (un par identifiant de terrain) pour une taille d'hexagone"""
+        sprites = self.hex_sprite_sets.get(size)
+        # Un terrain ajouté par l'édition agrandit la palette: sprites à refaire
+        if sprites is not None and len(sprites) == len(self.current_map.terrain.palette):
+            self.hex_sprite_sets.move_to_end(size)
+            return sprites
+
+        layout = HexLayout(size)
+        sprite_width = math.ceil(layout.hex_width) + 2
+        sprite_height = math.ceil(layout.hex_height) + 2
+        points = layout.polygon(sprite_width / 2, sprite_height / 2)
+        points = list(zip(points[0::2], points[1::2]))
+
+        colors = self.current_map.terrain.color_table(
+            wargame_terrain.TERRAIN_COLORS,
+            wargame_terrain.UNKNOWN_TERRAIN_COLOR
+        )
+        sprites = []
+        for color in colors:
+            sprite = pygame.Surface((sprite_width, sprite_height), pygame.SRCALPHA)
+            pygame.gfxdraw.filled_polygon(sprite, points, color)
+            pygame.gfxdraw.aapolygon(sprite, points, (0, 0, 0))
+            sprites.append(sprite)
+
+        self.hex_sprite_sets[size] = sprites
+        while len(self.hex_sprite_sets) > self.max_hex_sprite_sets:
+            self.hex_sprite_sets.popitem(last=False)
+        return sprites
+
+    def draw_hex_map(self):
+        """Compose les hexagones visibles en un seul appel à Surface.blits"""
+        layout = self.hex_layout()
+        sprites = self.hex_sprites(layout.size)
+        anchor_x = sprites[0].get_width() // 2 if sprites else 0
+        anchor_y = sprites[0].get_height() // 2 if sprites else 0
+        col0, row0, col1, row1 = layout.offset_range(
+            0, 0, self.screen_width, self.screen_height,
+            self.current_map.width, self.current_map.height
+        )
+
+        terrain = self.current_map.terrain
+        batch = []
+        for row in range(row0, row1):
+            xs, y = layout.row_centers(row, col0, col1)
+            top = math.floor(y) - anchor_y
+            ids = terrain.row_ids(row)[col0:col1]
+            batch += [
+                (sprites[terrain_id], (math.floor(x) - anchor_x, top))
+                for terrain_id, x in zip(ids, xs)
+            ]
+        self.screen.blits(batch, doreturn=False)
+
+    def tile_at(self, pos):
+        """Tuile (x, y) sous un point de l'écran, ou None hors de la carte"""
+        if self.current_map.grid == 'hex':
+            x, y = self.hex_layout().pixel_to_offset(*pos)
+        else:
+            scaled_tile_size = self.tile_size * self.quantized_zoom()
+            x = math.floor((pos[0] - round(self.pan_x)) / scaled_tile_size)
+            y = math.floor((pos[1] - round(self.pan_y)) / scaled_tile_size)
+        if 0 <= x < self.current_map.width and 0 <= y < self.current_map.height:
+            return x, y
+        return None
+
+    def update_hover(self, pos):
+        """Met à jour la tuile survolée et la lecture d'état (temps constant)"""
+        tile = self.tile_at(pos) if self.current_map else None
+        if tile == self.hover_tile:
+            return False
+        if not self.needs_redraw:
+            for previous in (self.hover_tile, tile):
+                if previous is not None:
+                    self.dirty_rects.append(self.tile_screen_rect(previous))
+        self.hover_tile = tile
+
+        if tile is None:
+            text = ""
+        else:
+            x, y = tile
+            text = f"Tuile ({x}, {y}): {self.current_map.terrain.get(x, y)}"
+            if self.range_field:
+                cost = self.range_field.cost_at(x, y)
+                if cost is not None:
+                    text += f" | Coût de déplacement: {cost:g}"
+        # Ne reconstruire le texte de l'interface que s'il change
+        if text != self.status_text:
+            self.status_text = text
+            self.status_label.set_text(text)
+            self.dirty_rects.append(self.status_label.rect)
+        return True
+
+    def tile_outline(self, tile):
+        """Contour à l'écran d'une tuile: rectangle, ou points d'un hexagone"""
+        x, y = tile
+        if self.current_map.grid == 'hex':
+            layout = self.hex_layout()
+            points = layout.polygon(*layout.center(x, y))
+            return list(zip(points[0::2], points[1::2]))
+
+        scaled_tile_size = self.tile_size * self.quantized_zoom()
+        left = round(x * scaled_tile_size)
+        top = round(y * scaled_tile_size)
+        return pygame.Rect(
+            round(self.pan_x) + left,
+            round(self.pan_y) + top,
+            round((x + 1) * scaled_tile_size) - left,
+            round((y + 1) * scaled_tile_size) - top
+        )
+
+    def tile_screen_rect(self, tile):
+        """Rectangle de l'écran couvrant une tuile et son contour"""
+        outline = self.tile_outline(tile)
+        if not isinstance(outline, pygame.Rect):
+            xs = [x for x, _ in outline]
+            ys = [y for _, y in outline]
+            left, top = math.floor(min(xs)), math.floor(min(ys))
+            outline = pygame.Rect(left, top, math.ceil(max(xs)) - left, math.ceil(max(ys)) - top)
+        return outline.inflate(4, 4)
+
+    def draw_tile_outline(self, tile, color):
+        """Dessine le contour d'une tuile (survol ou sélection)"""
+        outline = self.tile_outline(tile)
+        if isinstance(outline, pygame.Rect):
+            pygame.draw.rect(self.screen, color, outline, 2)
+        else:
+            pygame.draw.polygon(self.screen, color, outline, 2)
+
+    def select_range(self, tile):
+        """Affiche la zone de déplacement depuis une tuile; la masque si on la resélectionne"""
+        if tile is None or (self.range_field and self.range_field.start == tile):
+            self.range_field = None
+        else:
+            # Sur une unité: ses points de mouvement et son profil de coûts
+            units = self.units.units_at(*tile)
+            if units:
+                kind = self.units.kind(units[-1])
+                self.range_field = self.ranges.field(tile, UNIT_MOVEMENT[kind], kind)
+            else:
+                self.range_field = self.ranges.field(tile, self.movement_points, self.movement_profile)
+        self.hover_tile = None  # La lecture d'état affiche le coût de déplacement
+
+    def range_overlay_surface(self):
+        """Surbrillance de la zone de déplacement (grille carrée), refaite si la zone ou le zoom change"""
+        zoom = self.quantized_zoom()
+        field = self.range_field
+        key = (field, field.version, zoom)
+        if self.range_overlay is not None and self.range_overlay[0] == key:
+            return self.range_overlay
+
+        scaled_tile_size = self.tile_size * zoom
+        x0, y0, x1, y1 = field.bounds()
+        left = round(x0 * scaled_tile_size)
+        top = round(y0 * scaled_tile_size)
+        overlay = pygame.Surface(
+            (round(x1 * scaled_tile_size) - left, round(y1 * scaled_tile_size) - top),
+            pygame.SRCALPHA
+        )
+        for x, y in field.tiles():
+            tile_left = round(x * scaled_tile_size)
+            tile_top = round(y * scaled_tile_size)
+            overlay.fill(self.range_color, (
+                tile_left - left,
+                tile_top - top,
+                round((x + 1) * scaled_tile_size) - tile_left,
+                round((y + 1) * scaled_tile_size) - tile_top
+            ))
+
+        self.range_overlay = (key, overlay, left, top)
+        return self.range_overlay
+
+    def hex_highlight(self, size):
+        """Sprite translucide d'un hexagone, aux dimensions des sprites de terrain"""
+        sprite = self.hex_highlights.get(size)
+        if sprite is None:
+            layout = HexLayout(size)
+            sprite_width = math.ceil(layout.hex_width) + 2
+            sprite_height = math.ceil(layout.hex_height) + 2
+            points = layout.polygon(sprite_width / 2, sprite_height / 2)
+            sprite = pygame.Surface((sprite_width, sprite_height), pygame.SRCALPHA)
+            # draw.polygon écrit la couleur telle quelle (gfxdraw la mélangerait au fond transparent)
+            pygame.draw.polygon(sprite, self.range_color, list(zip(points[0::2], points[1::2])))
+            self.hex_highlights[size] = sprite
+        return sprite
+
+    def draw_range(self):
+        """Dessine la zone de déplacement par-dessus la carte"""
+        if self.current_map.grid == 'hex':
+            layout = self.hex_layout()
+            sprite = self.hex_highlight(layout.size)
+            anchor_x = sprite.get_width() // 2
+            anchor_y = sprite.get_height() // 2
+            batch = []
+            for x, y in self.range_field.tiles():
+                center_x, center_y = layout.center(x, y)
+                batch.append((sprite, (math.floor(center_x) - anchor_x, math.floor(center_y) - anchor_y)))
+            self.screen.blits(batch, doreturn=False)
+        else:
+            _, overlay, left, top = self.range_overlay_surface()
+            self.screen.blit(overlay, (round(self.pan_x) + left, round(self.pan_y) + top))
+
+    def toggle_observer(self, tile):
+        """Place un observateur du camp affiché sur une tuile, ou retire celui qui s'y trouve"""
+        if tile is None:
+            return
+        observer_id = self.visibility.observer_at(*tile)
+        if observer_id is not None:
+            self.visibility.remove_observer(observer_id)
+        else:
+            self.next_observer_id += 1
+            self.visibility.set_observer(
+                self.next_observer_id, self.fog_side, tile[0], tile[1], self.sight_radius
+            )
+
+    def fog_overlay_surface(self):
+        """Masque de brouillard autour de l'écran, refait si le brouillard, le zoom ou la zone change"""
+        fog = self.visibility.fog(self.fog_side)
+        key = (fog, fog.version, self.overlay_scale())
+        if self.overlay_covers_screen(self.fog_overlay, key):
+            return self.fog_overlay
+
+        tile_range = self.screen_tile_range(self.view_margin)
+        if self.current_map.grid == 'hex':
+            overlay, left, top = self.render_hex_fog(fog, tile_range, self.overlay_scale())
+        else:
+            overlay, left, top = self.render_square_fog(fog, tile_range)
+
+        self.fog_overlay = (key, tile_range, overlay, left, top)
+        return self.fog_overlay
+
+    def render_square_fog(self, fog, tile_range):
+        """Masque d'une plage de tuiles: une image d'un pixel par tuile, agrandie en une fois"""
+        x0, y0, x1, y1 = tile_range
+        width, height = max(x1 - x0, 1), max(y1 - y0, 1)
+        scaled_tile_size = self.tile_size * self.quantized_zoom()
+        left = round(x0 * scaled_tile_size)
+        top = round(y0 * scaled_tile_size)
+
+        # Pixels noirs dont l'opacité dépend de l'état de chaque tuile
+        rgba = bytearray(4 * width * height)
+        if x1 > x0 and y1 > y0:
+            rgba[3::4] = fog.region(x0, y0, x1, y1).translate(self.fog_alpha_table)
+        # convert_alpha: même format de pixels que l'écran, pour un blit rapide
+        tiles = pygame.image.frombuffer(rgba, (width, height), 'RGBA').convert_alpha()
+        size = (
+            max(round(x1 * scaled_tile_size) - left, 1),
+            max(round(y1 * scaled_tile_size) - top, 1)
+        )
+        return pygame.transform.scale(tiles, size), left, top
+
+    def render_hex_fog(self, fog, tile_range, size):
+        """Masque d'une plage d'hexagones, composé par un seul Surface.blits"""
+        col0, row0, col1, row1 = tile_range
+        layout = HexLayout(size)
+        layout.origin = (layout.hex_width / 2, size)
+        sprites = self.fog_sprites(size)
+        anchor_x = sprites[FOG_UNEXPLORED].get_width() // 2
+        anchor_y = sprites[FOG_UNEXPLORED].get_height() // 2
+
+        left = math.floor(layout.center(col0, 0)[0] - layout.hex_width / 2) - 1
+        top = math.floor(layout.center(0, row0)[1] - size) - 1
+        right = math.ceil(layout.center(col1, 1)[0] + layout.hex_width / 2) + 1
+        bottom = math.ceil(layout.center(0, row1)[1] + size) + 1
+        overlay = pygame.Surface((max(right - left, 1), max(bottom - top, 1)), pygame.SRCALPHA)
+
+        batch = []
+        for row in range(row0, row1):
+            xs, y = layout.row_centers(row, col0, col1)
+            sprite_top = math.floor(y) - anchor_y - top
+            states = fog.region(col0, row, col1, row + 1)
+            batch += [
+                (sprites[state], (math.floor(x) - anchor_x - left, sprite_top), None, pygame.BLEND_RGBA_MAX)
+                for state, x in zip(states, xs) if state in sprites
+            ]
+        overlay.blits(batch, doreturn=False)
+        return overlay, left, top
+
+    def fog_sprites(self, size):
+        """Hexagones de brouillard (un par état masqué) pour une taille d'hexagone"""
+        sprites = self.hex_fog_sprites.get(size)
+        if sprites is None:
+            layout = HexLayout(size)
+            sprite_width = math.ceil(layout.hex_width) + 2
+            sprite_height = math.ceil(layout.hex_height) + 2
+            points = layout.polygon(sprite_width / 2, sprite_height / 2)
+            sprites = {}
+            for state, alpha in self.fog_alpha.items():
+                sprite = pygame.Surface((sprite_width, sprite_height), pygame.SRCALPHA)
+                pygame.draw.polygon(sprite, (0, 0, 0, alpha), list(zip(points[0::2], points[1::2])))
+                sprites[state] = sprite
+            self.hex_fog_sprites[size] = sprites
+        return sprites
+
+    def draw_fog(self):
+        """Pose le masque de brouillard sur la carte en un seul blit"""
+        _, _, overlay, left, top = self.fog_overlay_surface()
+        self.screen.blit(overlay, (round(self.pan_x) + left, round(self.pan_y) + top))
+
+    def overlay_scale(self):
+        """Échelle des calques: zoom quantifié, ou taille d'hexagone"""
+        if self.current_map.grid == 'hex':
+            return self.hex_layout().size
+        return self.quantized_zoom()
+
+    def screen_tile_range(self, margin=0):
+        """Plage de tuiles couvrant l'écran plus `margin` pixels, pour les deux types de grille"""
+        if self.current_map.grid == 'hex':
+            return self.hex_layout().offset_range(
+                -margin, -margin, self.screen_width + margin, self.screen_height + margin,
+                self.current_map.width, self.current_map.height
             )
+        return self.visible_tile_range(margin)
+
+    def overlay_covers_screen(self, overlay, key):
+        """Vrai si un calque (clé, plage de tuiles, ...) a la bonne clé et couvre l'écran"""
+        if overlay is None or overlay[0] != key:
+            return False
+        vx0, vy0, vx1, vy1 = overlay[1]
+        x0, y0, x1, y1 = self.screen_tile_range()
+        return vx0 <= x0 and vy0 <= y0 and x1 <= vx1 and y1 <= vy1
+
+    def tile_center(self, x, y):
+        """Centre d'une tuile en pixels, relatif au coin supérieur gauche de la carte"""
+        if self.current_map.grid == 'hex':
+            size = self.hex_layout().size
+            layout = HexLayout(size)
+            layout.origin = (layout.hex_width / 2, size)
+            center_x, center_y = layout.center(x, y)
+            return math.floor(center_x), math.floor(center_y)
+        scaled_tile_size = self.tile_size * self.quantized_zoom()
+        return (
+            (round(x * scaled_tile_size) + round((x + 1) * scaled_tile_size)) // 2,
+            (round(y * scaled_tile_size) + round((y + 1) * scaled_tile_size)) // 2
+        )
+
+    def unit_diameter(self):
+        """Diamètre des pions, contenu dans une tuile (ou un hexagone) pour le zoom actuel"""
+        if self.current_map.grid == 'hex':
+            return max(int(self.hex_layout().size * 0.9), 4)
+        return max(int(self.tile_size * self.quantized_zoom() * 0.8), 4)
+
+    def unit_sprite(self, side, kind, diameter):
+        """Pion d'une unité: disque à la couleur du camp, marqué selon le type"""
+        key = (side, kind, diameter)
+        sprite = self.unit_sprites.get(key)
+        if sprite is None:
+            sprite = pygame.Surface((diameter, diameter), pygame.SRCALPHA)
+            radius = diameter // 2
+            color = self.unit_colors[side % len(self.unit_colors)]
+            pygame.draw.circle(sprite, color, (radius, radius), radius)
+            pygame.draw.circle(sprite, (0, 0, 0), (radius, radius), radius, 1)
+            # Symboles militaires: croix pour l'infanterie, diagonale pour la cavalerie
+            inset = max(diameter // 4, 1)
+            far = diameter - 1 - inset
+            pygame.draw.line(sprite, (255, 255, 255), (inset, far), (far, inset), 2)
+            if kind == 'infantry':
+                pygame.draw.line(sprite, (255, 255, 255), (inset, inset), (far, far), 2)
+            self.unit_sprites[key] = sprite
+        return sprite
+
+    def unit_blits(self, uids, left, top):
+        """Liste (sprite, position) des pions de quelques unités sur un calque"""
+        units = self.units
+        diameter = self.unit_diameter()
+        radius = diameter // 2
+        batch = []
+        for uid in uids:
+            x, y = units.position(uid)
+            center_x, center_y = self.tile_center(x, y)
+            sprite = self.unit_sprite(units.side(uid), units.kind(uid), diameter)
+            batch.append((sprite, (center_x - radius - left, center_y - radius - top)))
+        return batch
+
+    def unit_overlay_surface(self):
+        """Calque des unités autour de l'écran; seules les tuiles modifiées sont redessinées"""
+        key = self.overlay_scale()
+        if self.overlay_covers_screen(self.unit_overlay, key):
+            _, tile_range, overlay, left, top = self.unit_overlay
+            if self.dirty_unit_tiles:
+                self.redraw_unit_tiles(overlay, tile_range, left, top)
+            return self.unit_overlay
+
+        # Reconstruction complète (zoom, ou écran sorti de la zone couverte)
+        tile_range = self.screen_tile_range(self.view_margin)
+        x0, y0, x1, y1 = tile_range
+        radius = self.unit_diameter() // 2
+        # Sur une grille hexagonale, les lignes impaires sont décalées: deux lignes suffisent aux bornes
+        last_x, last_y = max(x1 - 1, x0), max(y1 - 1, y0)
+        corners = [
+            self.tile_center(x, y)
+            for x in (x0, last_x) for y in {y0, min(y0 + 1, last_y), last_y}
+        ]
+        left = min(cx for cx, _ in corners) - radius
+        top = min(cy for _, cy in corners) - radius
+        right = max(cx for cx, _ in corners) + radius + 1
+        bottom = max(cy for _, cy in corners) + radius + 1
+        overlay = pygame.Surface((max(right - left, 1), max(bottom - top, 1)), pygame.SRCALPHA)
+        uids = sorted(self.units.units_in_rect(x0, y0, x1, y1))
+        overlay.blits(self.unit_blits(uids, left, top), doreturn=False)
+
+        self.dirty_unit_tiles.clear()
+        self.unit_overlay = (key, tile_range, overlay, left, top)
+        return self.unit_overlay
+
+    def redraw_unit_tiles(self, overlay, tile_range, left, top):
+        """Efface puis redessine les pions des tuiles modifiées, sur le calque seulement"""
+        x0, y0, x1, y1 = tile_range
+        diameter = self.unit_diameter()
+        radius = diameter // 2
+        for x, y in self.dirty_unit_tiles:
+            if not (x0 <= x < x1 and y0 <= y < y1):
+                continue
+            center_x, center_y = self.tile_center(x, y)
+            overlay.fill((0, 0, 0, 0), (center_x - radius - left, center_y - radius - top, diameter, diameter))
+            overlay.blits(self.unit_blits(self.units.units_at(x, y), left, top), doreturn=False)
+        self.dirty_unit_tiles.clear()
+
+    def draw_units(self):
+        """Pose le calque des unités sur la carte en un seul blit"""
+        _, _, overlay, left, top = self.unit_overlay_surface()
+        self.screen.blit(overlay, (round(self.pan_x) + left, round(self.pan_y) + top))
+
+    def add_unit(self, x, y, side=0, kind='infantry'):
+        """Place une unité; elle observe aussi pour le brouillard de son camp"""
+        uid = self.units.add(x, y, side, kind)
+        self.visibility.set_observer(('unit', uid), side, x, y, UNIT_SIGHT[kind])
+        self.dirty_unit_tiles.add((x, y))
+        self.invalidate_unit_tiles([(x, y)])
+        return uid
+
+    def move_unit(self, uid, x, y):
+        """Déplace une unité: seules ses tuiles de départ et d'arrivée sont redessinées"""
+        old_tile = self.units.move(uid, x, y)
+        self.visibility.set_observer(
+            ('unit', uid), self.units.side(uid), x, y, UNIT_SIGHT[self.units.kind(uid)]
+        )
+        self.dirty_unit_tiles.add(old_tile)
+        self.dirty_unit_tiles.add((x, y))
+        self.invalidate_unit_tiles([old_tile, (x, y)])
+
+    def invalidate_unit_tiles(self, tiles):
+        """Demande l'affichage de tuiles dont les unités ont changé"""
+        if self.fog_enabled:
+            # Le champ de vision bouge avec l'unité: tout le brouillard peut changer
+            self.needs_redraw = True
+        elif not self.needs_redraw:
+            self.dirty_rects.extend(self.tile_screen_rect(tile) for tile in tiles)
+
+    def deploy_demo_units(self):
+        """Déploie des unités au hasard sur les tuiles franchissables (un camp par moitié de carte)"""
+        pathfinder = self.ranges.pathfinder('infantry')
+        width, height = self.current_map.width, self.current_map.height
+        placed = 0
+        for _ in range(self.demo_units * 10):
+            if placed == self.demo_units:
+                break
+            x, y = random.randrange(width), random.randrange(height)
+            if pathfinder.is_passable(x, y):
+                self.add_unit(x, y, 0 if x < width // 2 else 1, random.choice(UNIT_KINDS))
+                placed += 1
+        print(f"{placed} unités déployées ({len(self.units)} au total)")
+
+    def manoeuvre(self):
+        """Déplace quelques unités au hasard d'une tuile (animation de démonstration)"""
+        pathfinder = self.ranges.pathfinder('infantry')
+        uids = list(self.units)
+        for uid in random.sample(uids, min(self.moves_per_frame, len(uids))):
+            neighbours = pathfinder.neighbors(*self.units.position(uid))
+            if neighbours:
+                self.move_unit(uid, *random.choice(neighbours))
+
+    def toggle_edit_mode(self):
+        """Passe du mode consultation au mode édition du terrain, et inversement"""
+        self.end_painting()
+        self.edit_mode = not self.edit_mode
+        self.instructions_label.set_text(self.instructions_text())
+
+    def paint_at(self, pos):
+        """Peint la tuile sous un point de l'écran (et le chemin depuis le point précédent du trait)"""
+        tile = self.tile_at(pos)
+        if tile is not None:
+            self.apply_terrain_changes(self.editor.paint(*tile))
+
+    def end_painting(self):
+        """Termine le trait de pinceau en cours"""
+        if self.painting:
+            self.painting = False
+            self.editor.end_stroke()
+
+    def handle_key(self, event):
+        """Raccourcis clavier; en mode édition, toutes les touches vont à l'éditeur"""
+        if event.key == pygame.K_e and self.current_map:
+            self.toggle_edit_mode()
+        elif self.edit_mode and self.current_map:
+            self.edit_key(event)
+        elif event.key == pygame.K_f:
+            self.fog_enabled = not self.fog_enabled
+        elif event.key == pygame.K_u and self.current_map:
+            self.deploy_demo_units()
+        elif event.key == pygame.K_m and self.current_map:
+            self.manoeuvres = not self.manoeuvres
+
+    def edit_key(self, event):
+        """Raccourcis du mode édition: terrain, taille du pinceau, annulation, enregistrement"""
+        editor = self.editor
+        if event.mod & pygame.KMOD_CTRL:
+            if event.key == pygame.K_z:
+                self.apply_terrain_changes(editor.undo())
+            elif event.key == pygame.K_y:
+                self.apply_terrain_changes(editor.redo())
+            elif event.key == pygame.K_s:
+                self.save_map()
+            return
+        if pygame.K_1 <= event.key < pygame.K_1 + len(wargame_terrain.TERRAIN_TYPES):
+            editor.brush_terrain = wargame_terrain.TERRAIN_TYPES[event.key - pygame.K_1]
+        elif event.key == pygame.K_LEFTBRACKET:
+            editor.brush_radius = max(editor.brush_radius - 1, 0)
+        elif event.key == pygame.K_RIGHTBRACKET:
+            editor.brush_radius = min(editor.brush_radius + 1, editor.max_brush_radius)
+        self.instructions_label.set_text(self.instructions_text())
+
+    def apply_terrain_changes(self, tiles):
+        """Répercute un changement de terrain: tuiles en cache, zones de déplacement, lignes de vue
+
+        Le coût est proportionnel au nombre de tuiles modifiées: seules leurs
+        surfaces sont redessinées et envoyées à l'affichage.
+        """
+        if not tiles:
+            return
+        if self.world is not None:
+            self.patch_tiles(tiles)
+
+        repaired = self.ranges.update_tiles(tiles)
+        recomputed = self.visibility.update_tiles(tiles)
+        if (self.range_field is not None and self.range_field in repaired) or (self.fog_enabled and recomputed):
+            # La zone affichée ou le brouillard peuvent changer loin des tuiles peintes
+            self.needs_redraw = True
+        elif not self.needs_redraw:
+            self.dirty_rects.extend(self.tile_screen_rect(tile) for tile in tiles)
+
+        # Relire le terrain de la tuile survolée
+        self.hover_tile = None
+
+    def patch_tiles(self, tiles):
+        """Redessine quelques tuiles dans les blocs rendus et les vues zoomées en cache
+
+        Chaque tuile est redessinée dans son bloc; dans les vues, la partie du
+        bloc retouché est remise à l'échelle comme à leur construction.
+        """
+        tile_size = self.tile_size
+        chunk_size = self.world.chunk_size
+        chunks = set()
+        for x, y in tiles:
+            key = (x // chunk_size, y // chunk_size)
+            chunks.add(key)
+            chunk = self.world.cache.get(key)
+            if chunk is not None:
+                tile = self.current_map.generate_surface(tile_size, (x, y, x + 1, y + 1))
+                chunk.blit(tile, ((x % chunk_size) * tile_size, (y % chunk_size) * tile_size))
+
+        for zoom, (view, view_range, left, top) in self.views.entries.items():
+            x0, y0, x1, y1 = view_range
+            for cx, cy in chunks:
+                bx0, by0, bx1, by1 = self.world.chunk_bounds(cx, cy)
+                if bx0 < x1 and x0 < bx1 and by0 < y1 and y0 < by1:
+                    self.scale_chunk_piece(view, view_range, left, top, zoom, cx, cy)
+
+    def save_map(self):
+        """Enregistre le terrain modifié dans le fichier de la carte"""
+        try:
+            map_path = self.editor.save()
+        except (OSError, ValueError) as e:
+            print(f"Erreur lors de l'enregistrement de la map: {e}")
+            return
+        print(f"Map '{self.current_map.name}' enregistrée dans {map_path}")
 
-            # Générer la surface de la carte
-            self.map_surface = self.current_map.generate_surface()
-            self.update_scaled_surface()
+        # Miniature et libellés du catalogue à jour
+        self.catalog.refresh()
+        self.show_preview(map_path.stem)
 
-            # Centrer la carte
-            self.pan_x = (self.screen_width - self.map_surface.get_width() * self.zoom_level) // 2
-            self.pan_y = (self.screen_height - self.map_surface.get_height() * self.zoom_level) // 2
+    def quantized_zoom(self):
+        """Niveau de zoom arrondi, utilisé pour le rendu et comme clé du cache des vues"""
+        return round(self.zoom_level / self.zoom_quantum) * self.zoom_quantum
 
-            print(f"Map '{map_data['name']}' chargée avec succès!")
+    def visible_tile_range(self, margin=0):
+        """Plage de tuiles (x0, y0, x1, y1) visible à l'écran, bornée à la carte"""
+        scaled_tile_size = self.tile_size * self.quantized_zoom()
+        x0 = math.floor((-self.pan_x - margin) / scaled_tile_size)
+        y0 = math.floor((-self.pan_y - margin) / scaled_tile_size)
+        x1 = math.ceil((self.screen_width + margin - self.pan_x) / scaled_tile_size)
+        y1 = math.ceil((self.screen_height + margin - self.pan_y) / scaled_tile_size)
 
-        except Exception as e:
-            print(f"Erreur lors du chargement de la map: {e}")
+        width, height = self.current_map.width, self.current_map.height
+        x0 = min(max(x0, 0), width)
+        y0 = min(max(y0, 0), height)
+        return x0, y0, min(max(x1, x0), width), min(max(y1, y0), height)
 
     def update_scaled_surface(self):
-        """Met à jour la surface zoomée de la carte"""
-        if self.map_surface:
-            new_width = int(self.map_surface.get_width() * self.zoom_level)
-            new_height = int(self.map_surface.get_height() * self.zoom_level)
-            self.scaled_surface = pygame.transform.scale(
-                self.map_surface,
-                (new_width, new_height)
-            )
+        """Met à l'échelle uniquement la partie de la carte autour de l'écran
+
+        La vue couvre l'écran plus `view_margin` pixels de chaque côté: tant que
+        le pan reste dans cette marge, dessiner la carte se résume à un blit.
+        """
+        zoom = self.quantized_zoom()
+        scaled_tile_size = self.tile_size * zoom
+        x0, y0, x1, y1 = self.visible_tile_range(self.view_margin)
+
+        left = round(x0 * scaled_tile_size)
+        top = round(y0 * scaled_tile_size)
+        view = pygame.Surface((
+            max(round(x1 * scaled_tile_size) - left, 1),
+            max(round(y1 * scaled_tile_size) - top, 1)
+        ))
+
+        for cx, cy in self.world.visible_chunks(x0, y0, x1, y1, self.pan_direction):
+            self.scale_chunk_piece(view, (x0, y0, x1, y1), left, top, zoom, cx, cy)
+
+        entry = (view, (x0, y0, x1, y1), left, top)
+        self.views.put(zoom, entry)
+        return entry
+
+    def scale_chunk_piece(self, view, view_range, left, top, zoom, cx, cy):
+        """Met à l'échelle dans une vue la partie d'un bloc qu'elle couvre
+
+        Le découpage est le même à la construction de la vue et après une
+        retouche du terrain: le résultat est identique au pixel près.
+        """
+        scaled_tile_size = self.tile_size * zoom
+        x0, y0, x1, y1 = view_range
+        chunk = self.world.get_chunk(cx, cy)
+        bx0, by0, bx1, by1 = self.world.chunk_bounds(cx, cy)
+
+        # Tuiles du bloc comprises dans la vue
+        ix0, iy0 = max(x0, bx0), max(y0, by0)
+        ix1, iy1 = min(x1, bx1), min(y1, by1)
+        source = chunk.subsurface((
+            (ix0 - bx0) * self.tile_size,
+            (iy0 - by0) * self.tile_size,
+            (ix1 - ix0) * self.tile_size,
+            (iy1 - iy0) * self.tile_size
+        ))
+
+        dest_left = round(ix0 * scaled_tile_size)
+        dest_top = round(iy0 * scaled_tile_size)
+        size = (
+            round(ix1 * scaled_tile_size) - dest_left,
+            round(iy1 * scaled_tile_size) - dest_top
+        )
+        view.blit(pygame.transform.scale(source, size), (dest_left - left, dest_top - top))
+
+    def current_view(self):
+        """Vue zoomée couvrant l'écran, reconstruite seulement si nécessaire"""
+        entry = self.views.get(self.quantized_zoom())
+        if entry is not None:
+            vx0, vy0, vx1, vy1 = entry[1]
+            x0, y0, x1, y1 = self.visible_tile_range()
+            if vx0 <= x0 and vy0 <= y0 and x1 <= vx1 and y1 <= vy1:
+                return entry
+        return self.update_scaled_surface()
+
+    def enable_profiling(self, profiler):
+        """Mesure les étapes coûteuses du rendu et affiche leur résumé par-dessus la carte"""
+        self.profiler = profiler
+        profiler.instrument(self, ('handle_events', 'draw', 'update_scaled_surface'), ('draw',))
+        profiler.instrument(WargameMap, ('generate_surface',))
+
+    def draw_profile(self):
+        """Résumé du profilage (images par seconde, durées par étape) en bas à droite"""
+        if self.profile_font is None:
+            self.profile_font = pygame.font.Font(None, 20)
+        lines = [self.profile_font.render(line, True, (255, 255, 255)) for line in self.profiler.summary()]
+        if not lines:
+            return
+        width = max(line.get_width() for line in lines) + 10
+        height = sum(line.get_height() for line in lines) + 10
+        panel = pygame.Surface((width, height), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 160))
+        y = 5
+        for line in lines:
+            panel.blit(line, (5, y))
+            y += line.get_height()
+        self.screen.blit(panel, (self.screen_width - width - 10, self.screen_height - height - 10))
+
+    def ui_covers(self, pos):
+        """Vrai si le menu déroulant ou la miniature cachent la carte en ce point"""
+        return any(
+            element is not None and element.visible and element.rect.collidepoint(pos)
+            for element in (self.map_dropdown, self.preview_image)
+        )
+
+    def is_idle(self):
+        """Vrai si rien n'est à redessiner ni à animer: la boucle peut attendre un événement"""
+        return not (
+            self.continuous_rendering or self.needs_redraw or self.dirty_rects
+            or self.is_panning or self.manoeuvres
+            or (self.world is not None and self.world.prefetch_queue)
+        )
 
     def handle_events(self):
         """Gère les événements"""
-        time_delta = self.clock.tick(60) / 1000.0
+        if self.is_idle():
+            # Au repos: dormir jusqu'au prochain événement (ou jusqu'au réveil)
+            event = pygame.event.wait(self.idle_timeout_ms)
+            events = [] if event.type == pygame.NOEVENT else [event]
+            events += pygame.event.get()
+            time_delta = self.clock.tick() / 1000.0
+        else:
+            time_delta = self.clock.tick(self.frame_rate) / 1000.0
+            events = pygame.event.get()
 
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 self.running = False
 
+            # L'interface reçoit l'événement d'abord: un clic qu'elle garde
+            # (menu déroulant) ne peint ni ne déplace la carte cachée dessous
+            ui_consumed = self.manager.process_events(event)
+
+            # Seul un survol de la carte n'oblige pas à tout recomposer
+            if event.type != pygame.MOUSEMOTION or self.is_panning:
+                self.needs_redraw = True
+            else:
+                ui_hovered = self.manager.get_hovering_any_element()
+                if ui_hovered or self.ui_hovered:
+                    self.needs_redraw = True
+                self.ui_hovered = ui_hovered
+
             # Gestion du menu déroulant
             if event.type == pygame_gui.UI_DROP_DOWN_MENU_CHANGED:
                 if event.ui_element == self.map_dropdown:
-                    selected_map = event.text
-                    self.load_map(selected_map)
+                    selected_map = self.map_labels.get(event.text, event.text)
+                    self.show_preview(selected_map)
+                    self.request_map(selected_map)
+
+            # Carte préparée en arrière-plan
+            if event.type == MAP_LOADED:
+                self.finish_loading(event)
 
             # Gestion du pan (déplacement avec la souris)
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if event.button == 1:  # Clic gauche
+            if event.type == pygame.MOUSEBUTTONDOWN and not (ui_consumed or self.ui_covers(event.pos)):
+                if event.button == 1 and self.edit_mode and self.current_map:  # Clic gauche: peindre
+                    self.painting = True
+                    self.editor.begin_stroke()
+                    self.paint_at(event.pos)
+                elif event.button in (1, 2):  # Clic gauche ou clic molette
                     self.is_panning = True
                     self.last_mouse_pos = event.pos
+                elif event.button == 3 and self.current_map:  # Clic droit
+                    if self.fog_enabled:
+                        self.toggle_observer(self.tile_at(event.pos))
+                    else:
+                        self.select_range(self.tile_at(event.pos))
+
+            if event.type == pygame.KEYDOWN:
+                self.handle_key(event)
 
             if event.type == pygame.MOUSEBUTTONUP:
-                if event.button == 1:
+                if event.button in (1, 2):
                     self.is_panning = False
+                if event.button == 1:
+                    self.end_painting()
 
             if event.type == pygame.MOUSEMOTION:
-                if self.is_panning:
+                if self.painting:
+                    self.paint_at(event.pos)
+                elif self.is_panning:
                     dx = event.pos[0] - self.last_mouse_pos[0]
                     dy = event.pos[1] - self.last_mouse_pos[1]
                     self.pan_x += dx
                     self.pan_y += dy
+                    self.pan_direction = (dx, dy)
                     self.last_mouse_pos = event.pos
 
             # Gestion du zoom avec la molette
@@ -267,7 +1287,7 @@ class WargameViewer:
                 mouse_x, mouse_y = pygame.mouse.get_pos()
 
                 # Calculer la position relative à la carte avant le zoom
-                if self.map_surface:
+                if self.current_map:
                     old_zoom = self.zoom_level
 
                     # Ajuster le zoom
@@ -276,34 +1296,48 @@ class WargameViewer:
                     else:  # Molette vers le bas = zoom out
                         self.zoom_level = max(self.zoom_level / 1.1, self.min_zoom)
 
-                    # Mettre à jour la surface
-                    self.update_scaled_surface()
-
                     # Ajuster le pan pour zoomer vers la position de la souris
                     zoom_ratio = self.zoom_level / old_zoom
                     self.pan_x = mouse_x - (mouse_x - self.pan_x) * zoom_ratio
                     self.pan_y = mouse_y - (mouse_y - self.pan_y) * zoom_ratio
 
                     # Mettre à jour le label d'instructions
-                    instructions_text = (
-                        "Clic gauche + glisser: Déplacer la carte | "
-                        "Molette: Zoom/Dézoom | "
-                        f"Zoom: {self.zoom_level:.2f}x"
-                    )
-                    self.instructions_label.set_text(instructions_text)
+                    self.instructions_label.set_text(self.instructions_text())
 
-            self.manager.process_events(event)
+        # Tuile sous la souris, même si c'est la carte qui a bougé
+        self.update_hover(pygame.mouse.get_pos())
 
         self.manager.update(time_delta)
 
-    def draw(self):
-        """Dessine l'écran"""
+    def draw(self, rects=None):
+        """Dessine l'écran; avec `rects`, ne recompose et n'affiche que ces rectangles"""
+        if rects is None:
+            self.compose()
+            pygame.display.flip()
+        else:
+            screen_rect = self.screen.get_rect()
+            rects = [screen_rect.clip(rect) for rect in rects]
+            rects = [rect for rect in rects if rect.width and rect.height]
+            if rects:
+                # Les surcouches sont en cache: recomposer sous un clip ne coûte que sa surface
+                self.screen.set_clip(rects[0].unionall(rects[1:]))
+                self.compose()
+                self.screen.set_clip(None)
+                pygame.display.update(rects)
+        self.needs_redraw = False
+        self.dirty_rects = []
+
+    def compose(self):
+        """Compose l'image complète de l'écran (carte, surcouches, interface)"""
         # Fond
         self.screen.fill((50, 50, 50))
 
-        # Dessiner la carte si elle existe
-        if self.scaled_surface:
-            self.screen.blit(self.scaled_surface, (self.pan_x, self.pan_y))
+        # Dessiner la vue zoomée de la carte si elle existe
+        if self.current_map and self.current_map.grid == 'hex':
+            self.draw_hex_map()
+        elif self.current_map:
+            view, _, left, top = self.current_view()
+            self.screen.blit(view, (round(self.pan_x) + left, round(self.pan_y) + top))
         else:
             # Texte si aucune carte n'est chargée
             font = pygame.font.Font(None, 36)
@@ -311,22 +1345,71 @@ class WargameViewer:
             text_rect = text.get_rect(center=(self.screen_width // 2, self.screen_height // 2))
             self.screen.blit(text, text_rect)
 
+        # Surcouches: zone de déplacement, unités puis brouillard de guerre
+        if self.current_map and self.range_field:
+            self.draw_range()
+        if self.current_map and len(self.units):
+            self.draw_units()
+        if self.current_map and self.fog_enabled:
+            self.draw_fog()
+        if self.current_map and self.range_field:
+            self.draw_tile_outline(self.range_field.start, self.selection_color)
+        if self.hover_tile is not None:
+            self.draw_tile_outline(self.hover_tile, self.hover_color)
+
+        # Indicateur de chargement
+        if self.loading_map is not None:
+            font = pygame.font.Font(None, 36)
+            text = font.render(
+                f"Chargement de {self.catalog.label(self.loading_map)}...", True, (255, 255, 255)
+            )
+            text_rect = text.get_rect(center=(self.screen_width // 2, self.screen_height // 2))
+            self.screen.blit(text, text_rect)
+
+        if self.profiler is not None:
+            self.draw_profile()
+
         # Dessiner l'interface
         self.manager.draw_ui(self.screen)
 
-        pygame.display.flip()
-
     def run(self):
         """Boucle principale"""
         while self.running:
             self.handle_events()
-            self.draw()
-
+            if self.manoeuvres:
+                self.manoeuvre()
+            if self.continuous_rendering or self.needs_redraw:
+                self.draw()
+            elif self.dirty_rects:
+                self.draw(self.dirty_rects)
+
+            # Précharger un bloc dans la direction du déplacement
+            if self.world:
+                self.world.prefetch()
+
+        self.loader.shutdown()
+        if self.profiler is not None:
+            self.profiler.close()
+        for editor in self.editors.values():
+            if editor.has_unsaved_changes():
+                print(f"Modifications non enregistrées de la map '{editor.map.name}' perdues")
         pygame.quit()
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Visualiseur de cartes de wargame")
+    parser.add_argument(
+        '--continuous', action='store_true',
+        help="Redessiner chaque image même sans changement (mesures de performance)"
+    )
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
     viewer = WargameViewer()
+    viewer.continuous_rendering = args.continuous
+    profiler = profiler_from_args(args)
+    if profiler is not None:
+        viewer.enable_profiling(profiler)
     viewer.run()
 
 
@@ -0,0 +1,365 @@
+"""Mesure headless des trois visualiseurs sur des cartes synthétiques de toutes tailles
+
+    python wargame_benchmark.py
+    python wargame_benchmark.py --sizes 20x15 1000 --renderers pygame tk
+    python wargame_benchmark.py --save-baseline
+    python wargame_benchmark.py --baseline wargame_benchmark_baseline.json --tolerance 0.3
+
+Pygame tourne avec le pilote vidéo SDL « dummy ». Les visualiseurs Tk ont
+besoin d'un serveur X: sans DISPLAY, un Xvfb est lancé s'il est installé,
+sinon leurs mesures sont ignorées. Chaque cas donne la durée médiane de
+plusieurs passages et le pic de mémoire d'un passage supplémentaire (pic
+RSS sous Linux, allocations Python ailleurs). Avec une référence, le
+programme échoue si un cas devient plus lent ou plus gourmand que la
+tolérance ne le permet.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import wargame_terrain
+from wargame_benchmark_pathfinding import synthetic_map
+
+DEFAULT_SIZES = ['20x15', '250', '1000', '4000']
+RENDERERS = ('pygame', 'tk', 'raster')
+DEFAULT_BASELINE = 'wargame_benchmark_baseline.json'
+JSON_TILE_LIMIT = 1000 * 1000  # Au-delà, la carte JSON est trop lourde à écrire et relire
+RASTER_PIXELS_PER_TILE = 4
+MAX_RASTER_SIDE = 16384
+SURFACE_REGION = 64  # Côté (en tuiles) de la région rendue par generate_surface
+
+# Séquences de navigation rejouées à chaque passage
+ZOOM_SEQUENCE = [1.1 ** k for k in (0, 1, 2, 3, 4, 5, 4, 3, 2, 1, 0, -1, -2, -3, -4, -5)]
+PAN_STEPS = 60
+PAN_STEP = (15, 10)
+
+
+def parse_size(text):
+    """Taille « LxH » ou côté « N » -> (largeur, hauteur)"""
+    width, _, height = text.lower().partition('x')
+    return int(width), int(height or width)
+
+
+def read_memory_status(field):
+    """Champ de /proc/self/status, en Kio"""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    raise OSError(f"{field} absent de /proc/self/status")
+
+
+def measure_peak(function):
+    """Surcroît de mémoire maximal (Kio) pendant un appel
+
+    Sous Linux, le pic RSS est remis à zéro avant l'appel (clear_refs), ce
+    qui compte aussi les pixels alloués par SDL, Tk et Pillow. Ailleurs, seul
+    le pic des allocations Python (tracemalloc) est disponible.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        before = read_memory_status('VmRSS')
+    except OSError:
+        tracemalloc.start()
+        try:
+            function()
+            return tracemalloc.get_traced_memory()[1] / 1024
+        finally:
+            tracemalloc.stop()
+    function()
+    return max(read_memory_status('VmHWM') - before, 0)
+
+
+def measure(function, repeat):
+    """Durée médiane (ms) de `repeat` passages, et pic de mémoire (Kio) d'un passage de plus"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), measure_peak(function)
+
+
+def start_virtual_display():
+    """Lance un Xvfb si aucun écran n'est disponible; retourne le processus, ou None"""
+    if os.environ.get('DISPLAY') or sys.platform in ('win32', 'darwin'):
+        return None
+    xvfb = shutil.which('Xvfb')
+    if xvfb is None:
+        return None
+
+    for number in range(99, 120):
+        if not Path(f"/tmp/.X11-unix/X{number}").exists():
+            break
+    display = f":{number}"
+    process = subprocess.Popen(
+        [xvfb, display, '-screen', '0', '1280x1024x24', '-nolisten', 'tcp'],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        if Path(f"/tmp/.X11-unix/X{number}").exists():
+            os.environ['DISPLAY'] = display
+            return process
+        if process.poll() is not None:
+            break
+        time.sleep(0.05)
+    process.terminate()
+    return None
+
+
+def pygame_cases(wargame_map):
+    """Cas du visualiseur pygame: generate_surface, update_scaled_surface, zoom et pan"""
+    import wargame
+
+    viewer = wargame.WargameViewer()
+    pygame_map = wargame.WargameMap(
+        wargame_map.name, wargame_map.width, wargame_map.height, wargame_map.terrain, wargame_map.grid
+    )
+    region = (0, 0, min(pygame_map.width, SURFACE_REGION), min(pygame_map.height, SURFACE_REGION))
+    world = None if pygame_map.grid == 'hex' else viewer.create_world(pygame_map)
+    viewer.show_map(pygame_map, world)
+    start_pan = (viewer.pan_x, viewer.pan_y)
+
+    def generate_surface():
+        pygame_map.generate_surface(viewer.tile_size, region)
+
+    def update_scaled_surface():
+        viewer.zoom_level = 1.0
+        viewer.update_scaled_surface()
+
+    def zoom():
+        for zoom_level in ZOOM_SEQUENCE:
+            viewer.zoom_level = zoom_level
+            viewer.views.clear()
+            viewer.draw()
+
+    def pan():
+        viewer.zoom_level = 1.0
+        viewer.pan_x, viewer.pan_y = start_pan
+        viewer.views.clear()
+        for _ in range(PAN_STEPS):
+            viewer.pan_x -= PAN_STEP[0]
+            viewer.pan_y -= PAN_STEP[1]
+            viewer.draw()
+
+    cases = [('pygame generate_surface', generate_surface)]
+    if world is not None:
+        cases.append(('pygame update_scaled_surface', update_scaled_surface))
+    cases += [('pygame zoom', zoom), ('pygame pan', pan)]
+    return cases, viewer.loader.shutdown
+
+
+def tk_cases(wargame_map):
+    """Cas du visualiseur Tk: draw_map au fil d'un zoom et d'un pan"""
+    import wargame_tkinter
+
+    viewer = wargame_tkinter.WargameViewer()
+    viewer.loading_map = None  # Ignorer la carte chargée au démarrage
+    viewer.root.update()
+    viewer.show_map(wargame_map)
+    viewer.root.update()
+    start_pan = (viewer.pan_x, viewer.pan_y)
+
+    def zoom():
+        for zoom_level in ZOOM_SEQUENCE:
+            viewer.zoom_level = zoom_level
+            viewer.draw_map()
+            viewer.root.update_idletasks()
+
+    def pan():
+        viewer.zoom_level = 1.0
+        viewer.pan_x, viewer.pan_y = start_pan
+        viewer.draw_map()
+        for _ in range(PAN_STEPS):
+            viewer.pan_by(-PAN_STEP[0], -PAN_STEP[1])
+            viewer.root.update_idletasks()
+
+    def close():
+        viewer.loader.shutdown()
+        viewer.root.destroy()
+
+    return [('tk draw_map zoom', zoom), ('tk draw_map pan', pan)], close
+
+
+def raster_image(wargame_map):
+    """Image raster de la carte (un bloc de pixels par tuile), comme une carte scannée"""
+    from PIL import Image
+
+    terrain = wargame_map.terrain
+    colors = terrain.color_table(wargame_terrain.TERRAIN_COLORS, wargame_terrain.UNKNOWN_TERRAIN_COLOR)
+    image = Image.frombytes('P', (wargame_map.width, wargame_map.height), bytes(terrain.cells))
+    image.putpalette([channel for color in colors for channel in color])
+    scale = max(min(RASTER_PIXELS_PER_TILE, MAX_RASTER_SIDE // max(wargame_map.width, wargame_map.height)), 1)
+    image = image.resize((wargame_map.width * scale, wargame_map.height * scale), Image.Resampling.NEAREST)
+    return image.convert('RGB')
+
+
+def raster_cases(wargame_map):
+    """Cas du visualiseur d'images: update_display au fil d'un zoom et d'un pan"""
+    import wargame_map_viewer
+
+    viewer = wargame_map_viewer.MapViewer()
+    viewer.root.update()
+    viewer.original_image = raster_image(wargame_map)
+    viewer.build_pyramid()
+
+    def zoom():
+        viewer.pan_x = viewer.pan_y = 0
+        for zoom_level in ZOOM_SEQUENCE:
+            viewer.zoom_level = zoom_level / 4
+            viewer.update_display()
+            viewer.root.update_idletasks()
+
+    def pan():
+        viewer.zoom_level = 1.0
+        viewer.pan_x = viewer.pan_y = 0
+        for _ in range(PAN_STEPS):
+            viewer.pan_x -= PAN_STEP[0]
+            viewer.pan_y -= PAN_STEP[1]
+            viewer.update_display()
+            viewer.root.update_idletasks()
+
+    return [('raster update_display zoom', zoom), ('raster update_display pan', pan)], viewer.root.destroy
+
+
+def load_cases(wargame_map, work_dir):
+    """Cas de chargement: JSON (cartes moyennes) et binaire"""
+    import wargame_binmap
+
+    stem = Path(work_dir) / f"bench_{wargame_map.width}x{wargame_map.height}_{wargame_map.grid}"
+    cases = []
+    if wargame_map.width * wargame_map.height <= JSON_TILE_LIMIT:
+        json_path = stem.with_suffix('.json')
+        with open(json_path, 'w') as f:
+            json.dump(wargame_map.to_dict(), f)
+        cases.append(('load json', lambda: wargame_terrain.load_map_file(json_path)))
+
+    binary_path = stem.with_suffix('.wgm')
+    wargame_binmap.write_map(wargame_map, binary_path)
+
+    def load_binary():
+        # Lire toute la grille: l'ouverture seule ne ferait que projeter le fichier
+        bytes(wargame_terrain.load_map_file(binary_path).terrain.cells)
+
+    cases.append(('load wgm', load_binary))
+    return cases, None
+
+
+def run_suite(sizes, grids, renderers, repeat, seed):
+    """Mesure chaque cas; retourne {clé: {'ms': ..., 'peak_kb': ...}}"""
+    results = {}
+    factories = [('load', load_cases)]
+    factories += [(name, factory) for name, factory in (
+        ('pygame', pygame_cases), ('tk', tk_cases), ('raster', raster_cases)
+    ) if name in renderers]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for width, height in sizes:
+            for grid in grids:
+                wargame_map = synthetic_map(width, grid, seed, height=height)
+                print(f"{wargame_map.name} ({grid})")
+                for renderer, factory in factories:
+                    if renderer == 'raster' and grid == 'hex':
+                        continue  # Une image raster n'a pas de grille
+                    if renderer == 'load':
+                        cases, close = factory(wargame_map, work_dir)
+                    else:
+                        cases, close = factory(wargame_map)
+                    try:
+                        for name, function in cases:
+                            ms, peak_kb = measure(function, repeat)
+                            key = f"{name} | {width}x{height} | {grid}"
+                            results[key] = {'ms': round(ms, 3), 'peak_kb': round(peak_kb)}
+                            print(f"  {name:<30} {ms:10.2f} ms {peak_kb:10.0f} Kio")
+                    finally:
+                        if close is not None:
+                            close()
+    return results
+
+
+def compare(results, baseline, tolerance, min_ms=1.0, min_kb=1024):
+    """Cas plus lents ou plus gourmands que la référence au-delà de la tolérance
+
+    Les écarts inférieurs à `min_ms` et `min_kb` sont tenus pour du bruit.
+    """
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        if result['ms'] > reference['ms'] * (1 + tolerance) and result['ms'] - reference['ms'] > min_ms:
+            regressions.append(f"{key}: {reference['ms']:.2f} -> {result['ms']:.2f} ms")
+        if result['peak_kb'] > reference['peak_kb'] * (1 + tolerance) and \
+                result['peak_kb'] - reference['peak_kb'] > min_kb:
+            regressions.append(f"{key}: {reference['peak_kb']} -> {result['peak_kb']} Kio")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mesure headless des performances des visualiseurs")
+    parser.add_argument('--sizes', nargs='*', default=DEFAULT_SIZES,
+                        help="Tailles des cartes synthétiques (« 20x15 » ou côté « 1000 »)")
+    parser.add_argument('--grids', nargs='*', choices=wargame_terrain.GRID_TYPES, default=['square'],
+                        help="Grilles des cartes synthétiques")
+    parser.add_argument('--renderers', nargs='*', choices=RENDERERS, default=list(RENDERERS),
+                        help="Visualiseurs à mesurer")
+    parser.add_argument('--repeat', type=int, default=3, help="Passages par cas (durée médiane)")
+    parser.add_argument('--seed', type=int, default=0, help="Graine des cartes synthétiques")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Fichier de référence")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="Enregistrer les mesures comme nouvelle référence")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Dégradation tolérée par rapport à la référence (0.25 = 25 %%)")
+    args = parser.parse_args()
+
+    # Rendu sans fenêtre: pygame sur le pilote « dummy », Tk sur un écran virtuel
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    renderers = list(args.renderers)
+    display = None
+    if 'tk' in renderers or 'raster' in renderers:
+        display = start_virtual_display()
+        if not os.environ.get('DISPLAY') and sys.platform not in ('win32', 'darwin'):
+            print("Aucun écran ni Xvfb: mesures Tk ignorées")
+            renderers = [name for name in renderers if name == 'pygame']
+
+    try:
+        results = run_suite([parse_size(size) for size in args.sizes], args.grids, renderers,
+                            args.repeat, args.seed)
+    finally:
+        if display is not None:
+            display.terminate()
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Référence enregistrée dans {args.baseline} ({len(results)} cas)")
+        return
+
+    if not Path(args.baseline).exists():
+        print(f"Pas de référence ({args.baseline}): lancer avec --save-baseline pour en créer une")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} régression(s) au-delà de {args.tolerance:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"Aucune régression par rapport à {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Mesure des temps de recherche de chemins sur les cartes et sur de grandes cartes synthétiques
+
+    python wargame_benchmark_pathfinding.py
+    python wargame_benchmark_pathfinding.py --maps grande_bataille --sizes 500 1000 --queries 20
+"""
+import argparse
+import random
+import statistics
+import time
+
+import wargame_terrain
+from wargame_pathfinding import Pathfinder
+
+
+def synthetic_map(size, grid='square', seed=0, block=16, height=None, map_class=wargame_terrain.WargameMap):
+    """Carte de `size` tuiles de côté (ou `size` x `height`), faite de zones de terrain de `block` tuiles"""
+    width = size
+    height = size if height is None else height
+    rng = random.Random(seed)
+    terrain = wargame_terrain.TerrainGrid(width, height)
+    weights = [4, 1, 1, 2, 1, 4]  # Ordre de TERRAIN_TYPES: surtout de l'herbe et des plaines
+    types = range(len(wargame_terrain.TERRAIN_TYPES))
+    coarse_width = -(-width // block)
+
+    for by in range(-(-height // block)):
+        ids = rng.choices(types, weights, k=coarse_width)
+        row = b''.join(bytes([terrain_id]) * block for terrain_id in ids)[:width]
+        for y in range(by * block, min((by + 1) * block, height)):
+            terrain.cells[y * width:(y + 1) * width] = row
+    return map_class(f"Synthétique {width}x{height}", width, height, terrain, grid)
+
+
+def random_queries(pathfinder, count, rng):
+    """Paires (départ, arrivée) tirées parmi les tuiles franchissables"""
+    def passable_tile():
+        while True:
+            tile = (rng.randrange(pathfinder.width), rng.randrange(pathfinder.height))
+            if pathfinder.is_passable(*tile):
+                return tile
+
+    return [(passable_tile(), passable_tile()) for _ in range(count)]
+
+
+def benchmark_map(wargame_map, queries=50, seed=0):
+    """Affiche les temps par requête, une à une puis en lot"""
+    rng = random.Random(seed)
+
+    start = time.perf_counter()
+    pathfinder = Pathfinder(wargame_map)
+    setup_ms = (time.perf_counter() - start) * 1000
+
+    timings = []
+    found = 0
+    for source, target in random_queries(pathfinder, queries, rng):
+        start = time.perf_counter()
+        result = pathfinder.find_path(source, target)
+        timings.append((time.perf_counter() - start) * 1000)
+        found += result is not None
+
+    # Lot: quelques unités, plusieurs destinations chacune
+    sources = [source for source, _ in random_queries(pathfinder, max(queries // 10, 1), rng)]
+    batch = [(source, target) for source in sources
+             for _, target in random_queries(pathfinder, 10, rng)]
+    start = time.perf_counter()
+    pathfinder.find_paths(batch)
+    batch_ms = (time.perf_counter() - start) * 1000
+
+    print(f"{wargame_map.name} ({wargame_map.width}x{wargame_map.height}, {wargame_map.grid})")
+    print(f"  préparation      {setup_ms:9.1f} ms")
+    print(f"  requête médiane  {statistics.median(timings):9.2f} ms")
+    print(f"  requête moyenne  {statistics.mean(timings):9.2f} ms")
+    print(f"  requête maximale {max(timings):9.2f} ms  ({found}/{len(timings)} chemins trouvés)")
+    print(f"  lot              {batch_ms / len(batch):9.2f} ms par requête ({len(batch)} requêtes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mesure des performances de la recherche de chemins")
+    parser.add_argument('--maps-dir', default='maps', help="Dossier des cartes")
+    parser.add_argument('--maps', nargs='*', default=['grande_bataille'], help="Cartes à mesurer")
+    parser.add_argument('--sizes', nargs='*', type=int, default=[250, 1000],
+                        help="Côtés des cartes synthétiques")
+    parser.add_argument('--grids', nargs='*', choices=wargame_terrain.GRID_TYPES,
+                        default=list(wargame_terrain.GRID_TYPES), help="Grilles des cartes synthétiques")
+    parser.add_argument('--queries', type=int, default=50, help="Nombre de requêtes par carte")
+    parser.add_argument('--seed', type=int, default=0, help="Graine du tirage des requêtes")
+    args = parser.parse_args()
+
+    for map_name in args.maps:
+        map_path = wargame_terrain.find_map_file(args.maps_dir, map_name)
+        if map_path is None:
+            print(f"Map {map_name} introuvable dans {args.maps_dir}")
+            continue
+        benchmark_map(wargame_terrain.load_map_file(map_path), args.queries, args.seed)
+
+    for size in args.sizes:
+        for grid in args.grids:
+            benchmark_map(synthetic_map(size, grid, args.seed), args.queries, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Format binaire des cartes de wargame (ouverture par mmap, sans copie)
+
+Structure d'un fichier .wgm (entiers little-endian):
+
+    en-tête    magic 'WGMAP', version (u8), largeur (u32), hauteur (u32),
+               longueur du nom (u16), nombre de terrains (u16),
+               type de grille (u8: 0 carrée, 1 hexagonale; absent en version 1)
+    nom        UTF-8
+    palette    pour chaque terrain: longueur (u8) puis nom UTF-8
+    (bourrage jusqu'à un multiple de 8 octets)
+    grille     largeur * hauteur octets, ligne par ligne (identifiants de palette)
+
+Conversion en ligne de commande:
+
+    python wargame_binmap.py to-bin maps/grande_bataille.json
+    python wargame_binmap.py to-json maps/grande_bataille.wgm
+"""
+import argparse
+import json
+import mmap
+import struct
+from pathlib import Path
+
+from wargame_terrain import GRID_TYPES, TerrainGrid, WargameMap
+
+MAGIC = b'WGMAP'
+VERSION = 2
+HEADERS = {
+    1: struct.Struct('<5sBIIHH'),
+    2: struct.Struct('<5sBIIHHB'),
+}
+HEADER = HEADERS[VERSION]
+GRID_ALIGNMENT = 8
+BINARY_SUFFIX = '.wgm'
+
+
+def encode_header(name, width, height, palette, grid='square'):
+    """En-tête complet (bourrage compris) précédant la grille"""
+    name_bytes = name.encode('utf-8')
+    parts = [
+        HEADER.pack(MAGIC, VERSION, width, height, len(name_bytes), len(palette),
+                    GRID_TYPES.index(grid)),
+        name_bytes
+    ]
+    for terrain in palette:
+        terrain_bytes = terrain.encode('utf-8')
+        if len(terrain_bytes) > 255:
+            raise ValueError(f"Nom de terrain trop long: {terrain}")
+        parts.append(bytes([len(terrain_bytes)]))
+        parts.append(terrain_bytes)
+
+    header = b''.join(parts)
+    padding = -len(header) % GRID_ALIGNMENT
+    return header + b'\0' * padding
+
+
+def decode_header(buffer):
+    """Lit l'en-tête; retourne (nom, largeur, hauteur, palette, grille, début de la grille)"""
+    if len(buffer) < 6:
+        raise ValueError("Fichier de carte binaire tronqué")
+    if bytes(buffer[:5]) != MAGIC:
+        raise ValueError("Ce fichier n'est pas une carte binaire de wargame")
+    header = HEADERS.get(buffer[5])
+    if header is None:
+        raise ValueError(f"Version de carte binaire non supportée: {buffer[5]}")
+    if len(buffer) < header.size:
+        raise ValueError("Fichier de carte binaire tronqué")
+
+    fields = header.unpack_from(buffer, 0)
+    width, height, name_length, palette_count = fields[2:6]
+    grid = GRID_TYPES[fields[6]] if len(fields) > 6 else 'square'
+
+    offset = header.size
+    name = bytes(buffer[offset:offset + name_length]).decode('utf-8')
+    offset += name_length
+
+    palette = []
+    for _ in range(palette_count):
+        length = buffer[offset]
+        palette.append(bytes(buffer[offset + 1:offset + 1 + length]).decode('utf-8'))
+        offset += 1 + length
+
+    offset += -offset % GRID_ALIGNMENT
+    if len(buffer) < offset + width * height:
+        raise ValueError("Fichier de carte binaire tronqué")
+    return name, width, height, palette, grid, offset
+
+
+def write_map(wargame_map, path):
+    """Écrit une carte au format binaire"""
+    terrain = wargame_map.terrain
+    with open(path, 'wb') as f:
+        f.write(encode_header(
+            wargame_map.name,
+            wargame_map.width,
+            wargame_map.height,
+            terrain.palette,
+            wargame_map.grid
+        ))
+        f.write(terrain.cells)
+
+
+def write_cells(path, cells, indices):
+    """Réécrit dans une carte binaire les tuiles d'index donnés (palette et en-tête inchangés)
+
+    Les index consécutifs sont écrits d'un seul bloc.
+    """
+    with open(path, 'r+b') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                _, width, height, _, _, offset = decode_header(view)
+        if any(not 0 <= i < width * height for i in indices):
+            raise ValueError("Index de tuile hors de la carte")
+
+        start = end = None
+        for i in sorted(indices) + [None]:
+            if i is not None and i == end:
+                end += 1
+                continue
+            if start is not None:
+                f.seek(offset + start)
+                f.write(bytes(cells[start:end]))
+            start, end = i, (i + 1 if i is not None else None)
+
+
+def read_map(path, map_class=WargameMap):
+    """Ouvre une carte binaire; la grille reste dans le fichier projeté en mémoire
+
+    La projection est privée (copie à l'écriture): la grille peut être
+    modifiée en mémoire sans toucher au fichier, jusqu'à son enregistrement.
+    """
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    # Le mmap reste vivant tant que la vue sur la grille est référencée
+    view = memoryview(mapped)
+    name, width, height, palette, grid, offset = decode_header(view)
+    cells = view[offset:offset + width * height]
+    terrain = TerrainGrid(width, height, palette, cells)
+    return map_class(name, width, height, terrain, grid)
+
+
+def release_map(wargame_map):
+    """Copie en mémoire la grille d'une carte ouverte par read_map et ferme la projection
+
+    Sous Windows, un fichier projeté en mémoire ne peut pas être remplacé:
+    la projection doit être fermée avant de réécrire la carte.
+    """
+    terrain = wargame_map.terrain
+    cells = terrain.cells
+    if not isinstance(cells, memoryview) or not isinstance(cells.obj, mmap.mmap):
+        return
+    mapped = cells.obj
+    terrain.cells = bytearray(cells)
+    cells.release()
+    try:
+        mapped.close()
+    except BufferError:
+        # Une autre vue est encore référencée: le fichier sera libéré avec elle
+        pass
+
+
+def reopen_map(wargame_map, path):
+    """Projette à nouveau la grille d'une carte depuis son fichier (après release_map)"""
+    wargame_map.terrain.cells = read_map(path).terrain.cells
+
+
+def json_to_binary(json_path, output_path=None):
+    """Convertit une carte JSON en carte binaire"""
+    json_path = Path(json_path)
+    output_path = Path(output_path) if output_path else json_path.with_suffix(BINARY_SUFFIX)
+    with open(json_path, "r") as f:
+        wargame_map = WargameMap.from_dict(json.load(f))
+    write_map(wargame_map, output_path)
+    return output_path
+
+
+def binary_to_json(binary_path, output_path=None):
+    """Convertit une carte binaire en carte JSON"""
+    binary_path = Path(binary_path)
+    output_path = Path(output_path) if output_path else binary_path.with_suffix('.json')
+    wargame_map = read_map(binary_path)
+    with open(output_path, "w") as f:
+        json.dump(wargame_map.to_dict(), f, indent=2)
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conversion des cartes JSON <-> binaire (.wgm)")
+    parser.add_argument('command', choices=['to-bin', 'to-json'], help="Sens de la conversion")
+    parser.add_argument('files', nargs='+', help="Cartes à convertir")
+    parser.add_argument('-o', '--output', help="Fichier de sortie (une seule carte en entrée)")
+    args = parser.parse_args()
+
+    if args.output and len(args.files) > 1:
+        parser.error("--output n'est possible qu'avec une seule carte")
+
+    convert = json_to_binary if args.command == 'to-bin' else binary_to_json
+    for file in args.files:
+        output_path = convert(file, args.output)
+        print(f"{file} -> {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Catalogue persistant des cartes disponibles, avec miniatures
+
+L'index est rangé dans `maps/.catalog/index.json`, les miniatures (PNG) à côté.
+Au démarrage, seules les cartes dont la date de modification ou la taille a
+changé sont relues; si leur contenu (empreinte SHA-256) est identique, la
+miniature existante est conservée.
+"""
+import hashlib
+import json
+import os
+import struct
+import zlib
+from pathlib import Path
+
+import wargame_terrain
+
+CATALOG_DIR = '.catalog'
+INDEX_FILE = 'index.json'
+INDEX_VERSION = 1
+THUMBNAIL_SIZE = 64  # Plus grand côté d'une miniature, en pixels
+
+
+def file_hash(path):
+    """Empreinte SHA-256 du contenu d'un fichier"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_png(path, width, height, pixels):
+    """Écrit une image RGB 8 bits en PNG (sans dépendance externe)"""
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body))
+
+    row_size = width * 3
+    raw = b''.join(
+        b'\0' + pixels[y * row_size:(y + 1) * row_size]
+        for y in range(height)
+    )
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(raw, 9)))
+        f.write(chunk(b'IEND', b''))
+
+
+def render_thumbnail(wargame_map, max_size=THUMBNAIL_SIZE):
+    """Miniature RGB (largeur, hauteur, pixels) échantillonnée au plus proche voisin"""
+    scale = max_size / max(wargame_map.width, wargame_map.height, 1)
+    width = max(1, round(wargame_map.width * scale))
+    height = max(1, round(wargame_map.height * scale))
+
+    terrain = wargame_map.terrain
+    colors = [
+        bytes(color) for color in terrain.color_table(
+            wargame_terrain.TERRAIN_COLORS,
+            wargame_terrain.UNKNOWN_TERRAIN_COLOR
+        )
+    ]
+    columns = [min(int(x / scale), wargame_map.width - 1) for x in range(width)]
+
+    rows = []
+    for y in range(height):
+        row = terrain.row_ids(min(int(y / scale), wargame_map.height - 1))
+        rows.append(b''.join(colors[row[x]] for x in columns))
+    return width, height, b''.join(rows)
+
+
+class MapCatalog:
+    """Index des cartes d'un dossier, revalidé par date de modification et taille"""
+
+    def __init__(self, maps_dir):
+        self.maps_dir = Path(maps_dir)
+        self.catalog_dir = self.maps_dir / CATALOG_DIR
+        self.index_path = self.catalog_dir / INDEX_FILE
+        self.entries = {}
+        self.load()
+
+    def load(self):
+        """Lit l'index sauvegardé (ignoré s'il est illisible ou d'une autre version)"""
+        try:
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+            if index.get("version") == INDEX_VERSION:
+                self.entries = index["maps"]
+        except (OSError, ValueError, KeyError):
+            self.entries = {}
+
+    def save(self):
+        """Écrit l'index de manière atomique"""
+        self.catalog_dir.mkdir(parents=True, exist_ok=True)
+        temp_path = self.index_path.with_suffix('.tmp')
+        with open(temp_path, "w") as f:
+            json.dump({"version": INDEX_VERSION, "maps": self.entries}, f, indent=2)
+        os.replace(temp_path, self.index_path)
+
+    def refresh(self):
+        """Met l'index à jour; ne relit que les cartes modifiées. Retourne les noms disponibles"""
+        names = wargame_terrain.list_map_names(self.maps_dir)
+        changed = False
+
+        for name in names:
+            map_path = wargame_terrain.find_map_file(self.maps_dir, name)
+            stat = map_path.stat()
+            entry = self.entries.get(name)
+            if entry and entry["file"] == map_path.name \
+                    and entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size \
+                    and self.thumbnail_path(name) is not None:
+                continue
+
+            try:
+                self.entries[name] = self.index_map(name, map_path, stat, entry)
+                changed = True
+            except Exception as e:
+                print(f"Erreur lors de l'indexation de la map {name}: {e}")
+                if self.entries.pop(name, None) is not None:
+                    changed = True
+
+        # Oublier les cartes supprimées
+        for name in list(self.entries):
+            if name not in names:
+                del self.entries[name]
+                thumbnail = self.catalog_dir / f"{name}.png"
+                if thumbnail.exists():
+                    thumbnail.unlink()
+                changed = True
+
+        if changed:
+            self.save()
+        return names
+
+    def index_map(self, name, map_path, stat, previous=None):
+        """Entrée d'index d'une carte (relue seulement si son contenu a changé)"""
+        content_hash = file_hash(map_path)
+        if previous and previous["hash"] == content_hash and previous["file"] == map_path.name \
+                and self.thumbnail_path(name) is not None:
+            return dict(previous, mtime=stat.st_mtime_ns, size=stat.st_size)
+
+        wargame_map = wargame_terrain.load_map_file(map_path)
+        self.catalog_dir.mkdir(parents=True, exist_ok=True)
+        write_png(self.catalog_dir / f"{name}.png", *render_thumbnail(wargame_map))
+
+        return {
+            "file": map_path.name,
+            "name": wargame_map.name,
+            "width": wargame_map.width,
+            "height": wargame_map.height,
+            "histogram": wargame_map.terrain.histogram(),
+            "hash": content_hash,
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "thumbnail": f"{name}.png"
+        }
+
+    def thumbnail_path(self, name):
+        """Chemin de la miniature d'une carte, ou None si elle n'existe pas"""
+        thumbnail = self.catalog_dir / f"{name}.png"
+        return thumbnail if thumbnail.exists() else None
+
+    def label(self, name):
+        """Libellé affiché dans les menus: nom et dimensions de la carte"""
+        entry = self.entries.get(name)
+        if not entry:
+            return name
+        return f"{entry['name']} ({entry['width']}x{entry['height']})"
+
+    def labels(self, names):
+        """Libellés uniques des cartes, dans l'ordre de `names`"""
+        labels = []
+        for name in names:
+            label = self.label(name)
+            if label in labels:
+                label = f"{label} [{name}]"
+            labels.append(label)
+        return labels
@@ -0,0 +1,137 @@
+"""Monde découpé en blocs (chunks) chargés, rendus et évincés à la demande"""
+from collections import OrderedDict
+
+
+class ChunkCache:
+    """Cache LRU borné par un budget mémoire (en octets)"""
+
+    def __init__(self, budget_bytes, sizeof):
+        self.budget_bytes = budget_bytes
+        self.sizeof = sizeof
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.used_bytes = 0
+
+    def get(self, key):
+        """Retourne l'entrée (marquée comme récemment utilisée) ou None"""
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """Ajoute une entrée puis évince les plus anciennes au-delà du budget"""
+        self.discard(key)
+        size = self.sizeof(value)
+        self.entries[key] = value
+        self.sizes[key] = size
+        self.used_bytes += size
+
+        # On garde toujours la dernière entrée, même si elle dépasse seule le budget
+        while self.used_bytes > self.budget_bytes and len(self.entries) > 1:
+            old_key, _ = self.entries.popitem(last=False)
+            self.used_bytes -= self.sizes.pop(old_key)
+
+    def discard(self, key):
+        """Retire une entrée si elle est présente"""
+        if key in self.entries:
+            del self.entries[key]
+            self.used_bytes -= self.sizes.pop(key)
+
+    def clear(self):
+        """Vide le cache"""
+        self.entries.clear()
+        self.sizes.clear()
+        self.used_bytes = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class ChunkedWorld:
+    """Carte découpée en blocs carrés de `chunk_size` tuiles
+
+    `render_chunk(x0, y0, x1, y1)` produit le rendu d'un bloc (coordonnées en
+    tuiles, bornes exclusives) et `sizeof(rendu)` sa taille en octets. Les blocs
+    sont rendus à la première demande, gardés dans un cache LRU borné par
+    `budget_bytes`, et ceux situés juste après la vue dans la direction du
+    déplacement sont préchargés par `prefetch`.
+    """
+
+    def __init__(self, width, height, render_chunk, sizeof, chunk_size=16,
+                 budget_bytes=256 * 1024 * 1024):
+        self.width = width
+        self.height = height
+        self.render_chunk = render_chunk
+        self.chunk_size = chunk_size
+        self.chunks_x = -(-width // chunk_size)
+        self.chunks_y = -(-height // chunk_size)
+        self.cache = ChunkCache(budget_bytes, sizeof)
+        self.prefetch_queue = []
+
+    def chunk_bounds(self, cx, cy):
+        """Plage de tuiles (x0, y0, x1, y1) couverte par le bloc (cx, cy)"""
+        x0 = cx * self.chunk_size
+        y0 = cy * self.chunk_size
+        return x0, y0, min(x0 + self.chunk_size, self.width), min(y0 + self.chunk_size, self.height)
+
+    def chunk_range(self, x0, y0, x1, y1):
+        """Blocs (cx0, cy0, cx1, cy1) couvrant une plage de tuiles, bornes exclusives"""
+        size = self.chunk_size
+        cx0 = min(max(x0 // size, 0), self.chunks_x)
+        cy0 = min(max(y0 // size, 0), self.chunks_y)
+        cx1 = min(max(-(-x1 // size), cx0), self.chunks_x)
+        cy1 = min(max(-(-y1 // size), cy0), self.chunks_y)
+        return cx0, cy0, cx1, cy1
+
+    def get_chunk(self, cx, cy):
+        """Rendu du bloc (cx, cy), calculé si absent du cache"""
+        chunk = self.cache.get((cx, cy))
+        if chunk is None:
+            chunk = self.render_chunk(*self.chunk_bounds(cx, cy))
+            self.cache.put((cx, cy), chunk)
+        return chunk
+
+    def visible_chunks(self, x0, y0, x1, y1, direction=(0, 0)):
+        """Blocs visibles pour une plage de tuiles; prépare le préchargement
+
+        `direction` est le sens du déplacement (dx, dy) en pixels écran: les
+        blocs de la rangée suivante dans ce sens sont mis en file d'attente.
+        """
+        cx0, cy0, cx1, cy1 = self.chunk_range(x0, y0, x1, y1)
+        visible = [(cx, cy) for cy in range(cy0, cy1) for cx in range(cx0, cx1)]
+
+        # Le contenu se déplace dans le sens du pan: les nouveaux blocs
+        # apparaissent donc du côté opposé
+        dx, dy = direction
+        ahead = []
+        if dx < 0 and cx1 < self.chunks_x:
+            ahead += [(cx1, cy) for cy in range(cy0, cy1)]
+        elif dx > 0 and cx0 > 0:
+            ahead += [(cx0 - 1, cy) for cy in range(cy0, cy1)]
+        if dy < 0 and cy1 < self.chunks_y:
+            ahead += [(cx, cy1) for cx in range(cx0, cx1)]
+        elif dy > 0 and cy0 > 0:
+            ahead += [(cx, cy0 - 1) for cx in range(cx0, cx1)]
+        if ahead:
+            self.prefetch_queue = [key for key in ahead if key not in self.cache]
+
+        return visible
+
+    def prefetch(self, max_chunks=1):
+        """Rend quelques blocs en attente de préchargement; retourne le nombre rendu"""
+        rendered = 0
+        while self.prefetch_queue and rendered < max_chunks:
+            cx, cy = self.prefetch_queue.pop(0)
+            if (cx, cy) not in self.cache:
+                self.get_chunk(cx, cy)
+                rendered += 1
+        return rendered
+
+    def clear(self):
+        """Oublie tous les blocs rendus (par exemple après un changement de style)"""
+        self.cache.clear()
+        self.prefetch_queue = []
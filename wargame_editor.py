@@ -0,0 +1,215 @@
+"""Édition du terrain: pinceau, journal d'annulation compact et enregistrement
+
+Le terrain est modifié en place, tuile par tuile. Pendant un trait de
+pinceau, seules les tuiles peintes sont notées (index et identifiant
+d'origine); à la fin du trait, le journal garde leurs index et leurs
+identifiants avant et après (5 octets par tuile). Peindre, annuler ou
+rétablir un trait coûte donc le nombre de tuiles touchées, pas la taille
+de la carte; les visualiseurs ne redessinent que ces tuiles.
+
+Les éditeurs sont gardés par fichier de carte (`editor_for_map`): quitter
+une carte puis y revenir retrouve ses modifications non enregistrées et son
+journal, même si le chargeur a relu le fichier entre-temps.
+
+L'enregistrement réécrit le fichier d'origine: JSON en entier, carte
+binaire (.wgm) en ne réécrivant que les octets modifiés tant que la palette
+n'a pas changé.
+"""
+import json
+import os
+from array import array
+from pathlib import Path
+
+import wargame_binmap
+from wargame_hex import offset_distance
+from wargame_terrain import TERRAIN_TYPES
+
+
+class TerrainEditor:
+    """Pinceau de terrain sur une carte, avec annulation et enregistrement
+
+    `max_undo_tiles` borne le nombre total de tuiles gardées par le journal:
+    au-delà, les traits les plus anciens sont oubliés.
+    """
+
+    def __init__(self, wargame_map, map_path=None, max_undo_tiles=1000000):
+        self.map = wargame_map
+        self.terrain = wargame_map.terrain
+        self.width = wargame_map.width
+        self.height = wargame_map.height
+        self.map_path = Path(map_path) if map_path else None
+        self.brush_terrain = TERRAIN_TYPES[0]
+        self.brush_radius = 0  # 0: une seule tuile
+        self.max_brush_radius = 10
+
+        # Journal: un trait = (index des tuiles, identifiants avant, après)
+        self.undo_log = []
+        self.redo_log = []
+        self.undo_tiles = 0
+        self.max_undo_tiles = max_undo_tiles
+        self.stroke = None  # Trait en cours: index -> identifiant d'origine
+        self.last_point = None  # Dernière tuile du trait en cours
+
+        # Tuiles modifiées depuis le dernier enregistrement, et palette enregistrée
+        self.unsaved = set()
+        self.saved_palette_size = len(self.terrain.palette)
+
+    def brush_tiles(self, x, y):
+        """Tuiles couvertes par le pinceau centré en (x, y), limitées à la carte"""
+        radius = self.brush_radius
+        tiles = []
+        for ty in range(max(y - radius, 0), min(y + radius + 1, self.height)):
+            for tx in range(max(x - radius, 0), min(x + radius + 1, self.width)):
+                if self.map.grid == 'hex':
+                    inside = offset_distance(x, y, tx, ty) <= radius
+                else:
+                    inside = (tx - x) ** 2 + (ty - y) ** 2 <= radius * radius
+                if inside:
+                    tiles.append((tx, ty))
+        return tiles
+
+    def begin_stroke(self):
+        """Commence un trait (une seule entrée du journal d'annulation)"""
+        self.end_stroke()
+        self.stroke = {}
+        self.last_point = None
+
+    def paint(self, x, y):
+        """Peint avec le pinceau en (x, y), et le long du chemin depuis le point précédent du trait
+
+        Retourne les tuiles (x, y) dont le terrain a changé.
+        """
+        if self.stroke is None:
+            self.begin_stroke()
+        points = [(x, y)]
+        if self.last_point is not None:
+            # Mouvement rapide de la souris: combler l'écart entre deux positions
+            last_x, last_y = self.last_point
+            steps = max(abs(x - last_x), abs(y - last_y))
+            points = [
+                (round(last_x + (x - last_x) * i / steps), round(last_y + (y - last_y) * i / steps))
+                for i in range(1, steps + 1)
+            ]
+        self.last_point = (x, y)
+
+        terrain_id = self.terrain.terrain_id(self.brush_terrain)
+        cells = self.terrain.cells
+        stroke = self.stroke
+        changed = []
+        for px, py in points:
+            for tx, ty in self.brush_tiles(px, py):
+                i = ty * self.width + tx
+                old_id = cells[i]
+                if old_id == terrain_id:
+                    continue
+                stroke.setdefault(i, old_id)
+                cells[i] = terrain_id
+                self.unsaved.add(i)
+                changed.append((tx, ty))
+        return changed
+
+    def end_stroke(self):
+        """Termine le trait en cours et l'ajoute au journal s'il a modifié des tuiles"""
+        stroke = self.stroke
+        self.stroke = None
+        self.last_point = None
+        if not stroke:
+            return
+        cells = self.terrain.cells
+        indices = array('I', stroke)
+        entry = (indices, bytes(stroke.values()), bytes(cells[i] for i in indices))
+        self.undo_log.append(entry)
+        self.undo_tiles += len(indices)
+        self.redo_log = []
+        while self.undo_tiles > self.max_undo_tiles and len(self.undo_log) > 1:
+            self.undo_tiles -= len(self.undo_log.pop(0)[0])
+
+    def apply(self, indices, ids):
+        """Écrit des identifiants sur des tuiles; retourne les tuiles (x, y) modifiées"""
+        cells = self.terrain.cells
+        width = self.width
+        for i, terrain_id in zip(indices, ids):
+            cells[i] = terrain_id
+        self.unsaved.update(indices)
+        return [(i % width, i // width) for i in indices]
+
+    def undo(self):
+        """Annule le dernier trait; retourne les tuiles modifiées"""
+        self.end_stroke()
+        if not self.undo_log:
+            return []
+        indices, before, after = self.undo_log.pop()
+        self.undo_tiles -= len(indices)
+        self.redo_log.append((indices, before, after))
+        return self.apply(indices, before)
+
+    def redo(self):
+        """Rétablit le dernier trait annulé; retourne les tuiles modifiées"""
+        self.end_stroke()
+        if not self.redo_log:
+            return []
+        indices, before, after = self.redo_log.pop()
+        self.undo_log.append((indices, before, after))
+        self.undo_tiles += len(indices)
+        return self.apply(indices, after)
+
+    def has_unsaved_changes(self):
+        """Vrai si le terrain a changé depuis le dernier enregistrement"""
+        return bool(self.unsaved)
+
+    def has_history(self):
+        """Vrai s'il reste des modifications à enregistrer, annuler ou rétablir"""
+        return bool(self.unsaved or self.undo_log or self.redo_log)
+
+    def save(self):
+        """Enregistre la carte dans son fichier d'origine; retourne son chemin"""
+        self.end_stroke()
+        if self.map_path is None:
+            raise ValueError(f"La carte {self.map.name} n'a pas de fichier d'origine")
+
+        palette_size = len(self.terrain.palette)
+        if self.map_path.suffix == wargame_binmap.BINARY_SUFFIX:
+            if palette_size == self.saved_palette_size:
+                # Palette (donc en-tête) inchangée: seuls les octets modifiés sont réécrits
+                wargame_binmap.write_cells(self.map_path, self.terrain.cells, self.unsaved)
+            else:
+                temp_path = self.map_path.with_suffix('.tmp')
+                wargame_binmap.write_map(self.map, temp_path)
+                # La grille est projetée depuis le fichier à remplacer: la copier
+                # en mémoire le temps du remplacement (impossible sinon sous Windows)
+                wargame_binmap.release_map(self.map)
+                try:
+                    os.replace(temp_path, self.map_path)
+                except OSError:
+                    # Fichier encore ouvert ailleurs: la carte reste modifiée en mémoire
+                    os.remove(temp_path)
+                    raise
+                wargame_binmap.reopen_map(self.map, self.map_path)
+        else:
+            temp_path = self.map_path.with_suffix('.tmp')
+            with open(temp_path, "w") as f:
+                json.dump(self.map.to_dict(), f, indent=2)
+            os.replace(temp_path, self.map_path)
+
+        self.unsaved.clear()
+        self.saved_palette_size = palette_size
+        return self.map_path
+
+
+def editor_for_map(editors, wargame_map):
+    """Éditeur d'une carte qui va être affichée, gardé dans `editors` (fichier -> éditeur)
+
+    Si un éditeur ouvert sur le même fichier a encore des modifications ou un
+    journal, il est réutilisé: sa carte (`editor.map`), modifiée en mémoire,
+    est alors celle à afficher, même si `wargame_map` vient d'être relue. Les
+    éditeurs sans historique sont oubliés.
+    """
+    for path in [path for path, editor in editors.items() if not editor.has_history()]:
+        del editors[path]
+
+    editor = editors.get(wargame_map.path)
+    if editor is None:
+        editor = TerrainEditor(wargame_map, wargame_map.path)
+        if wargame_map.path is not None:
+            editors[wargame_map.path] = editor
+    return editor
@@ -0,0 +1,175 @@
+"""Géométrie des grilles hexagonales (hexagones « pointe en haut »)
+
+Trois systèmes de coordonnées sont utilisés:
+
+- offset (col, row): lignes impaires décalées d'un demi-hexagone vers la droite
+  (« odd-r »), c'est le stockage des cartes (terrain[row][col]);
+- axial (q, r): pratique pour les voisins et les distances;
+- cube (x, y, z) avec x + y + z = 0: utilisé pour l'arrondi.
+
+Les coins d'un hexagone et les centres d'une ligne sont obtenus par des
+tables précalculées et des additions: aucun appel trigonométrique par case.
+"""
+import math
+from functools import lru_cache
+
+SQRT3 = math.sqrt(3)
+
+# Voisins en coordonnées axiales (est, nord-est, nord-ouest, ouest, sud-ouest, sud-est)
+AXIAL_DIRECTIONS = ((1, 0), (1, -1), (0, -1), (-1, 0), (-1, 1), (0, 1))
+
+# Voisins en coordonnées offset « odd-r », selon la parité de la ligne
+OFFSET_DIRECTIONS = (
+    ((1, 0), (0, -1), (-1, -1), (-1, 0), (-1, 1), (0, 1)),  # Lignes paires
+    ((1, 0), (1, -1), (0, -1), (-1, 0), (0, 1), (1, 1)),    # Lignes impaires
+)
+
+
+def offset_to_axial(col, row):
+    """Coordonnées offset (odd-r) -> axiales"""
+    return col - (row - (row & 1)) // 2, row
+
+
+def axial_to_offset(q, r):
+    """Coordonnées axiales -> offset (odd-r)"""
+    return q + (r - (r & 1)) // 2, r
+
+
+def axial_to_cube(q, r):
+    """Coordonnées axiales -> cube"""
+    return q, -q - r, r
+
+
+def cube_to_axial(x, y, z):
+    """Coordonnées cube -> axiales"""
+    return x, z
+
+
+def cube_round(x, y, z):
+    """Arrondit des coordonnées cube fractionnaires à l'hexagone le plus proche"""
+    rx, ry, rz = round(x), round(y), round(z)
+    dx, dy, dz = abs(rx - x), abs(ry - y), abs(rz - z)
+    if dx > dy and dx > dz:
+        rx = -ry - rz
+    elif dy > dz:
+        ry = -rx - rz
+    else:
+        rz = -rx - ry
+    return rx, ry, rz
+
+
+def axial_round(q, r):
+    """Arrondit des coordonnées axiales fractionnaires"""
+    return cube_to_axial(*cube_round(q, -q - r, r))
+
+
+def axial_distance(q1, r1, q2, r2):
+    """Distance en nombre de cases entre deux hexagones (coordonnées axiales)"""
+    dq = q1 - q2
+    dr = r1 - r2
+    return (abs(dq) + abs(dr) + abs(dq + dr)) // 2
+
+
+def offset_distance(col1, row1, col2, row2):
+    """Distance en nombre de cases entre deux hexagones (coordonnées offset)"""
+    return axial_distance(*offset_to_axial(col1, row1), *offset_to_axial(col2, row2))
+
+
+def axial_neighbors(q, r):
+    """Les six voisins d'un hexagone (coordonnées axiales)"""
+    return [(q + dq, r + dr) for dq, dr in AXIAL_DIRECTIONS]
+
+
+def offset_neighbors(col, row, width=None, height=None):
+    """Voisins d'un hexagone en coordonnées offset, limités à la carte si ses dimensions sont données"""
+    neighbors = []
+    for dcol, drow in OFFSET_DIRECTIONS[row & 1]:
+        ncol, nrow = col + dcol, row + drow
+        if width is not None and not (0 <= ncol < width and 0 <= nrow < height):
+            continue
+        neighbors.append((ncol, nrow))
+    return neighbors
+
+
+@lru_cache(maxsize=64)
+def corner_offsets(size):
+    """Décalages (dx, dy) des six coins par rapport au centre, pour une taille donnée"""
+    offsets = []
+    for i in range(6):
+        angle = math.radians(60 * i + 30)  # +30° pour une pointe en haut
+        offsets.append((size * math.cos(angle), size * math.sin(angle)))
+    return tuple(offsets)
+
+
+class HexLayout:
+    """Disposition à l'écran d'une grille hexagonale « odd-r »
+
+    `size` est la distance du centre à un coin; `origin` la position du centre
+    de l'hexagone (0, 0).
+    """
+
+    def __init__(self, size, origin=(0.0, 0.0)):
+        self.size = size
+        self.origin = origin
+        self.hex_width = SQRT3 * size
+        self.hex_height = 2 * size
+        self.horiz_spacing = self.hex_width
+        self.vert_spacing = self.hex_height * 3 / 4
+        self.corners = corner_offsets(size)
+
+    def center(self, col, row):
+        """Centre à l'écran de la case (col, row)"""
+        x = self.origin[0] + col * self.horiz_spacing + (row & 1) * self.horiz_spacing / 2
+        y = self.origin[1] + row * self.vert_spacing
+        return x, y
+
+    def row_centers(self, row, col0, col1):
+        """Abscisses des centres des cases col0..col1-1 d'une ligne, et leur ordonnée"""
+        x, y = self.center(col0, row)
+        spacing = self.horiz_spacing
+        return [x + i * spacing for i in range(col1 - col0)], y
+
+    def centers(self, col0, row0, col1, row1):
+        """Itère (col, row, x, y) sur un rectangle de cases, ligne par ligne"""
+        for row in range(row0, row1):
+            xs, y = self.row_centers(row, col0, col1)
+            for col, x in zip(range(col0, col1), xs):
+                yield col, row, x, y
+
+    def polygon(self, x, y):
+        """Coordonnées aplaties [x0, y0, x1, y1, ...] des coins d'un hexagone centré en (x, y)"""
+        points = []
+        for dx, dy in self.corners:
+            points.append(x + dx)
+            points.append(y + dy)
+        return points
+
+    def pixel_to_axial(self, px, py):
+        """Hexagone (axial) contenant le point écran (px, py)"""
+        x = (px - self.origin[0]) / self.size
+        y = (py - self.origin[1]) / self.size
+        q = SQRT3 / 3 * x - y / 3
+        r = 2 / 3 * y
+        return axial_round(q, r)
+
+    def pixel_to_offset(self, px, py):
+        """Case (col, row) contenant le point écran (px, py)"""
+        return axial_to_offset(*self.pixel_to_axial(px, py))
+
+    def offset_range(self, x0, y0, x1, y1, width, height):
+        """Rectangle de cases (col0, row0, col1, row1) couvrant un rectangle écran, borné à la carte"""
+        col0 = math.floor((x0 - self.origin[0] - self.hex_width) / self.horiz_spacing)
+        col1 = math.ceil((x1 - self.origin[0] + self.hex_width) / self.horiz_spacing)
+        row0 = math.floor((y0 - self.origin[1] - self.size) / self.vert_spacing)
+        row1 = math.ceil((y1 - self.origin[1] + self.size) / self.vert_spacing)
+
+        col0 = min(max(col0, 0), width)
+        row0 = min(max(row0, 0), height)
+        return col0, row0, min(max(col1, col0), width), min(max(row1, row0), height)
+
+    def pixel_size(self, width, height):
+        """Dimensions en pixels d'une carte de width x height cases (hors origine)"""
+        return (
+            width * self.horiz_spacing + self.horiz_spacing / 2,
+            (height - 1) * self.vert_spacing + self.hex_height if height else 0
+        )
@@ -0,0 +1,93 @@
+"""Chargement des cartes en arrière-plan sur un pool de threads"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import wargame_terrain
+
+
+class MapLoader:
+    """Prépare les cartes dans des threads de travail, avec annulation et préchargement
+
+    `prepare(map_name)` s'exécute dans un thread de travail. Son résultat (ou
+    son exception) est transmis à `deliver(map_name, result, error)`, appelé
+    depuis ce même thread: c'est au visualiseur de le ramener dans le thread
+    de l'interface. Seule la dernière demande est livrée; les cartes
+    préchargées restent en cache pour une sélection ultérieure.
+    """
+
+    def __init__(self, prepare, deliver, max_workers=2, cache_size=4):
+        self.prepare = prepare
+        self.deliver = deliver
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='map-loader')
+        self.cache_size = max(cache_size, 1)
+        self.futures = OrderedDict()  # clé -> Future, du plus ancien au plus récent
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.pending = None  # Clé de la demande en cours
+
+    def submit(self, key, map_name):
+        """Lance (ou réutilise) la préparation d'une carte; à appeler sous le verrou"""
+        future = self.futures.get(key)
+        if future is None or future.cancelled():
+            future = self.executor.submit(self.prepare, map_name)
+            self.futures[key] = future
+        self.futures.move_to_end(key)
+
+        # Évincer les plus anciennes, sauf la demande en cours
+        for old_key in list(self.futures):
+            if len(self.futures) <= self.cache_size:
+                break
+            if old_key != self.pending and old_key != key:
+                self.futures.pop(old_key).cancel()
+        return future
+
+    def request(self, key, map_name):
+        """Demande une carte; les demandes précédentes ne seront plus livrées"""
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+            self.pending = key
+            future = self.submit(key, map_name)
+        future.add_done_callback(lambda f: self.finish(f, map_name, generation))
+
+    def finish(self, future, map_name, generation):
+        """Livre le résultat s'il correspond toujours à la dernière demande"""
+        if future.cancelled():
+            return
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.pending = None
+
+        error = future.exception()
+        self.deliver(map_name, None if error else future.result(), error)
+
+    def prefetch(self, maps):
+        """Précharge des cartes, données comme une liste de (clé, nom)"""
+        with self.lock:
+            for key, map_name in maps:
+                if key not in self.futures:
+                    self.submit(key, map_name)
+
+    def cancel(self):
+        """Abandonne la demande en cours (son résultat reste en cache)"""
+        with self.lock:
+            self.generation += 1
+            self.pending = None
+
+    def is_loading(self):
+        """Vrai si une demande attend encore son résultat"""
+        return self.pending is not None
+
+    def shutdown(self):
+        """Arrête le pool sans attendre les préparations en cours"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def map_cache_key(map_name, maps_dir="maps"):
+    """Clé de cache d'une carte: nom, fichier et date de modification"""
+    map_path = wargame_terrain.find_map_file(maps_dir, map_name)
+    if map_path is None:
+        return (map_name, None, None)
+    return (map_name, map_path.name, map_path.stat().st_mtime_ns)
@@ -1,7 +1,26 @@
+import argparse
+import math
+import time
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from PIL import Image, ImageTk
 
+from wargame_profiler import add_profile_arguments, profiler_from_args
+from wargame_pyramid import PYRAMID_FILE, TilePyramid, find_pyramid
+
+# Les scans de cartes dépassent souvent la limite anti « bombe de décompression »
+# de Pillow (~179 mégapixels); ils ne sont décodés en entier qu'au zoom maximal
+Image.MAX_IMAGE_PIXELS = max(Image.MAX_IMAGE_PIXELS or 0, 1 << 30)
+
+
+def normalize_mode(image):
+    """Image décodée dans un mode que Tk affiche directement (RGB, RGBA ou L)"""
+    if image.mode in ('RGB', 'RGBA', 'L'):
+        image.load()
+        return image
+    has_alpha = image.mode in ('LA', 'PA') or 'transparency' in image.info
+    return image.convert('RGBA' if has_alpha else 'RGB')
+
 
 class MapViewer:
     """Visualiseur de carte de wargame simple"""
@@ -12,8 +31,18 @@ class MapViewer:
         self.root.title("Wargame Map Viewer")
         self.root.geometry("1200x800")
 
-        # Variables pour l'image
-        self.original_image = None  # Image PIL originale
+        # Variables pour l'image. L'image originale est seulement ouverte (en-tête
+        # lu): chaque niveau réduit n'est décodé qu'à la première demande, en
+        # réduction au décodage pour les JPEG (mode brouillon 1/2, 1/4, 1/8), et
+        # les niveaux plus fins que celui affiché sont libérés après chaque rendu
+        self.original_image = None  # Image PIL originale (pixels non décodés si ouverte depuis un fichier)
+        self.image_path = None
+        self.pyramid = {}  # Facteur de réduction (1, 2, 4...) -> niveau décodé
+        self.pyramid_factors = []  # Facteurs disponibles, du plus fin au plus réduit
+        self.min_pyramid_size = 256  # Taille minimale du plus petit niveau
+        # Pyramide de tuiles exportée (wargame_pyramid.py): remplace l'image,
+        # seules les tuiles de la vue sont lues, au niveau adapté au zoom
+        self.tile_pyramid = None
         self.photo_image = None  # PhotoImage pour Tkinter
         self.image_id = None  # ID de l'image sur le canvas
 
@@ -29,6 +58,27 @@ class MapViewer:
         self.min_zoom = 0.1
         self.max_zoom = 5.0
 
+        # Zoom progressif: aperçu rapide pendant la rafale de molette,
+        # rendu haute qualité une fois la molette immobile
+        self.progressive_zoom = True
+        self.preview_resample = Image.Resampling.NEAREST
+        self.final_resample = Image.Resampling.LANCZOS
+        self.refine_delay_ms = 150
+        self.refine_job = None
+
+        # Entrées regroupées: les déplacements de la souris et les crans de
+        # molette s'accumulent et sont appliqués au plus une fois par image
+        self.frame_ms = 16
+        self.input_job = None
+        self.last_input_flush = 0.0
+        self.pending_pan = (0, 0)
+        self.pending_zoom_steps = 0
+        self.zoom_anchor = (0, 0)
+
+        # Profilage (--profile): None tant qu'il n'est pas demandé
+        self.profiler = None
+        self.profile_item = None
+
         # Créer l'interface
         self.create_menu()
         self.create_canvas()
@@ -42,6 +92,7 @@ class MapViewer:
         file_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Fichier", menu=file_menu)
         file_menu.add_command(label="Charger carte JPG...", command=self.load_image)
+        file_menu.add_command(label="Ouvrir pyramide de tuiles...", command=self.load_pyramid)
         file_menu.add_separator()
         file_menu.add_command(label="Quitter", command=self.root.quit)
 
@@ -88,6 +139,7 @@ class MapViewer:
         self.canvas.bind('<B1-Motion>', self.on_drag_move)
         self.canvas.bind('<ButtonRelease-1>', self.on_drag_end)
         self.canvas.bind('<MouseWheel>', self.on_mouse_wheel)
+        self.canvas.bind('<Configure>', self.on_canvas_resize)
 
         # Message d'accueil
         self.canvas.create_text(
@@ -98,73 +150,227 @@ class MapViewer:
             tags='welcome'
         )
 
-    def load_image(self):
-        """Charge une image JPG depuis un fichier"""
-        file_path = filedialog.askopenfilename(
-            title="Sélectionner une carte",
-            filetypes=[
-                ("Images", "*.jpg *.jpeg *.png *.bmp *.gif"),
-                ("JPEG", "*.jpg *.jpeg"),
-                ("PNG", "*.png"),
-                ("Tous les fichiers", "*.*")
-            ]
-        )
+    def load_image(self, file_path=None):
+        """Charge une image JPG depuis un fichier (ou une pyramide via son manifeste)"""
+        if file_path is None:
+            file_path = filedialog.askopenfilename(
+                title="Sélectionner une carte",
+                filetypes=[
+                    ("Images", "*.jpg *.jpeg *.png *.bmp *.gif"),
+                    ("JPEG", "*.jpg *.jpeg"),
+                    ("PNG", "*.png"),
+                    ("Pyramide de tuiles", PYRAMID_FILE),
+                    ("Tous les fichiers", "*.*")
+                ]
+            )
 
         if file_path:
+            if find_pyramid(file_path) is not None:
+                self.load_pyramid(file_path)
+                return
             try:
-                # Charger l'image avec PIL
+                # Ouvrir l'image sans la décoder; les niveaux sont décodés à la demande
                 self.original_image = Image.open(file_path)
+                self.image_path = file_path
+                self.tile_pyramid = None
+                self.build_pyramid()
+                self.show_new_image(file_path)
 
-                # Réinitialiser la vue
-                self.zoom_level = 1.0
-                self.pan_x = 0
-                self.pan_y = 0
+            except Exception as e:
+                messagebox.showerror(
+                    "Erreur",
+                    f"Impossible de charger l'image:\n{str(e)}"
+                )
 
-                # Afficher l'image
-                self.update_display()
+    def load_pyramid(self, path=None):
+        """Ouvre une pyramide de tuiles (dossier ou pyramid.json)"""
+        if path is None:
+            path = filedialog.askopenfilename(
+                title="Sélectionner le manifeste d'une pyramide",
+                filetypes=[("Pyramide de tuiles", PYRAMID_FILE), ("Tous les fichiers", "*.*")]
+            )
 
-                # Mettre à jour la barre d'état
-                width, height = self.original_image.size
-                self.status_bar.config(
-                    text=f"Carte chargée: {file_path} | Dimensions: {width}x{height}px | Zoom: {self.zoom_level:.2f}x"
-                )
+        if path:
+            try:
+                self.tile_pyramid = TilePyramid(path)
+                self.original_image = None
+                self.image_path = None
+                self.pyramid = {}
+                self.pyramid_factors = []
+                self.show_new_image(self.tile_pyramid.path)
 
             except Exception as e:
                 messagebox.showerror(
                     "Erreur",
-                    f"Impossible de charger l'image:\n{str(e)}"
+                    f"Impossible d'ouvrir la pyramide:\n{str(e)}"
                 )
 
-    def update_display(self):
+    def has_image(self):
+        """Vrai si une image ou une pyramide est chargée"""
+        return self.original_image is not None or self.tile_pyramid is not None
+
+    def image_size(self):
+        """Dimensions en pixels de l'image (ou du niveau 0 de la pyramide)"""
+        if self.tile_pyramid is not None:
+            return self.tile_pyramid.size
+        return self.original_image.size
+
+    def show_new_image(self, path):
+        """Affiche une image qui vient d'être ouverte, entière dans la fenêtre"""
+        # Vue initiale: l'image entière dans la fenêtre (sans dépasser 1x),
+        # ce qui ne demande qu'un décodage réduit pour les grandes images
+        width, height = self.image_size()
+        fit = min(
+            max(self.canvas.winfo_width(), 1) / width,
+            max(self.canvas.winfo_height(), 1) / height
+        )
+        self.zoom_level = min(max(fit, self.min_zoom), 1.0)
+        self.pan_x = 0
+        self.pan_y = 0
+
+        # Afficher l'image
+        self.update_display()
+
+        # Mettre à jour la barre d'état
+        self.status_bar.config(
+            text=f"Carte chargée: {path} | Dimensions: {width}x{height}px | Zoom: {self.zoom_level:.2f}x"
+        )
+
+    def build_pyramid(self):
+        """Prépare les niveaux réduits (1/2, 1/4, ...) de l'image originale, sans les décoder"""
+        self.pyramid = {}
+        self.pyramid_factors = [1]
+        size = max(self.original_image.size)
+        while size // 2 >= self.min_pyramid_size:
+            size //= 2
+            self.pyramid_factors.append(self.pyramid_factors[-1] * 2)
+
+    def level_factor(self, zoom):
+        """Facteur du plus petit niveau dont la résolution reste >= au zoom demandé"""
+        for factor in reversed(self.pyramid_factors):
+            if 1 / factor >= zoom:
+                return factor
+        return 1
+
+    def pyramid_level(self, zoom, decode=True):
+        """Retourne le plus petit niveau dont la résolution reste >= au zoom demandé
+
+        Sans `decode`, un niveau déjà décodé le remplace (le plus proche,
+        plus fin de préférence) pour ne jamais décoder pendant un aperçu.
+        """
+        factor = self.level_factor(zoom)
+        level = self.pyramid.get(factor)
+        if level is not None:
+            return level
+        if not decode and self.pyramid:
+            finer = [f for f in self.pyramid if f < factor]
+            return self.pyramid[max(finer) if finer else min(self.pyramid)]
+        return self.decode_level(factor)
+
+    def decode_level(self, factor):
+        """Décode le niveau réduit d'un facteur donné, depuis un niveau plus fin ou depuis le fichier"""
+        finer = [f for f in self.pyramid if f < factor and factor % f == 0]
+        if finer:
+            source = max(finer)
+            level = self.pyramid[source].reduce(factor // source)
+        else:
+            image = self.original_image
+            if self.image_path is not None:
+                # Réouvrir le fichier: le mode brouillon ne vaut que pour un décodage
+                image = Image.open(self.image_path)
+                width, height = image.size
+                if factor > 1 and image.format == 'JPEG':
+                    image.draft(None, (max(width // factor, 1), max(height // factor, 1)))
+            image = normalize_mode(image)
+            reduced = round(self.original_image.size[0] / image.size[0])
+            level = image.reduce(factor // reduced) if factor > reduced else image
+        self.pyramid[factor] = level
+        return level
+
+    def release_levels(self, factor):
+        """Libère les niveaux plus fins que celui affiché (dont l'original décodé)"""
+        for finer in [f for f in self.pyramid if f < factor]:
+            del self.pyramid[finer]
+
+    def update_display(self, resample=None):
         """Met à jour l'affichage de l'image avec le zoom et le déplacement actuels"""
-        if self.original_image is None:
+        if not self.has_image():
             return
 
-        try:
-            # Calculer les nouvelles dimensions
-            orig_width, orig_height = self.original_image.size
-            new_width = int(orig_width * self.zoom_level)
-            new_height = int(orig_height * self.zoom_level)
-
-            # Redimensionner l'image
-            resized = self.original_image.resize(
-                (new_width, new_height),
-                Image.Resampling.LANCZOS
-            )
-
-            # Convertir pour Tkinter
-            self.photo_image = ImageTk.PhotoImage(resized)
+        if resample is None:
+            resample = self.final_resample
+        if resample == self.final_resample:
+            # Un rendu final rend inutile l'affinage en attente
+            self.cancel_refine()
 
-            # Supprimer l'ancienne image et le message d'accueil
-            self.canvas.delete('all')
+        try:
+            orig_width, orig_height = self.image_size()
+            canvas_width = max(self.canvas.winfo_width(), 1)
+            canvas_height = max(self.canvas.winfo_height(), 1)
+
+            # Partie de l'écran couverte par l'image (coordonnées canvas entières)
+            left = max(0, math.floor(self.pan_x))
+            top = max(0, math.floor(self.pan_y))
+            right = min(canvas_width, math.ceil(self.pan_x + orig_width * self.zoom_level))
+            bottom = min(canvas_height, math.ceil(self.pan_y + orig_height * self.zoom_level))
+
+            # Supprimer le message d'accueil
+            self.canvas.delete('welcome')
+
+            if right <= left or bottom <= top:
+                # Image entièrement hors de l'écran
+                if self.image_id is not None:
+                    self.canvas.itemconfigure(self.image_id, state='hidden')
+            else:
+                # Rééchantillonner uniquement la zone visible depuis le niveau adapté;
+                # un aperçu se contente d'un niveau déjà décodé
+                final = resample == self.final_resample
+                if self.tile_pyramid is not None:
+                    level_index = self.tile_pyramid.level_for_zoom(self.zoom_level)
+                    level_width, level_height = self.tile_pyramid.levels[level_index]
+                else:
+                    level = self.pyramid_level(self.zoom_level, decode=final)
+                    if final:
+                        self.release_levels(self.level_factor(self.zoom_level))
+                    level_width, level_height = level.size
+                factor = level_width / orig_width / self.zoom_level
+                box = (
+                    (left - self.pan_x) * factor,
+                    (top - self.pan_y) * factor,
+                    min((right - self.pan_x) * factor, level_width),
+                    min((bottom - self.pan_y) * factor, level_height)
+                )
+                if self.tile_pyramid is not None:
+                    # Seules les tuiles couvrant la zone visible sont lues
+                    level, tiles_left, tiles_top = self.tile_pyramid.region(level_index, box)
+                    box = (box[0] - tiles_left, box[1] - tiles_top, box[2] - tiles_left, box[3] - tiles_top)
+                resized = level.resize(
+                    (right - left, bottom - top),
+                    resample,
+                    box=box
+                )
 
-            # Afficher la nouvelle image
-            self.image_id = self.canvas.create_image(
-                self.pan_x,
-                self.pan_y,
-                image=self.photo_image,
-                anchor='nw'
-            )
+                # Réutiliser la PhotoImage et l'élément du canvas quand c'est possible
+                if self.photo_image is not None and \
+                        (self.photo_image.width(), self.photo_image.height()) == resized.size:
+                    self.photo_image.paste(resized)
+                else:
+                    self.photo_image = ImageTk.PhotoImage(resized)
+
+                if self.image_id is None:
+                    self.image_id = self.canvas.create_image(
+                        left,
+                        top,
+                        image=self.photo_image,
+                        anchor='nw'
+                    )
+                else:
+                    self.canvas.coords(self.image_id, left, top)
+                    self.canvas.itemconfigure(
+                        self.image_id,
+                        image=self.photo_image,
+                        state='normal'
+                    )
 
             # Mettre à jour la barre d'état
             self.status_bar.config(
@@ -174,6 +380,26 @@ class MapViewer:
         except Exception as e:
             print(f"Erreur lors de l'affichage: {e}")
 
+    def on_canvas_resize(self, event):
+        """Recadre l'image quand le canvas change de taille"""
+        self.update_display()
+
+    def schedule_refine(self):
+        """Programme le rendu haute qualité après une pause de la molette"""
+        self.cancel_refine()
+        self.refine_job = self.root.after(self.refine_delay_ms, self.refine_display)
+
+    def cancel_refine(self):
+        """Annule l'affinage en attente"""
+        if self.refine_job is not None:
+            self.root.after_cancel(self.refine_job)
+            self.refine_job = None
+
+    def refine_display(self):
+        """Rendu final haute qualité"""
+        self.refine_job = None
+        self.update_display()
+
     def on_drag_start(self, event):
         """Début du déplacement"""
         self.is_dragging = True
@@ -182,21 +408,21 @@ class MapViewer:
 
     def on_drag_move(self, event):
         """Déplacement en cours"""
-        if self.is_dragging and self.original_image:
+        if self.is_dragging and self.has_image():
             # Calculer le déplacement
             dx = event.x - self.drag_start_x
             dy = event.y - self.drag_start_y
 
-            # Mettre à jour la position
-            self.pan_x += dx
-            self.pan_y += dy
+            # Cumuler le déplacement jusqu'à la prochaine image
+            pending_dx, pending_dy = self.pending_pan
+            self.pending_pan = (pending_dx + dx, pending_dy + dy)
 
             # Mettre à jour le point de départ pour le prochain mouvement
             self.drag_start_x = event.x
             self.drag_start_y = event.y
 
             # Redessiner
-            self.update_display()
+            self.schedule_input()
 
     def on_drag_end(self, event):
         """Fin du déplacement"""
@@ -204,45 +430,71 @@ class MapViewer:
 
     def on_mouse_wheel(self, event):
         """Gestion du zoom avec la molette"""
-        if self.original_image is None:
+        if not self.has_image():
             return
 
-        # Position de la souris
-        mouse_x = event.x
-        mouse_y = event.y
-
-        # Ancien zoom
-        old_zoom = self.zoom_level
+        # Cumuler les crans, appliqués vers la dernière position de la souris
+        self.pending_zoom_steps += 1 if event.delta > 0 else -1
+        self.zoom_anchor = (event.x, event.y)
+        self.schedule_input()
 
-        # Calculer le nouveau zoom
-        if event.delta > 0:  # Zoom avant
-            self.zoom_level = min(self.zoom_level * 1.1, self.max_zoom)
-        else:  # Zoom arrière
-            self.zoom_level = max(self.zoom_level / 1.1, self.min_zoom)
-
-        # Ajuster le pan pour zoomer vers la position de la souris
-        zoom_ratio = self.zoom_level / old_zoom
-        self.pan_x = mouse_x - (mouse_x - self.pan_x) * zoom_ratio
-        self.pan_y = mouse_y - (mouse_y - self.pan_y) * zoom_ratio
+    def schedule_input(self):
+        """Programme l'application des entrées en attente: dès que Tk est libre, au plus une fois par image"""
+        if self.input_job is not None:
+            return
+        delay_ms = self.frame_ms - (time.perf_counter() - self.last_input_flush) * 1000
+        if delay_ms <= 0:
+            self.input_job = self.root.after_idle(self.flush_input)
+        else:
+            self.input_job = self.root.after(int(math.ceil(delay_ms)), self.flush_input)
+
+    def flush_input(self):
+        """Applique en une fois le déplacement et les crans de molette accumulés, puis redessine"""
+        self.input_job = None
+        self.last_input_flush = time.perf_counter()
+        if not self.has_image():
+            self.pending_pan = (0, 0)
+            self.pending_zoom_steps = 0
+            return
 
-        # Redessiner
-        self.update_display()
+        dx, dy = self.pending_pan
+        self.pending_pan = (0, 0)
+        self.pan_x += dx
+        self.pan_y += dy
+
+        steps = self.pending_zoom_steps
+        self.pending_zoom_steps = 0
+        if steps:
+            # Ajuster le pan pour zoomer vers la position de la souris
+            mouse_x, mouse_y = self.zoom_anchor
+            old_zoom = self.zoom_level
+            self.zoom_level = min(max(self.zoom_level * 1.1 ** steps, self.min_zoom), self.max_zoom)
+            zoom_ratio = self.zoom_level / old_zoom
+            self.pan_x = mouse_x - (mouse_x - self.pan_x) * zoom_ratio
+            self.pan_y = mouse_y - (mouse_y - self.pan_y) * zoom_ratio
+
+        # Redessiner (aperçu rapide puis affinage différé en mode progressif)
+        if steps and self.progressive_zoom:
+            self.update_display(self.preview_resample)
+            self.schedule_refine()
+        else:
+            self.update_display()
 
     def zoom_in(self):
         """Zoom avant (depuis le menu)"""
-        if self.original_image:
+        if self.has_image():
             self.zoom_level = min(self.zoom_level * 1.2, self.max_zoom)
             self.update_display()
 
     def zoom_out(self):
         """Zoom arrière (depuis le menu)"""
-        if self.original_image:
+        if self.has_image():
             self.zoom_level = max(self.zoom_level / 1.2, self.min_zoom)
             self.update_display()
 
     def reset_view(self):
         """Réinitialise la vue"""
-        if self.original_image:
+        if self.has_image():
             self.zoom_level = 1.0
             self.pan_x = 0
             self.pan_y = 0
@@ -257,17 +509,50 @@ class MapViewer:
             "Visualiseur de cartes pour wargames\n\n"
             "Fonctionnalités:\n"
             "- Chargement d'images JPG/PNG\n"
+            "- Pyramides de tuiles (wargame_pyramid.py)\n"
             "- Déplacement à la souris\n"
             "- Zoom/Dézoom à la molette"
         )
 
+    def enable_profiling(self, profiler):
+        """Mesure le rendu de l'image et affiche le résumé en haut du canvas"""
+        self.profiler = profiler
+        profiler.instrument(self, ('update_display',), ('update_display',))
+        profiler.on_frame = self.show_profile
+
+    def show_profile(self):
+        """Met à jour le texte du résumé de profilage, au-dessus de l'image"""
+        text = "\n".join(self.profiler.summary())
+        if self.profile_item is None:
+            self.profile_item = self.canvas.create_text(
+                10, 10, text=text, anchor='nw', fill='white',
+                font=('Courier', 9), tags='profile'
+            )
+        else:
+            self.canvas.itemconfigure(self.profile_item, text=text)
+        self.canvas.tag_raise('profile')
+
     def run(self):
         """Lance l'application"""
         self.root.mainloop()
+        if self.profiler is not None:
+            self.profiler.close()
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Visualiseur de cartes raster")
+    parser.add_argument('path', nargs='?', help="Image ou pyramide de tuiles (dossier ou pyramid.json) à ouvrir")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
     app = MapViewer()
+    if args.path:
+        # Fenêtre affichée d'abord: la vue initiale dépend de la taille du canvas
+        app.root.update()
+        app.load_image(args.path)
+    profiler = profiler_from_args(args)
+    if profiler is not None:
+        app.enable_profiling(profiler)
     app.run()
 
 
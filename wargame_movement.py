@@ -0,0 +1,225 @@
+"""Zones de déplacement: tuiles atteignables avec un nombre de points de mouvement
+
+Une zone est une exploration de Dijkstra depuis la position d'une unité,
+bornée par son budget de mouvement. Les zones sont gardées en cache par
+(position, budget, profil de coûts) et réparées sur place quand quelques
+tuiles changent, au lieu d'être recalculées entièrement.
+"""
+import heapq
+from collections import OrderedDict
+
+from wargame_pathfinding import MOVEMENT_COSTS, Pathfinder
+
+# Profils de coûts de déplacement, par type d'unité
+COST_PROFILES = {
+    'infantry': MOVEMENT_COSTS,
+    'cavalry': {
+        'plains': 1,
+        'grass': 1,
+        'desert': 2,
+        'forest': 3,
+        'mountain': None,
+        'water': None
+    }
+}
+
+
+class RangeField:
+    """Tuiles atteignables depuis `start` sans dépasser `budget` points de mouvement
+
+    `costs` associe l'index de chaque tuile atteignable (y * largeur + x) à
+    son coût d'accès, `parents` à la tuile d'où l'on y entre. `version`
+    augmente à chaque réparation: les affichages s'en servent comme clé.
+    """
+
+    def __init__(self, start, budget, profile, width, costs, parents):
+        self.start = start
+        self.budget = budget
+        self.profile = profile
+        self.width = width
+        self.costs = costs
+        self.parents = parents
+        self.version = 0
+
+    def __contains__(self, tile):
+        x, y = tile
+        return 0 <= x < self.width and y * self.width + x in self.costs
+
+    def __len__(self):
+        return len(self.costs)
+
+    def cost_at(self, x, y):
+        """Coût d'accès à la tuile (x, y), ou None si elle est hors de portée"""
+        return self.costs.get(y * self.width + x)
+
+    def tiles(self):
+        """Tuiles (x, y) atteignables"""
+        width = self.width
+        return [(i % width, i // width) for i in self.costs]
+
+    def bounds(self):
+        """Rectangle de tuiles (x0, y0, x1, y1) englobant la zone, bornes exclusives"""
+        tiles = self.tiles()
+        xs = [x for x, _ in tiles]
+        ys = [y for _, y in tiles]
+        return min(xs), min(ys), max(xs) + 1, max(ys) + 1
+
+    def path_to(self, x, y):
+        """Chemin depuis le départ jusqu'à une tuile atteignable, ou None"""
+        i = y * self.width + x
+        if i not in self.costs:
+            return None
+        path = []
+        while i is not None:
+            path.append((i % self.width, i // self.width))
+            i = self.parents.get(i)
+        path.reverse()
+        return path
+
+
+class MovementRanges:
+    """Calcul et cache LRU des zones de déplacement d'une carte"""
+
+    def __init__(self, wargame_map, profiles=COST_PROFILES, max_fields=64):
+        self.wargame_map = wargame_map
+        self.profiles = profiles
+        self.max_fields = max_fields
+        self.pathfinders = {}
+        self.fields = OrderedDict()  # (x, y, budget, profil) -> RangeField
+
+    def pathfinder(self, profile):
+        """Recherche de chemins associée à un profil de coûts"""
+        pathfinder = self.pathfinders.get(profile)
+        if pathfinder is None:
+            if profile not in self.profiles:
+                raise ValueError(f"Profil de déplacement inconnu: {profile}")
+            pathfinder = Pathfinder(self.wargame_map, self.profiles[profile])
+            self.pathfinders[profile] = pathfinder
+        return pathfinder
+
+    def field(self, position, budget, profile='infantry'):
+        """Zone atteignable depuis `position` avec `budget` points de mouvement"""
+        key = (position[0], position[1], budget, profile)
+        field = self.fields.get(key)
+        if field is not None:
+            self.fields.move_to_end(key)
+            return field
+
+        pathfinder = self.pathfinder(profile)
+        start = pathfinder.index(*position)
+        reached = pathfinder.flood(start, max_cost=budget)
+        cost_so_far = pathfinder.cost_so_far
+        came_from = pathfinder.came_from
+        costs = {i: cost_so_far[i] for i in reached}
+        parents = {i: came_from[i] for i in reached}
+        parents[start] = None
+
+        field = RangeField(position, budget, profile, pathfinder.width, costs, parents)
+        self.fields[key] = field
+        while len(self.fields) > self.max_fields:
+            self.fields.popitem(last=False)
+        return field
+
+    def update_tiles(self, tiles):
+        """Prend en compte le changement de terrain de quelques tuiles (x, y)
+
+        Les coûts des recherches de chemins sont mis à jour, puis seules les
+        zones qui contiennent une tuile modifiée ou la touchent sont réparées.
+        Retourne les zones modifiées.
+        """
+        tiles = list(tiles)
+        for pathfinder in self.pathfinders.values():
+            pathfinder.update_tiles(tiles)
+
+        repaired = []
+        for field in self.fields.values():
+            if repair_field(field, self.pathfinder(field.profile), tiles):
+                repaired.append(field)
+        return repaired
+
+    def move_unit(self, old_position, new_position, budget, profile='infantry'):
+        """Zone d'une unité qui vient de se déplacer; l'ancienne quitte le cache"""
+        self.fields.pop((old_position[0], old_position[1], budget, profile), None)
+        return self.field(new_position, budget, profile)
+
+    def clear(self):
+        """Oublie toutes les zones et les coûts (nouvelle carte ou terrain entièrement modifié)"""
+        self.fields.clear()
+        self.pathfinders.clear()
+
+
+def repair_field(field, pathfinder, tiles):
+    """Répare une zone après le changement de coût de quelques tuiles; False si elle n'est pas concernée
+
+    Les tuiles dont le meilleur chemin passe par une tuile modifiée sont
+    retirées, puis une exploration de Dijkstra repart de la frontière de ce
+    qui reste (et de ses voisines modifiées), en n'améliorant que les coûts
+    qui baissent.
+    """
+    costs = field.costs
+    parents = field.parents
+    classes = pathfinder.classes
+    tables = pathfinder.tables
+    cell_costs = pathfinder.cell_costs
+    start = pathfinder.index(*field.start)
+
+    # Tuiles modifiées dans la zone ou au contact de celle-ci
+    changed = set()
+    for x, y in tiles:
+        i = pathfinder.index(x, y)
+        if i == start:
+            continue  # Le coût du départ ne dépend pas de son terrain
+        if i in costs or any(i + offset in costs for offset in tables[classes[i]]):
+            changed.add(i)
+    if not changed:
+        return False
+
+    # Retirer les sous-arbres des tuiles modifiées
+    children = {}
+    for i, parent in parents.items():
+        if parent is not None:
+            children.setdefault(parent, []).append(i)
+    removed = set()
+    stack = [i for i in changed if i in costs]
+    while stack:
+        i = stack.pop()
+        if i in removed:
+            continue
+        removed.add(i)
+        stack.extend(children.get(i, ()))
+    for i in removed:
+        del costs[i]
+        del parents[i]
+
+    # Repartir des tuiles restantes voisines des tuiles retirées ou modifiées
+    heap = []
+    for i in removed | changed:
+        cost = cell_costs[i]
+        if not cost:
+            continue
+        for offset in tables[classes[i]]:
+            j = i + offset
+            if j in costs:
+                new_cost = costs[j] + cost
+                if new_cost <= field.budget:
+                    heap.append((new_cost, i, j))
+    heapq.heapify(heap)
+
+    budget = field.budget
+    while heap:
+        cost, i, parent = heapq.heappop(heap)
+        if i in costs and costs[i] <= cost:
+            continue
+        costs[i] = cost
+        parents[i] = parent
+        for offset in tables[classes[i]]:
+            j = i + offset
+            step = cell_costs[j]
+            if not step or j == start:
+                continue
+            new_cost = cost + step
+            if new_cost <= budget and (j not in costs or new_cost < costs[j]):
+                heapq.heappush(heap, (new_cost, j, i))
+
+    field.version += 1
+    return True
@@ -0,0 +1,376 @@
+"""Recherche de chemins (A*) sur la grille de terrain, avec coûts de déplacement
+
+Le coût d'un pas est celui de la tuile dans laquelle on entre. Les voisins
+d'une tuile sont obtenus par une table précalculée: chaque tuile porte une
+classe de voisinage (bords de la carte, parité de la ligne pour les hexagones)
+sur un octet, et chaque classe donne les décalages d'index de ses voisins.
+Le coût d'entrée de chaque tuile tient sur un octet (0: infranchissable),
+traduit en bloc depuis la grille de terrain. Les tableaux de recherche (coûts
+cumulés, prédécesseurs) sont alloués une seule fois et réutilisés d'une
+recherche à l'autre grâce à un numéro de recherche: rien n'est réinitialisé
+entre deux requêtes.
+"""
+import heapq
+from array import array
+
+from wargame_hex import OFFSET_DIRECTIONS, offset_to_axial
+
+# Coût pour entrer dans une tuile, par type de terrain (entier de 1 à 255);
+# None = infranchissable
+MOVEMENT_COSTS = {
+    'plains': 1,
+    'grass': 1,
+    'desert': 2,
+    'forest': 2,
+    'mountain': 4,
+    'water': None
+}
+DEFAULT_MOVEMENT_COST = 1  # Terrain absent de la table des coûts
+
+# Déplacements sur une grille carrée: orthogonaux, puis diagonaux
+SQUARE_DIRECTIONS = ((1, 0), (0, -1), (-1, 0), (0, 1))
+DIAGONAL_DIRECTIONS = ((1, -1), (-1, -1), (-1, 1), (1, 1))
+
+# Bits de la classe de voisinage d'une tuile
+LEFT_EDGE = 1
+RIGHT_EDGE = 2
+TOP_EDGE = 4
+BOTTOM_EDGE = 8
+ODD_ROW = 16
+
+
+def cost_table(palette, costs=MOVEMENT_COSTS, default=DEFAULT_MOVEMENT_COST):
+    """Coût de chaque identifiant de la palette (None si infranchissable)"""
+    return [costs.get(name, default) for name in palette]
+
+
+def cost_bytes(palette, palette_costs):
+    """Table de traduction identifiant -> coût sur un octet (0: infranchissable)"""
+    table = bytearray(256)
+    for terrain_id, cost in enumerate(palette_costs):
+        if cost is None:
+            continue
+        if not isinstance(cost, int) or not 1 <= cost <= 255:
+            raise ValueError(
+                f"Coût de déplacement invalide pour '{palette[terrain_id]}': {cost} "
+                "(entier de 1 à 255, ou None)"
+            )
+        table[terrain_id] = cost
+    return bytes(table)
+
+
+def grid_directions(grid='square', diagonal=False, odd_row=False):
+    """Déplacements (dx, dy) vers les voisins d'une tuile"""
+    if grid == 'hex':
+        return OFFSET_DIRECTIONS[1 if odd_row else 0]
+    if diagonal:
+        return SQUARE_DIRECTIONS + DIAGONAL_DIRECTIONS
+    return SQUARE_DIRECTIONS
+
+
+def neighbor_tables(width, height, grid='square', diagonal=False):
+    """Classes de voisinage des tuiles et décalages d'index de chaque classe
+
+    Retourne (classes, tables): `classes[i]` est la classe de la tuile
+    d'index i (un octet), `tables[classe]` le tuple des décalages à ajouter à
+    i pour obtenir ses voisins situés dans la carte.
+    """
+    tables = []
+    for cls in range(2 * ODD_ROW):
+        offsets = []
+        for dx, dy in grid_directions(grid, diagonal, cls & ODD_ROW):
+            if (dx < 0 and cls & LEFT_EDGE) or (dx > 0 and cls & RIGHT_EDGE):
+                continue
+            if (dy < 0 and cls & TOP_EDGE) or (dy > 0 and cls & BOTTOM_EDGE):
+                continue
+            offsets.append(dy * width + dx)
+        tables.append(tuple(offsets))
+
+    def row_classes(base):
+        row = bytearray([base]) * width
+        if width:
+            row[0] |= LEFT_EDGE
+            row[-1] |= RIGHT_EDGE
+        return bytes(row)
+
+    rows = []
+    for y in range(height):
+        base = ODD_ROW if grid == 'hex' and y & 1 else 0
+        if y == 0:
+            base |= TOP_EDGE
+        if y == height - 1:
+            base |= BOTTOM_EDGE
+        rows.append(row_classes(base))
+    return bytearray(b''.join(rows)), tables
+
+
+class Pathfinder:
+    """Recherches de chemins sur une carte, avec état de recherche réutilisable
+
+    `costs` associe un coût d'entrée entier (1 à 255) à chaque nom de terrain
+    (None pour un terrain infranchissable). Sur une grille carrée, `diagonal` autorise les
+    déplacements en diagonale (même coût qu'un pas orthogonal).
+    """
+
+    def __init__(self, wargame_map, costs=MOVEMENT_COSTS, diagonal=False):
+        self.terrain = wargame_map.terrain
+        self.width = wargame_map.width
+        self.height = wargame_map.height
+        self.grid = wargame_map.grid
+        self.costs = costs
+        self.diagonal = diagonal and self.grid == 'square'
+        self.classes, self.tables = neighbor_tables(self.width, self.height, self.grid, self.diagonal)
+
+        self.palette_costs = []
+        self.cost_bytes = bytes(256)
+        self.cell_costs = bytearray()  # Coût d'entrée de chaque tuile, 0: infranchissable
+        self.min_cost = 1
+        self.refresh()
+
+        size = self.width * self.height
+        self.cost_so_far = array('I', bytes(4 * size))
+        self.came_from = array('i', bytes(4 * size))
+        # stamp[i] == 2 * search_id: tuile ouverte; 2 * search_id + 1: tuile fermée
+        self.stamp = array('I', bytes(4 * size))
+        self.search_id = 0
+
+        # Entrées du tas: un seul entier (coût, estimation, index) plutôt
+        # qu'un tuple, comparé plus vite et dans le même ordre
+        self.index_bits = max(size.bit_length(), 1)
+        self.estimate_bits = ((self.width + self.height) * 255).bit_length()
+
+    def refresh(self):
+        """Recalcule le coût de toutes les tuiles (après un changement de terrain)"""
+        self.palette_costs = cost_table(self.terrain.palette, self.costs)
+        self.cost_bytes = cost_bytes(self.terrain.palette, self.palette_costs)
+        self.cell_costs = bytearray(bytes(self.terrain.cells).translate(self.cost_bytes))
+        passable = [cost for cost in self.palette_costs if cost is not None]
+        self.min_cost = min(passable) if passable else 1
+
+    def update_tiles(self, tiles):
+        """Met à jour le coût de quelques tuiles (x, y) modifiées"""
+        if len(self.palette_costs) != len(self.terrain.palette):
+            self.refresh()
+            return
+        for x, y in tiles:
+            i = y * self.width + x
+            self.cell_costs[i] = self.cost_bytes[self.terrain.cells[i]]
+
+    def index(self, x, y):
+        """Index d'une tuile dans les tableaux de recherche"""
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise ValueError(f"Tuile ({x}, {y}) hors de la carte")
+        return y * self.width + x
+
+    def position(self, i):
+        """Tuile (x, y) d'un index"""
+        y, x = divmod(i, self.width)
+        return x, y
+
+    def neighbors(self, x, y):
+        """Tuiles voisines franchissables de (x, y)"""
+        i = self.index(x, y)
+        cell_costs = self.cell_costs
+        return [
+            self.position(i + offset) for offset in self.tables[self.classes[i]]
+            if cell_costs[i + offset]
+        ]
+
+    def is_passable(self, x, y):
+        """Vrai si la tuile (x, y) peut être traversée"""
+        return self.cell_costs[self.index(x, y)] != 0
+
+    def new_search(self):
+        """Commence une recherche; retourne les marques (ouverte, fermée)"""
+        self.search_id += 1
+        if 2 * self.search_id + 1 >= 1 << 32:
+            self.stamp = array('I', bytes(4 * self.width * self.height))
+            self.search_id = 1
+        return 2 * self.search_id, 2 * self.search_id + 1
+
+    def heuristic(self, goal):
+        """Estimation admissible du coût restant jusqu'à `goal` (index)"""
+        width = self.width
+        min_cost = self.min_cost
+        gx, gy = self.position(goal)
+
+        if self.grid == 'hex':
+            gq, gr = offset_to_axial(gx, gy)
+
+            def estimate(i):
+                y, x = divmod(i, width)
+                dq = x - (y - (y & 1)) // 2 - gq
+                dr = y - gr
+                return (abs(dq) + abs(dr) + abs(dq + dr)) // 2 * min_cost
+        elif self.diagonal:
+            def estimate(i):
+                y, x = divmod(i, width)
+                return max(abs(x - gx), abs(y - gy)) * min_cost
+        else:
+            def estimate(i):
+                y, x = divmod(i, width)
+                return (abs(x - gx) + abs(y - gy)) * min_cost
+        return estimate
+
+    def path_to(self, start, goal):
+        """Chemin (liste de tuiles) reconstruit depuis les prédécesseurs"""
+        came_from = self.came_from
+        path = [goal]
+        i = goal
+        while i != start:
+            i = came_from[i]
+            path.append(i)
+        path.reverse()
+        return [self.position(i) for i in path]
+
+    def find_path(self, start, goal):
+        """Chemin le moins coûteux de `start` à `goal` (tuiles (x, y))
+
+        Retourne (chemin, coût), le chemin incluant les deux extrémités, ou
+        None si `goal` est inaccessible.
+        """
+        start_index = self.index(*start)
+        goal_index = self.index(*goal)
+        if start_index == goal_index:
+            return [start], 0
+        if not self.cell_costs[goal_index]:
+            return None
+
+        opened, closed = self.new_search()
+        estimate = self.heuristic(goal_index)
+        cell_costs = self.cell_costs
+        cost_so_far = self.cost_so_far
+        came_from = self.came_from
+        stamp = self.stamp
+        classes = self.classes
+        tables = self.tables
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+        index_bits = self.index_bits
+        index_mask = (1 << index_bits) - 1
+        f_shift = index_bits + self.estimate_bits
+
+        cost_so_far[start_index] = 0
+        stamp[start_index] = opened
+        h = estimate(start_index)
+        # À f égal, la plus petite estimation restante passe d'abord
+        heap = [(h << f_shift) | (h << index_bits) | start_index]
+
+        while heap:
+            i = heappop(heap) & index_mask
+            if stamp[i] == closed:
+                continue
+            if i == goal_index:
+                return self.path_to(start_index, goal_index), cost_so_far[i]
+            stamp[i] = closed
+
+            g = cost_so_far[i]
+            for offset in tables[classes[i]]:
+                j = i + offset
+                cost = cell_costs[j]
+                if not cost:
+                    continue
+                mark = stamp[j]
+                if mark == closed:
+                    continue
+                new_cost = g + cost
+                if mark == opened and new_cost >= cost_so_far[j]:
+                    continue
+                cost_so_far[j] = new_cost
+                came_from[j] = i
+                stamp[j] = opened
+                h = estimate(j)
+                heappush(heap, ((new_cost + h) << f_shift) | (h << index_bits) | j)
+        return None
+
+    def flood(self, start, targets=None, max_cost=None):
+        """Exploration de Dijkstra depuis `start` (index)
+
+        S'arrête quand toutes les `targets` (ensemble d'index) sont atteintes,
+        ou au-delà de `max_cost`. Retourne les index fermés, par coût
+        croissant; leurs coûts et prédécesseurs restent dans `cost_so_far` et
+        `came_from` jusqu'à la recherche suivante.
+        """
+        opened, closed = self.new_search()
+        cell_costs = self.cell_costs
+        cost_so_far = self.cost_so_far
+        came_from = self.came_from
+        stamp = self.stamp
+        classes = self.classes
+        tables = self.tables
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+        remaining = set(targets) if targets is not None else None
+        index_bits = self.index_bits
+        index_mask = (1 << index_bits) - 1
+
+        cost_so_far[start] = 0
+        stamp[start] = opened
+        heap = [start]
+        reached = []
+
+        while heap:
+            key = heappop(heap)
+            i = key & index_mask
+            if stamp[i] == closed:
+                continue
+            stamp[i] = closed
+            reached.append(i)
+            g = key >> index_bits
+            if remaining is not None:
+                remaining.discard(i)
+                if not remaining:
+                    break
+
+            for offset in tables[classes[i]]:
+                j = i + offset
+                cost = cell_costs[j]
+                if not cost:
+                    continue
+                mark = stamp[j]
+                if mark == closed:
+                    continue
+                new_cost = g + cost
+                if max_cost is not None and new_cost > max_cost:
+                    continue
+                if mark == opened and new_cost >= cost_so_far[j]:
+                    continue
+                cost_so_far[j] = new_cost
+                came_from[j] = i
+                stamp[j] = opened
+                heappush(heap, (new_cost << index_bits) | j)
+        return reached
+
+    def find_paths(self, queries):
+        """Répond à une liste de requêtes (départ, arrivée), dans l'ordre
+
+        Les requêtes partageant un même départ sont servies par une seule
+        exploration de Dijkstra; les autres par A*. Chaque réponse a la forme
+        de celle de `find_path`.
+        """
+        by_start = {}
+        for n, (start, goal) in enumerate(queries):
+            by_start.setdefault(self.index(*start), []).append((n, self.index(*goal)))
+
+        results = [None] * len(queries)
+        for start_index, goals in by_start.items():
+            if len(goals) == 1:
+                n, goal_index = goals[0]
+                results[n] = self.find_path(self.position(start_index), self.position(goal_index))
+                continue
+
+            targets = {goal for _, goal in goals if self.cell_costs[goal]}
+            targets.discard(start_index)
+            self.flood(start_index, targets)
+            closed = 2 * self.search_id + 1
+            for n, goal_index in goals:
+                if goal_index == start_index:
+                    results[n] = [self.position(start_index)], 0
+                elif self.stamp[goal_index] == closed:
+                    results[n] = self.path_to(start_index, goal_index), self.cost_so_far[goal_index]
+        return results
+
+
+def find_path(wargame_map, start, goal, costs=MOVEMENT_COSTS, diagonal=False):
+    """Chemin le moins coûteux entre deux tuiles; (chemin, coût) ou None"""
+    return Pathfinder(wargame_map, costs, diagonal).find_path(start, goal)
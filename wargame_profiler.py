@@ -0,0 +1,174 @@
+"""Profilage optionnel des visualiseurs: durées par image et par appel
+
+Le profileur enveloppe les méthodes coûteuses d'un visualiseur (ou d'une
+classe) pour enregistrer la durée de chaque appel. Il n'est créé que sur
+demande (--profile): désactivé, aucune méthode n'est enveloppée et le
+code mesuré s'exécute tel quel.
+
+Les mesures alimentent un résumé glissant (images par seconde, durée
+moyenne et maximale par section) affiché par les visualiseurs, et peuvent
+être écrites en CSV ou au format « trace event » de Chrome (JSON, à ouvrir
+dans chrome://tracing ou Perfetto).
+"""
+import csv
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+class FrameProfiler:
+    """Enregistre la durée des appels mesurés et le rythme des images
+
+    `window` est le nombre d'images (et d'appels par section) du résumé
+    glissant; `max_events` borne la trace gardée en mémoire pour l'export.
+    """
+
+    def __init__(self, trace_path=None, window=120, max_events=200000):
+        self.trace_path = trace_path
+        self.window = window
+        self.origin = time.perf_counter_ns()
+        self.events = deque(maxlen=max_events)  # (nom, début ns, durée ns, thread)
+        self.durations = {}  # nom -> durées récentes (ns)
+        self.frame_times = deque(maxlen=window)  # Intervalles entre images (ns)
+        self.last_frame = None
+        self.patches = []  # (cible, nom, attribut d'origine ou None)
+
+        # Rappel après une image (affichage du résumé), au plus tous les `overlay_interval` s
+        self.on_frame = None
+        self.overlay_interval = 0.25
+        self.last_overlay = 0
+
+    def record(self, name, start, duration):
+        """Ajoute un appel mesuré (instants en nanosecondes de perf_counter_ns)"""
+        self.events.append((name, start - self.origin, duration, threading.get_ident()))
+        recent = self.durations.get(name)
+        if recent is None:
+            recent = deque(maxlen=self.window)
+            self.durations[name] = recent
+        recent.append(duration)
+
+    def frame(self):
+        """Marque la fin d'une image"""
+        now = time.perf_counter_ns()
+        if self.last_frame is not None:
+            self.frame_times.append(now - self.last_frame)
+        self.last_frame = now
+        if self.on_frame is not None and now - self.last_overlay >= self.overlay_interval * 1e9:
+            self.last_overlay = now
+            self.on_frame()
+
+    def wrap(self, function, name, marks_frame=False):
+        """Version mesurée d'une fonction; `marks_frame` termine une image après chaque appel"""
+        clock = time.perf_counter_ns
+        record = self.record
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(name, start, clock() - start)
+                if marks_frame:
+                    self.frame()
+        return timed
+
+    def instrument(self, target, names, frame_names=()):
+        """Enveloppe des méthodes d'un objet ou d'une classe; `restore` les rétablit"""
+        label = target.__name__ if isinstance(target, type) else type(target).__name__
+        for name in names:
+            own = target.__dict__.get(name)
+            timed = self.wrap(getattr(target, name), f"{label}.{name}", name in frame_names)
+            setattr(target, name, timed)
+            self.patches.append((target, name, own))
+
+    def restore(self):
+        """Retire toutes les mesures posées par `instrument`"""
+        for target, name, own in reversed(self.patches):
+            if own is None:
+                delattr(target, name)
+            else:
+                setattr(target, name, own)
+        self.patches = []
+
+    def fps(self):
+        """Images par seconde sur la fenêtre glissante"""
+        if not self.frame_times:
+            return 0.0
+        return len(self.frame_times) * 1e9 / sum(self.frame_times)
+
+    def summary(self):
+        """Lignes du résumé glissant: rythme des images puis durée de chaque section"""
+        lines = []
+        if self.frame_times:
+            frame_ms = sum(self.frame_times) / len(self.frame_times) / 1e6
+            lines.append(f"{self.fps():.1f} img/s | {frame_ms:.1f} ms par image")
+        for name in sorted(self.durations):
+            recent = self.durations[name]
+            mean = sum(recent) / len(recent) / 1e6
+            lines.append(f"{name}: {mean:.2f} ms (max {max(recent) / 1e6:.2f})")
+        return lines
+
+    def export_csv(self, path):
+        """Écrit la trace en CSV: section, début et durée (ms), thread"""
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['name', 'start_ms', 'duration_ms', 'thread'])
+            for name, start, duration, thread in list(self.events):
+                writer.writerow([name, f"{start / 1e6:.3f}", f"{duration / 1e6:.3f}", thread])
+
+    def export_chrome_trace(self, path):
+        """Écrit la trace au format « trace event » de Chrome (événements complets, en µs)"""
+        pid = os.getpid()
+        events = [
+            {
+                'name': name,
+                'ph': 'X',
+                'ts': start / 1000,
+                'dur': duration / 1000,
+                'pid': pid,
+                'tid': thread
+            }
+            for name, start, duration, thread in list(self.events)
+        ]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def export(self, path):
+        """Écrit la trace: CSV si le fichier finit par .csv, trace Chrome sinon"""
+        if path.lower().endswith('.csv'):
+            self.export_csv(path)
+        else:
+            self.export_chrome_trace(path)
+        print(f"Trace de profilage écrite dans {path} ({len(self.events)} appels)")
+
+    def close(self):
+        """Retire les mesures et écrit la trace demandée à la création"""
+        self.restore()
+        if self.trace_path:
+            try:
+                self.export(self.trace_path)
+            except OSError as e:
+                print(f"Impossible d'écrire la trace de profilage: {e}")
+
+
+def add_profile_arguments(parser):
+    """Options de profilage communes aux visualiseurs"""
+    parser.add_argument(
+        '--profile', action='store_true',
+        help="Mesurer les temps de rendu et les afficher par-dessus la carte"
+    )
+    parser.add_argument(
+        '--profile-trace', metavar='FICHIER',
+        help="Écrire la trace en sortie (.csv, ou trace Chrome .json); implique --profile"
+    )
+
+
+def profiler_from_args(args):
+    """Profileur demandé par les options de la ligne de commande, ou None"""
+    if not (args.profile or args.profile_trace):
+        return None
+    return FrameProfiler(args.profile_trace)
@@ -0,0 +1,499 @@
+"""Pyramides de tuiles pour afficher de très grandes cartes
+
+    python wargame_pyramid.py maps/grande_bataille.json
+    python wargame_pyramid.py maps/Lultimeplanete.jpg --format webp --jobs 4
+
+Une pyramide est un dossier (par défaut `<source>.pyramid`, à côté de la
+source) qui contient `pyramid.json` (description et empreintes) et, pour
+chaque niveau, des tuiles de taille fixe `<niveau>/<colonne>_<ligne>.png`
+(ou .webp). Le niveau 0 est à pleine résolution; chaque niveau suivant est
+réduit de moitié, jusqu'à tenir dans une seule tuile. Un visualiseur ne lit
+que les tuiles de la vue, au niveau adapté au zoom.
+
+Le niveau 0 est rendu depuis une carte (mêmes couleurs et bordures que
+`WargameMap.generate_surface`, hexagones pour les grilles hexagonales) ou
+découpé dans une image raster; chaque niveau supérieur est réduit depuis
+ses quatre tuiles filles. Les tuiles sont écrites en parallèle par un
+ProcessPoolExecutor. Chaque tuile porte l'empreinte de ses entrées (terrain
+couvert ou pixels de l'image; empreintes des filles au-dessus du niveau 0):
+une nouvelle exportation ne réécrit que les tuiles dont l'empreinte a changé.
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+import wargame_terrain
+from wargame_catalog import file_hash
+from wargame_chunks import ChunkCache
+from wargame_hex import HexLayout
+
+PYRAMID_FILE = 'pyramid.json'
+PYRAMID_SUFFIX = '.pyramid'
+PYRAMID_VERSION = 1
+TILE_SIZE = 256  # Côté des tuiles, en pixels
+TILE_FORMATS = ('png', 'webp')
+MAP_TILE_SIZE = 50  # Pixels par case de carte au niveau 0 (comme le visualiseur pygame)
+BORDER_COLOR = (0, 0, 0)
+
+# Carte chargée une fois par processus de rendu (voir init_map_worker)
+worker_map = None
+
+
+def tile_digest(*parts):
+    """Empreinte courte d'une suite de valeurs (octets ou texte)"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part if isinstance(part, (bytes, bytearray)) else str(part).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def level_sizes(width, height, tile_size=TILE_SIZE):
+    """Dimensions en pixels de chaque niveau, du niveau 0 à celui qui tient dans une tuile"""
+    sizes = [(width, height)]
+    while max(width, height) > tile_size:
+        width, height = max(-(-width // 2), 1), max(-(-height // 2), 1)
+        sizes.append((width, height))
+    return sizes
+
+
+def tile_box(level_size, col, row, tile_size=TILE_SIZE):
+    """Rectangle de pixels (x0, y0, x1, y1) d'une tuile dans son niveau"""
+    width, height = level_size
+    x0, y0 = col * tile_size, row * tile_size
+    return x0, y0, min(x0 + tile_size, width), min(y0 + tile_size, height)
+
+
+def tile_grid(level_size, tile_size=TILE_SIZE):
+    """Nombre de colonnes et de lignes de tuiles d'un niveau"""
+    width, height = level_size
+    return -(-width // tile_size), -(-height // tile_size)
+
+
+def tile_name(level, col, row):
+    """Clé d'une tuile dans le manifeste (et chemin sans extension)"""
+    return f"{level}/{col}_{row}"
+
+
+def map_layout(map_tile_size):
+    """Disposition des hexagones d'une carte au niveau 0 (coin supérieur gauche en (0, 0))"""
+    layout = HexLayout(map_tile_size / 2)
+    layout.origin = (layout.hex_width / 2, layout.size)
+    return layout
+
+
+def map_pixel_size(wargame_map, map_tile_size=MAP_TILE_SIZE):
+    """Dimensions en pixels d'une carte au niveau 0"""
+    if wargame_map.grid == 'hex':
+        width, height = map_layout(map_tile_size).pixel_size(wargame_map.width, wargame_map.height)
+        return math.ceil(width), math.ceil(height)
+    return wargame_map.width * map_tile_size, wargame_map.height * map_tile_size
+
+
+def covered_tiles(wargame_map, map_tile_size, box):
+    """Cases (x0, y0, x1, y1) de la carte visibles dans un rectangle de pixels du niveau 0"""
+    px0, py0, px1, py1 = box
+    if wargame_map.grid == 'hex':
+        return map_layout(map_tile_size).offset_range(
+            px0, py0, px1, py1, wargame_map.width, wargame_map.height
+        )
+    return (
+        px0 // map_tile_size,
+        py0 // map_tile_size,
+        min(-(-px1 // map_tile_size), wargame_map.width),
+        min(-(-py1 // map_tile_size), wargame_map.height)
+    )
+
+
+def covered_ids(wargame_map, tiles):
+    """Identifiants de terrain d'un rectangle de cases, ligne par ligne"""
+    x0, y0, x1, y1 = tiles
+    return b''.join(bytes(wargame_map.terrain.row_ids(y)[x0:x1]) for y in range(y0, y1))
+
+
+def render_map_tile(wargame_map, map_tile_size, box):
+    """Image d'un rectangle de pixels du niveau 0 d'une carte
+
+    Cases carrées: un pixel par case agrandi au plus proche voisin, puis la
+    bordure de 1 pixel de chaque case, comme `WargameMap.generate_surface`.
+    Hexagones: polygones sur fond transparent.
+    """
+    px0, py0, px1, py1 = box
+    colors = wargame_map.terrain.color_table(
+        wargame_terrain.TERRAIN_COLORS,
+        wargame_terrain.UNKNOWN_TERRAIN_COLOR
+    )
+    x0, y0, x1, y1 = tiles = covered_tiles(wargame_map, map_tile_size, box)
+
+    if wargame_map.grid == 'hex':
+        image = Image.new('RGBA', (px1 - px0, py1 - py0), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(image)
+        layout = map_layout(map_tile_size)
+        layout.origin = (layout.origin[0] - px0, layout.origin[1] - py0)
+        for col, row, x, y in layout.centers(x0, y0, x1, y1):
+            color = colors[wargame_map.terrain.get_id(col, row)]
+            draw.polygon(layout.polygon(x, y), fill=color, outline=BORDER_COLOR)
+        return image
+
+    width, height = x1 - x0, y1 - y0
+    image = Image.frombytes('P', (width, height), covered_ids(wargame_map, tiles))
+    image.putpalette([channel for color in colors for channel in color])
+    image = image.resize((width * map_tile_size, height * map_tile_size), Image.Resampling.NEAREST)
+    image = image.convert('RGB')
+
+    draw = ImageDraw.Draw(image)
+    right, bottom = image.size
+    for x in range(width):
+        for edge in (x * map_tile_size, x * map_tile_size + map_tile_size - 1):
+            draw.line((edge, 0, edge, bottom), fill=BORDER_COLOR)
+    for y in range(height):
+        for edge in (y * map_tile_size, y * map_tile_size + map_tile_size - 1):
+            draw.line((0, edge, right, edge), fill=BORDER_COLOR)
+
+    left, top = px0 - x0 * map_tile_size, py0 - y0 * map_tile_size
+    return image.crop((left, top, left + px1 - px0, top + py1 - py0))
+
+
+def save_tile(image, path, tile_format):
+    """Écrit une tuile de manière atomique"""
+    temp_path = f"{path}.tmp"
+    if tile_format == 'webp':
+        image.save(temp_path, 'WEBP', quality=90)
+    else:
+        image.save(temp_path, 'PNG')
+    os.replace(temp_path, path)
+
+
+def init_map_worker(map_path):
+    """Initialisation d'un processus de rendu: charge la carte une seule fois"""
+    global worker_map
+    worker_map = wargame_terrain.load_map_file(map_path)
+
+
+def write_map_tile(path, box, map_tile_size, tile_format):
+    """Rend et écrit une tuile du niveau 0 d'une carte (processus de rendu)"""
+    save_tile(render_map_tile(worker_map, map_tile_size, box), path, tile_format)
+
+
+def write_image_tile(path, mode, size, pixels, tile_format):
+    """Écrit une tuile découpée dans une image raster (processus de rendu)"""
+    save_tile(Image.frombytes(mode, size, pixels), path, tile_format)
+
+
+def write_reduced_tile(path, size, children, mode, tile_format):
+    """Réduit de moitié les tuiles filles (chemin, décalage) assemblées sur `size` pixels"""
+    image = Image.new(mode, size)
+    for child_path, offset in children:
+        with Image.open(child_path) as child:
+            image.paste(child.convert(mode), offset)
+    save_tile(image.reduce(2), path, tile_format)
+
+
+def run_tasks(executor, function, tasks, max_pending):
+    """Soumet les tâches au fil de l'eau (au plus `max_pending` en cours); retourne leur nombre"""
+    pending = set()
+    count = 0
+
+    def collect(futures):
+        for future in futures:
+            future.result()
+
+    for task in tasks:
+        if len(pending) >= max_pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+        pending.add(executor.submit(function, *task))
+        count += 1
+    collect(wait(pending)[0])
+    return count
+
+
+def default_output(source):
+    """Dossier de pyramide par défaut: à côté de la source"""
+    source = Path(source)
+    return source.with_name(source.stem + PYRAMID_SUFFIX)
+
+
+def read_manifest(output_dir):
+    """Manifeste d'une pyramide existante, ou None (absent, illisible ou d'une autre version)"""
+    try:
+        with open(Path(output_dir) / PYRAMID_FILE, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('version') == PYRAMID_VERSION else None
+
+
+def write_manifest(output_dir, manifest):
+    """Écrit le manifeste de manière atomique"""
+    path = Path(output_dir) / PYRAMID_FILE
+    temp_path = path.with_suffix('.tmp')
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(temp_path, path)
+
+
+def export_pyramid(source, output_dir=None, tile_size=TILE_SIZE, tile_format='png',
+                   map_tile_size=MAP_TILE_SIZE, jobs=None, force=False):
+    """Exporte une carte (.json, .wgm) ou une image raster en pyramide de tuiles
+
+    Retourne (dossier, tuiles écrites, tuiles conservées).
+    """
+    source = Path(source)
+    output_dir = Path(output_dir) if output_dir else default_output(source)
+    if tile_format not in TILE_FORMATS:
+        raise ValueError(f"Format de tuile inconnu: {tile_format}")
+    jobs = jobs or os.cpu_count() or 1
+    is_map = source.suffix in wargame_terrain.MAP_SUFFIXES
+
+    source_hash = file_hash(source)
+    previous = None if force else read_manifest(output_dir)
+    old_tiles = previous['tiles'] if previous else {}
+    suffix = f".{tile_format}"
+
+    wargame_map = image = None
+    if is_map:
+        wargame_map = wargame_terrain.load_map_file(source)
+        width, height = map_pixel_size(wargame_map, map_tile_size)
+        mode = 'RGBA' if wargame_map.grid == 'hex' else 'RGB'
+        colors = wargame_map.terrain.color_table(
+            wargame_terrain.TERRAIN_COLORS,
+            wargame_terrain.UNKNOWN_TERRAIN_COLOR
+        )
+        settings = tile_digest(
+            'map', wargame_map.grid, wargame_map.width, wargame_map.height,
+            map_tile_size, tile_size, tile_format, colors
+        )
+    else:
+        with Image.open(source) as header:
+            width, height = header.size
+            mode = 'RGBA' if header.mode in ('RGBA', 'LA', 'PA') or 'transparency' in header.info else 'RGB'
+        settings = tile_digest('image', width, height, mode, tile_size, tile_format)
+
+    sizes = level_sizes(width, height, tile_size)
+    manifest = {
+        'version': PYRAMID_VERSION,
+        'source': source.name,
+        'source_hash': source_hash,
+        'kind': 'map' if is_map else 'image',
+        'name': wargame_map.name if is_map else source.stem,
+        'width': width,
+        'height': height,
+        'mode': mode,
+        'tile_size': tile_size,
+        'format': tile_format,
+        'levels': [list(size) for size in sizes],
+        'settings': settings
+    }
+    if is_map:
+        manifest.update(map_width=wargame_map.width, map_height=wargame_map.height,
+                        grid=wargame_map.grid, map_tile_size=map_tile_size)
+
+    def tile_path(name):
+        return output_dir / (name + suffix)
+
+    # Source inchangée: rien à relire ni à décoder si toutes les tuiles sont là
+    if previous and previous.get('source_hash') == source_hash and previous.get('settings') == settings:
+        if all(tile_path(name).exists() for name in old_tiles) and len(old_tiles) == sum(
+                cols * rows for cols, rows in (tile_grid(size, tile_size) for size in sizes)):
+            return output_dir, 0, len(old_tiles)
+
+    if not is_map:
+        image = Image.open(source)
+        image = image.convert(mode) if image.mode != mode else image
+        image.load()
+
+    # Empreintes de toutes les tuiles: entrées du niveau 0, puis filles
+    digests = [{}]
+    for row in range(tile_grid(sizes[0], tile_size)[1]):
+        for col in range(tile_grid(sizes[0], tile_size)[0]):
+            box = tile_box(sizes[0], col, row, tile_size)
+            if is_map:
+                tiles = covered_tiles(wargame_map, map_tile_size, box)
+                inputs = covered_ids(wargame_map, tiles)
+            else:
+                tiles = box
+                inputs = image.crop(box).tobytes()
+            digests[0][(col, row)] = tile_digest(settings, box, tiles, inputs)
+    for level in range(1, len(sizes)):
+        cols, rows = tile_grid(sizes[level], tile_size)
+        below = digests[level - 1]
+        digests.append({
+            (col, row): tile_digest(settings, level, *(
+                below.get((2 * col + dx, 2 * row + dy), '')
+                for dy in (0, 1) for dx in (0, 1)
+            ))
+            for row in range(rows) for col in range(cols)
+        })
+
+    stale = [
+        {key for key, digest in level_digests.items()
+         if old_tiles.get(tile_name(level, *key)) != digest
+         or not tile_path(tile_name(level, *key)).exists()}
+        for level, level_digests in enumerate(digests)
+    ]
+
+    # Les tuiles à réécrire sont retirées du manifeste avant de commencer:
+    # une exportation interrompue ne laisse pas d'empreinte périmée
+    for level in range(len(sizes)):
+        (output_dir / str(level)).mkdir(parents=True, exist_ok=True)
+    manifest['tiles'] = {
+        tile_name(level, *key): digest
+        for level, level_digests in enumerate(digests)
+        for key, digest in level_digests.items() if key not in stale[level]
+    }
+    write_manifest(output_dir, manifest)
+
+    max_pending = 4 * jobs
+    initializer, initargs = (init_map_worker, (str(source),)) if is_map else (None, ())
+    written = 0
+    with ProcessPoolExecutor(max_workers=jobs, initializer=initializer, initargs=initargs) as executor:
+        if is_map:
+            tasks = (
+                (str(tile_path(tile_name(0, col, row))), tile_box(sizes[0], col, row, tile_size),
+                 map_tile_size, tile_format)
+                for col, row in sorted(stale[0], key=lambda key: (key[1], key[0]))
+            )
+            written += run_tasks(executor, write_map_tile, tasks, max_pending)
+        else:
+            def image_tasks():
+                for col, row in sorted(stale[0], key=lambda key: (key[1], key[0])):
+                    box = tile_box(sizes[0], col, row, tile_size)
+                    crop = image.crop(box)
+                    yield str(tile_path(tile_name(0, col, row))), mode, crop.size, crop.tobytes(), tile_format
+
+            written += run_tasks(executor, write_image_tile, image_tasks(), max_pending)
+            image.close()
+            image = None
+
+        # Chaque niveau est réduit depuis le précédent, une fois celui-ci terminé
+        for level in range(1, len(sizes)):
+            below = sizes[level - 1]
+            tasks = []
+            for col, row in sorted(stale[level], key=lambda key: (key[1], key[0])):
+                x0, y0 = 2 * col * tile_size, 2 * row * tile_size
+                size = (min(x0 + 2 * tile_size, below[0]) - x0, min(y0 + 2 * tile_size, below[1]) - y0)
+                children = [
+                    (str(tile_path(tile_name(level - 1, 2 * col + dx, 2 * row + dy))), (dx * tile_size, dy * tile_size))
+                    for dy in (0, 1) for dx in (0, 1)
+                    if (2 * col + dx, 2 * row + dy) in digests[level - 1]
+                ]
+                tasks.append((str(tile_path(tile_name(level, col, row))), size, children, mode, tile_format))
+            written += run_tasks(executor, write_reduced_tile, tasks, max_pending)
+
+    manifest['tiles'] = {
+        tile_name(level, *key): digest
+        for level, level_digests in enumerate(digests)
+        for key, digest in level_digests.items()
+    }
+    write_manifest(output_dir, manifest)
+    return output_dir, written, len(manifest['tiles']) - written
+
+
+def find_pyramid(path):
+    """Dossier de pyramide désigné par son dossier ou par son manifeste, ou None"""
+    path = Path(path)
+    if path.name == PYRAMID_FILE:
+        path = path.parent
+    return path if (path / PYRAMID_FILE).is_file() else None
+
+
+class TilePyramid:
+    """Lecture d'une pyramide de tuiles: seules les tuiles demandées sont lues, avec un cache LRU"""
+
+    def __init__(self, path, budget_bytes=64 * 1024 * 1024):
+        self.path = find_pyramid(path)
+        if self.path is None:
+            raise FileNotFoundError(f"Aucune pyramide de tuiles dans {path}")
+        manifest = read_manifest(self.path)
+        if manifest is None:
+            raise ValueError(f"Manifeste de pyramide illisible: {self.path / PYRAMID_FILE}")
+        self.manifest = manifest
+        self.name = manifest['name']
+        self.size = (manifest['width'], manifest['height'])
+        self.mode = manifest['mode']
+        self.tile_size = manifest['tile_size']
+        self.suffix = f".{manifest['format']}"
+        self.levels = [tuple(size) for size in manifest['levels']]
+        self.cache = ChunkCache(budget_bytes, lambda tile: tile.width * tile.height * len(tile.getbands()))
+
+    def level_for_zoom(self, zoom):
+        """Plus petit niveau dont la résolution reste >= au zoom demandé"""
+        for level in reversed(range(len(self.levels))):
+            if 1 / (1 << level) >= zoom:
+                return level
+        return 0
+
+    def tile(self, level, col, row):
+        """Tuile décodée (en cache), ou None si son fichier manque"""
+        key = (level, col, row)
+        tile = self.cache.get(key)
+        if tile is None:
+            try:
+                with Image.open(self.path / (tile_name(level, col, row) + self.suffix)) as image:
+                    tile = image.convert(self.mode)
+            except OSError as e:
+                print(f"Tuile illisible {tile_name(level, col, row)}: {e}")
+                return None
+            self.cache.put(key, tile)
+        return tile
+
+    def region(self, level, box):
+        """Assemble les tuiles couvrant un rectangle (en pixels du niveau)
+
+        Retourne (image, gauche, haut): l'image couvre des tuiles entières et
+        (gauche, haut) est la position de son coin dans le niveau.
+        """
+        width, height = self.levels[level]
+        size = self.tile_size
+        col0 = min(max(math.floor(box[0] / size), 0), -(-width // size) - 1)
+        row0 = min(max(math.floor(box[1] / size), 0), -(-height // size) - 1)
+        col1 = min(max(math.ceil(box[2] / size), col0 + 1), -(-width // size))
+        row1 = min(max(math.ceil(box[3] / size), row0 + 1), -(-height // size))
+
+        left, top = col0 * size, row0 * size
+        image = Image.new(self.mode, (
+            min(col1 * size, width) - left,
+            min(row1 * size, height) - top
+        ))
+        for row in range(row0, row1):
+            for col in range(col0, col1):
+                tile = self.tile(level, col, row)
+                if tile is not None:
+                    image.paste(tile, (col * size - left, row * size - top))
+        return image, left, top
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporte une carte ou une image en pyramide de tuiles")
+    parser.add_argument('source', help="Carte (.json, .wgm) ou image raster (.jpg, .png...)")
+    parser.add_argument('-o', '--output', help="Dossier de la pyramide (défaut: <source>.pyramid)")
+    parser.add_argument('--tile-size', type=int, default=TILE_SIZE, help="Côté des tuiles, en pixels")
+    parser.add_argument('--format', choices=TILE_FORMATS, default='png', help="Format des tuiles")
+    parser.add_argument(
+        '--map-tile-size', type=int, default=MAP_TILE_SIZE,
+        help="Pixels par case au niveau 0 (cartes seulement)"
+    )
+    parser.add_argument('--jobs', type=int, help="Nombre de processus de rendu (défaut: nombre de cœurs)")
+    parser.add_argument('--force', action='store_true', help="Réécrire toutes les tuiles")
+    args = parser.parse_args()
+
+    try:
+        output_dir, written, kept = export_pyramid(
+            args.source, args.output, args.tile_size, args.format,
+            args.map_tile_size, args.jobs, args.force
+        )
+    except (OSError, ValueError) as e:
+        print(f"Erreur lors de l'exportation: {e}")
+        raise SystemExit(1)
+    print(f"Pyramide écrite dans {output_dir}: {written} tuiles écrites, {kept} inchangées")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""Stockage compact du terrain des cartes de wargame"""
+import json
+import re
+from pathlib import Path
+
+# Types de terrain connus, dans l'ordre de la palette par défaut
+TERRAIN_TYPES = ['grass', 'water', 'mountain', 'forest', 'desert', 'plains']
+
+# Couleurs (RGB) des types de terrain; blanc pour un terrain inconnu
+TERRAIN_COLORS = {
+    'grass': (34, 139, 34),
+    'water': (0, 119, 190),
+    'mountain': (139, 137, 137),
+    'forest': (0, 100, 0),
+    'desert': (237, 201, 175),
+    'plains': (144, 238, 144)
+}
+UNKNOWN_TERRAIN_COLOR = (255, 255, 255)
+
+# Nombre maximal de types de terrain (un octet par tuile)
+MAX_TERRAIN_TYPES = 256
+
+# Types de grille: cases carrées ou hexagones (« "grid": "hex" » dans le JSON)
+GRID_TYPES = ('square', 'hex')
+
+# Suite d'octets identiques (un segment de terrain dans une ligne)
+RUN_PATTERN = re.compile(rb'(.)\1*', re.DOTALL)
+
+# Extensions des fichiers de carte, par ordre de préférence (binaire d'abord)
+MAP_SUFFIXES = ['.wgm', '.json']
+
+
+class TerrainGrid:
+    """Grille de terrain: palette (nom -> identifiant) et un octet par tuile"""
+
+    def __init__(self, width, height, palette=None, cells=None):
+        self.width = width
+        self.height = height
+        self.palette = list(palette) if palette else list(TERRAIN_TYPES)
+        if len(self.palette) > MAX_TERRAIN_TYPES:
+            raise ValueError(f"Trop de types de terrain ({len(self.palette)})")
+        self.palette_index = {name: i for i, name in enumerate(self.palette)}
+
+        # Grille contiguë, ligne par ligne: cells[y * width + x] = identifiant
+        if cells is None:
+            cells = bytearray(width * height)
+        if len(cells) != width * height:
+            raise ValueError(
+                f"Grille de {len(cells)} tuiles pour une carte {width}x{height}"
+            )
+        self.cells = cells
+
+    @classmethod
+    def from_rows(cls, rows, width=None, height=None, palette=None):
+        """Construit la grille depuis des lignes de noms (format JSON)"""
+        height = len(rows) if height is None else height
+        width = (len(rows[0]) if rows else 0) if width is None else width
+        grid = cls(width, height, palette)
+
+        for y in range(height):
+            row = rows[y]
+            if len(row) != width:
+                raise ValueError(f"La ligne {y} contient {len(row)} tuiles au lieu de {width}")
+            start = y * width
+            grid.cells[start:start + width] = bytes(grid.terrain_id(name) for name in row)
+        return grid
+
+    def terrain_id(self, name):
+        """Identifiant d'un type de terrain, ajouté à la palette si nouveau"""
+        terrain_id = self.palette_index.get(name)
+        if terrain_id is None:
+            if len(self.palette) >= MAX_TERRAIN_TYPES:
+                raise ValueError(f"Trop de types de terrain pour ajouter '{name}'")
+            terrain_id = len(self.palette)
+            self.palette.append(name)
+            self.palette_index[name] = terrain_id
+        return terrain_id
+
+    def get_id(self, x, y):
+        """Identifiant du terrain de la tuile (x, y)"""
+        return self.cells[y * self.width + x]
+
+    def get(self, x, y):
+        """Nom du terrain de la tuile (x, y)"""
+        return self.palette[self.cells[y * self.width + x]]
+
+    def set(self, x, y, name):
+        """Change le terrain de la tuile (x, y)"""
+        self.cells[y * self.width + x] = self.terrain_id(name)
+
+    def row_ids(self, y):
+        """Identifiants de la ligne y (tranche de la grille)"""
+        start = y * self.width
+        return self.cells[start:start + self.width]
+
+    def row_runs(self, y):
+        """Segments (x0, x1, identifiant) de terrain identique de la ligne y, bornes exclusives"""
+        return [
+            (match.start(), match.end(), match.group()[0])
+            for match in RUN_PATTERN.finditer(bytes(self.row_ids(y)))
+        ]
+
+    def row(self, y):
+        """Noms de terrain de la ligne y"""
+        palette = self.palette
+        return [palette[terrain_id] for terrain_id in self.row_ids(y)]
+
+    def column(self, x):
+        """Noms de terrain de la colonne x"""
+        palette = self.palette
+        return [palette[terrain_id] for terrain_id in self.cells[x::self.width]]
+
+    def to_rows(self):
+        """Lignes de noms de terrain, au format JSON des cartes"""
+        return [self.row(y) for y in range(self.height)]
+
+    def histogram(self):
+        """Nombre de tuiles par type de terrain"""
+        cells = bytes(self.cells)
+        counts = {}
+        for terrain_id, name in enumerate(self.palette):
+            count = cells.count(terrain_id)
+            if count:
+                counts[name] = count
+        return counts
+
+    def color_table(self, terrain_colors, default):
+        """Couleurs indexées par identifiant de terrain"""
+        return [terrain_colors.get(name, default) for name in self.palette]
+
+    def __getitem__(self, y):
+        # Compatibilité avec l'ancien accès terrain_data[y][x]
+        return self.row(y)
+
+    def __len__(self):
+        return self.height
+
+
+class WargameMap:
+    """Représente une carte de wargame"""
+    def __init__(self, name, width, height, terrain_data, grid='square'):
+        if grid not in GRID_TYPES:
+            raise ValueError(f"Type de grille inconnu: {grid}")
+        self.name = name
+        self.width = width
+        self.height = height
+        self.grid = grid
+        if isinstance(terrain_data, TerrainGrid):
+            self.terrain = terrain_data
+        else:
+            self.terrain = TerrainGrid.from_rows(terrain_data, width, height)
+        self.path = None  # Fichier d'origine (renseigné par load_map_file)
+
+    @property
+    def terrain_data(self):
+        """Accès ligne par ligne au terrain (terrain_data[y][x])"""
+        return self.terrain
+
+    @classmethod
+    def from_dict(cls, map_data):
+        """Crée une carte depuis le contenu d'un fichier JSON"""
+        return cls(
+            name=map_data["name"],
+            width=map_data["width"],
+            height=map_data["height"],
+            terrain_data=map_data["terrain"],
+            grid=map_data.get("grid", "square")
+        )
+
+    def to_dict(self):
+        """Contenu JSON de la carte"""
+        map_data = {
+            "name": self.name,
+            "width": self.width,
+            "height": self.height
+        }
+        if self.grid != 'square':
+            map_data["grid"] = self.grid
+        map_data["terrain"] = self.terrain.to_rows()
+        return map_data
+
+
+def list_map_names(maps_dir):
+    """Noms des cartes disponibles (JSON ou binaires) dans un dossier"""
+    names = []
+    for suffix in reversed(MAP_SUFFIXES):
+        for map_file in Path(maps_dir).glob(f"*{suffix}"):
+            if map_file.stem not in names:
+                names.append(map_file.stem)
+    return names
+
+
+def find_map_file(maps_dir, map_name):
+    """Fichier d'une carte, en préférant la version binaire; None si absente"""
+    for suffix in MAP_SUFFIXES:
+        map_path = Path(maps_dir) / f"{map_name}{suffix}"
+        if map_path.exists():
+            return map_path
+    return None
+
+
+def load_map_file(map_path, map_class=WargameMap):
+    """Charge une carte JSON, ou binaire via mmap"""
+    map_path = Path(map_path)
+    if map_path.suffix == '.wgm':
+        import wargame_binmap
+        wargame_map = wargame_binmap.read_map(map_path, map_class)
+    else:
+        with open(map_path, "r") as f:
+            map_data = json.load(f)
+        wargame_map = map_class.from_dict(map_data)
+    wargame_map.path = map_path
+    return wargame_map
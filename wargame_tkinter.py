@@ -1,15 +1,21 @@
 import tkinter as tk
 from tkinter import ttk
+import argparse
 import json
+import math
+import queue
+import time
+from bisect import bisect_right
 from pathlib import Path
 
-class WargameMap:
-    """Représente une carte de wargame"""
-    def __init__(self, name, width, height, terrain_data):
-        self.name = name
-        self.width = width
-        self.height = height
-        self.terrain_data = terrain_data
+import wargame_terrain
+from wargame_catalog import MapCatalog
+from wargame_editor import editor_for_map
+from wargame_loader import MapLoader, map_cache_key
+from wargame_movement import MovementRanges
+from wargame_profiler import add_profile_arguments, profiler_from_args
+from wargame_terrain import WargameMap
+
 
 class WargameViewer:
     """Visualiseur de carte de wargame avec pan et zoom"""
@@ -30,8 +36,72 @@ class WargameViewer:
         self.max_zoom = 3.0
         self.tile_size = 50
 
+        # Zoom progressif: pendant une rafale de molette les tuiles existantes
+        # sont simplement mises à l'échelle, la mise en page complète est différée
+        self.progressive_zoom = True
+        self.refine_delay_ms = 150
+        self.refine_job = None
+
+        # Entrées regroupées: les déplacements de la souris et les crans de
+        # molette s'accumulent et sont appliqués au plus une fois par image
+        self.frame_ms = 16
+        self.input_job = None
+        self.last_input_flush = 0.0
+        self.pending_pan = (0, 0)
+        self.pending_zoom_steps = 0
+        self.zoom_anchor = (0, 0)
+
         # Carte actuelle
         self.current_map = None
+        # Couleurs indexées par identifiant de terrain de la carte actuelle
+        self.tile_colors = []
+
+        # Pool de rectangles réutilisés: un rectangle par bloc de tuiles de même
+        # terrain (segments d'une ligne fusionnés, puis empilés d'une ligne à
+        # l'autre), et une couche de lignes pour la grille. Le nombre d'éléments
+        # suit le nombre de frontières de terrain, pas le nombre de tuiles
+        self.tile_items = []
+        self.tile_item_colors = []
+        self.shown_items = 0
+        self.grid_items = []
+        self.shown_grid_items = 0
+        self.merge_rows = True  # Fusionner les segments identiques de lignes consécutives
+        self.row_runs = {}  # Ligne -> (débuts des segments, segments (x0, x1, identifiant)), calculés une fois par carte
+        # Plage de tuiles matérialisée (x0, y0, x1, y1) et taille de tuile associée
+        self.rendered_range = None
+        self.rendered_tile_size = None
+        # Marge (en tuiles) dessinée autour de la zone visible pour absorber les petits pans
+        self.render_margin = 2
+
+        # Zone de déplacement (clic droit sur une tuile): rectangles tramés
+        # posés au-dessus des tuiles, recréés seulement quand la zone change
+        self.ranges = None
+        self.range_field = None
+        self.movement_points = 8
+        self.movement_profile = 'infantry'
+        self.range_items = []
+        self.range_tiles = []
+        self.range_key = None
+
+        # Tuile survolée: un seul rectangle réutilisé et une lecture d'état
+        self.hover_tile = None
+        self.hover_item = None
+
+        # Édition du terrain (touche E): le clic gauche peint, le clic molette
+        # déplace la carte. Une tuile peinte reçoit un rectangle posé sur les
+        # blocs de terrain (réutilisé si elle est repeinte): un trait ne
+        # touche que les éléments de ses tuiles. Les segments des lignes
+        # modifiées sont recalculés à la mise en page suivante, qui retire
+        # ces rectangles
+        self.edit_mode = False
+        self.editor = None
+        self.editors = {}  # Fichier de la carte -> éditeur, gardé d'une carte à l'autre
+        self.painting = False
+        self.patch_items = {}  # Tuile (x, y) -> rectangle posé par l'édition
+
+        # Profilage (--profile): None tant qu'il n'est pas demandé
+        self.profiler = None
+        self.profile_item = None
 
         # Couleurs pour différents types de terrain
         self.terrain_colors = {
@@ -43,6 +113,14 @@ class WargameViewer:
             'plains': '#90EE90'
         }
 
+        # Chargement des cartes en arrière-plan: les résultats passent par une
+        # file relevée périodiquement par root.after dans le thread de l'interface
+        self.loaded_maps = queue.Queue()
+        self.loader = MapLoader(self.prepare_map, self.on_map_prepared)
+        self.loading_map = None
+        self.loader_poll_ms = 30
+        self.loader_poll_job = None
+
         # Liste des maps disponibles
         self.available_maps = self.load_available_maps()
 
@@ -54,15 +132,14 @@ class WargameViewer:
         maps_dir = Path("maps")
         maps_dir.mkdir(exist_ok=True)
 
-        available_maps = []
-        for map_file in maps_dir.glob("*.json"):
-            available_maps.append(map_file.stem)
+        # Catalogue indexé: seules les cartes modifiées depuis le dernier lancement sont relues
+        self.catalog = MapCatalog(maps_dir)
+        available_maps = self.catalog.refresh()
 
         # Si aucune map n'existe, créer des maps par défaut
         if not available_maps:
             self.create_default_maps()
-            for map_file in maps_dir.glob("*.json"):
-                available_maps.append(map_file.stem)
+            available_maps = self.catalog.refresh()
 
         return available_maps if available_maps else ["Aucune map disponible"]
 
@@ -195,19 +272,28 @@ class WargameViewer:
         )
         map_label.pack(side=tk.LEFT, padx=5)
 
+        # Libellés du catalogue (nom et dimensions) -> nom de fichier de la carte
+        labels = self.catalog.labels(self.available_maps)
+        self.map_labels = dict(zip(labels, self.available_maps))
+
         self.map_var = tk.StringVar()
         self.map_dropdown = ttk.Combobox(
             controls,
             textvariable=self.map_var,
-            values=self.available_maps,
+            values=labels,
             state='readonly',
             width=30
         )
         self.map_dropdown.pack(side=tk.LEFT, padx=5)
-        if self.available_maps:
-            self.map_dropdown.set(self.available_maps[0])
+        if labels:
+            self.map_dropdown.set(labels[0])
         self.map_dropdown.bind('<<ComboboxSelected>>', self.on_map_selected)
 
+        # Miniature de la carte sélectionnée (issue du catalogue)
+        self.preview_image = None
+        self.preview_label = tk.Label(controls, bg='#2E2E2E')
+        self.preview_label.pack(side=tk.LEFT, padx=5)
+
         # Label de zoom
         self.zoom_label = tk.Label(
             controls,
@@ -218,15 +304,27 @@ class WargameViewer:
         )
         self.zoom_label.pack(side=tk.LEFT, padx=20)
 
+        # Coordonnées et terrain de la tuile survolée
+        self.status_label = tk.Label(
+            controls,
+            text="",
+            font=('Arial', 10),
+            bg='#2E2E2E',
+            fg='white',
+            width=45,
+            anchor='w'
+        )
+        self.status_label.pack(side=tk.LEFT, padx=5)
+
         # Instructions
-        instructions = tk.Label(
+        self.instructions = tk.Label(
             control_frame,
-            text="Clic gauche + glisser: Déplacer | Molette: Zoom/Dézoom",
+            text=self.instructions_text(),
             font=('Arial', 9),
             bg='#2E2E2E',
             fg='#AAAAAA'
         )
-        instructions.pack(pady=5)
+        self.instructions.pack(pady=5)
 
         # Canvas pour la carte
         self.canvas = tk.Canvas(
@@ -240,142 +338,683 @@ class WargameViewer:
         self.canvas.bind('<ButtonPress-1>', self.on_mouse_press)
         self.canvas.bind('<B1-Motion>', self.on_mouse_drag)
         self.canvas.bind('<ButtonRelease-1>', self.on_mouse_release)
+        self.canvas.bind('<ButtonPress-2>', self.start_pan)
+        self.canvas.bind('<B2-Motion>', self.on_mouse_drag)
+        self.canvas.bind('<ButtonRelease-2>', self.on_mouse_release)
         self.canvas.bind('<MouseWheel>', self.on_mouse_wheel)
+        self.canvas.bind('<ButtonPress-3>', self.on_right_click)
+        self.canvas.bind('<Motion>', self.on_mouse_move)
+        self.canvas.bind('<Leave>', self.on_mouse_leave)
+        self.canvas.bind('<Configure>', self.on_canvas_resize)
+        self.root.bind('<KeyPress>', self.on_key)
 
         # Charger la première carte
         if self.available_maps and self.available_maps[0] != "Aucune map disponible":
-            self.load_map(self.available_maps[0])
+            self.show_preview(self.available_maps[0])
+            self.request_map(self.available_maps[0])
+
+    def instructions_text(self):
+        """Aide affichée sous les contrôles, selon le mode"""
+        if self.edit_mode:
+            editor = self.editor
+            return (
+                f"Édition: Clic gauche: Peindre ({editor.brush_terrain}, rayon {editor.brush_radius}) | "
+                "1-6: Terrain | [ ]: Pinceau | Ctrl+Z/Y: Annuler/Rétablir | "
+                "Ctrl+S: Enregistrer | Clic molette: Déplacer"
+            )
+        return "Clic gauche + glisser: Déplacer | Molette: Zoom/Dézoom | Clic droit: Portée | E: Édition"
 
     def on_map_selected(self, event):
         """Appelé quand une map est sélectionnée"""
-        selected_map = self.map_var.get()
-        self.load_map(selected_map)
-
-    def load_map(self, map_name):
-        """Charge une map depuis un fichier JSON"""
-        map_path = Path("maps") / f"{map_name}.json"
-
-        if not map_path.exists():
-            print(f"La map {map_name} n'existe pas")
+        selected_label = self.map_var.get()
+        selected_map = self.map_labels.get(selected_label, selected_label)
+        self.show_preview(selected_map)
+        self.request_map(selected_map)
+
+    def show_preview(self, map_name):
+        """Affiche la miniature d'une carte à côté du menu déroulant"""
+        thumbnail = self.catalog.thumbnail_path(map_name)
+        if thumbnail is None:
+            self.preview_image = None
+            self.preview_label.config(image='')
             return
+        self.preview_image = tk.PhotoImage(file=str(thumbnail))
+        self.preview_label.config(image=self.preview_image)
 
+    def prepare_map(self, map_name):
+        """Lit une map depuis un fichier JSON ou binaire (.wgm); sans accès à Tk"""
+        map_path = wargame_terrain.find_map_file("maps", map_name)
+        if map_path is None:
+            raise FileNotFoundError(f"La map {map_name} n'existe pas")
+        return wargame_terrain.load_map_file(map_path, WargameMap)
+
+    def load_map(self, map_name):
+        """Charge une map immédiatement, dans le thread courant"""
         try:
-            with open(map_path, "r") as f:
-                map_data = json.load(f)
-
-            self.current_map = WargameMap(
-                name=map_data["name"],
-                width=map_data["width"],
-                height=map_data["height"],
-                terrain_data=map_data["terrain"]
-            )
+            self.show_map(self.prepare_map(map_name))
+        except FileNotFoundError as e:
+            print(e)
+        except Exception as e:
+            print(f"Erreur lors du chargement de la map: {e}")
 
-            # Réinitialiser le zoom et le pan
-            self.zoom_level = 1.0
-            self.pan_x = 100
-            self.pan_y = 100
+    def request_map(self, map_name):
+        """Charge une map en arrière-plan; remplace toute demande en cours"""
+        self.loading_map = map_name
+        self.loader.request(map_cache_key(map_name), map_name)
+        self.show_loading(map_name)
+
+        # Précharger les cartes voisines dans le menu déroulant
+        if map_name in self.available_maps:
+            index = self.available_maps.index(map_name)
+            neighbours = self.available_maps[max(index - 1, 0):index + 2]
+            self.loader.prefetch(
+                (map_cache_key(name), name) for name in neighbours if name != map_name
+            )
 
-            # Redessiner
-            self.draw_map()
+        if self.loader_poll_job is None:
+            self.loader_poll_job = self.root.after(self.loader_poll_ms, self.poll_loader)
+
+    def on_map_prepared(self, map_name, wargame_map, error):
+        """Appelé depuis un thread de travail: transmet le résultat à l'interface"""
+        self.loaded_maps.put((map_name, wargame_map, error))
+
+    def poll_loader(self):
+        """Relève les cartes préparées (thread de l'interface)"""
+        self.loader_poll_job = None
+        while True:
+            try:
+                map_name, wargame_map, error = self.loaded_maps.get_nowait()
+            except queue.Empty:
+                break
+            # Ignorer un résultat arrivé après qu'une autre carte a été choisie
+            if map_name != self.loading_map:
+                continue
+
+            self.loading_map = None
+            self.hide_loading()
+            if isinstance(error, FileNotFoundError):
+                print(error)
+            elif error is not None:
+                print(f"Erreur lors du chargement de la map: {error}")
+            else:
+                self.show_map(wargame_map)
+
+        if self.loading_map is not None:
+            self.loader_poll_job = self.root.after(self.loader_poll_ms, self.poll_loader)
+
+    def show_loading(self, map_name):
+        """Indicateur de chargement au centre du canvas"""
+        self.canvas.delete('loading')
+        self.canvas.create_text(
+            self.canvas.winfo_width() // 2,
+            self.canvas.winfo_height() // 2,
+            text=f"Chargement de {self.catalog.label(map_name)}...",
+            fill='white',
+            font=('Arial', 16),
+            tags='loading'
+        )
+        self.root.config(cursor='watch')
+
+    def hide_loading(self):
+        """Retire l'indicateur de chargement"""
+        self.canvas.delete('loading')
+        self.root.config(cursor='')
+
+    def show_map(self, wargame_map):
+        """Affiche une map déjà lue"""
+        previous_editor = self.editor
+        self.editor = editor_for_map(self.editors, wargame_map)
+        if previous_editor is not None and previous_editor is not self.editor \
+                and previous_editor.has_unsaved_changes():
+            print(f"Modifications non enregistrées de la map '{previous_editor.map.name}' "
+                  "gardées en mémoire (Ctrl+S pour les enregistrer)")
+        if self.editor.map is not wargame_map:
+            # Carte relue depuis son fichier: le terrain modifié en mémoire prime
+            wargame_map = self.editor.map
+        self.current_map = wargame_map
+        self.tile_colors = self.current_map.terrain.color_table(
+            self.terrain_colors, '#FFFFFF'
+        )
+        self.ranges = MovementRanges(wargame_map)
+        self.range_field = None
+        self.hover_tile = None
+        self.row_runs = {}
+        self.painting = False
+        self.edit_mode = False
+        self.instructions.config(text=self.instructions_text())
+
+        # Réinitialiser le zoom et le pan
+        self.zoom_level = 1.0
+        self.pan_x = 100
+        self.pan_y = 100
 
-            print(f"Map '{map_data['name']}' chargée avec succès!")
+        # Redessiner
+        self.draw_map()
 
-        except Exception as e:
-            print(f"Erreur lors du chargement de la map: {e}")
+        print(f"Map '{self.current_map.name}' chargée avec succès!")
 
     def draw_map(self):
         """Dessine la carte sur le canvas"""
-        self.canvas.delete('all')
+        self.cancel_refine()
+        self.canvas.delete('message')
 
         if not self.current_map:
+            self.hide_tiles(0)
+            self.rendered_range = None
+            self.range_field = None
+            self.layout_range()
             # Afficher un message si aucune carte
             self.canvas.create_text(
                 self.canvas.winfo_width() // 2,
                 self.canvas.winfo_height() // 2,
                 text="Sélectionnez une carte dans le menu",
                 fill='white',
-                font=('Arial', 16)
+                font=('Arial', 16),
+                tags='message'
             )
             return
 
-        # Calculer la taille des tuiles avec le zoom
-        scaled_tile_size = int(self.tile_size * self.zoom_level)
+        self.layout_tiles()
+        self.layout_range()
+        self.layout_hover()
 
-        # Dessiner chaque tuile
-        for y in range(self.current_map.height):
-            for x in range(self.current_map.width):
-                terrain_type = self.current_map.terrain_data[y][x]
-                color = self.terrain_colors.get(terrain_type, '#FFFFFF')
+        # Mettre à jour le label de zoom
+        self.zoom_label.config(text=f"Zoom: {self.zoom_level:.2f}x")
 
-                # Position à l'écran
+    def scaled_tile_size(self):
+        """Taille des tuiles à l'écran pour le zoom actuel"""
+        return max(1, int(self.tile_size * self.zoom_level))
+
+    def visible_tile_range(self, margin=0):
+        """Retourne la plage (x0, y0, x1, y1) des tuiles visibles sur le canvas"""
+        scaled_tile_size = self.scaled_tile_size()
+        canvas_width = max(self.canvas.winfo_width(), 1)
+        canvas_height = max(self.canvas.winfo_height(), 1)
+
+        x0 = math.floor(-self.pan_x / scaled_tile_size) - margin
+        y0 = math.floor(-self.pan_y / scaled_tile_size) - margin
+        x1 = math.ceil((canvas_width - self.pan_x) / scaled_tile_size) + margin
+        y1 = math.ceil((canvas_height - self.pan_y) / scaled_tile_size) + margin
+
+        x0 = min(max(x0, 0), self.current_map.width)
+        y0 = min(max(y0, 0), self.current_map.height)
+        x1 = min(max(x1, x0), self.current_map.width)
+        y1 = min(max(y1, y0), self.current_map.height)
+        return x0, y0, x1, y1
+
+    def runs(self, y, x0, x1):
+        """Segments de terrain identique de la ligne y qui touchent les colonnes [x0, x1)
+
+        Les segments de la ligne sont mis en cache pour la carte avec leurs
+        débuts: le premier segment visible est trouvé par bisection, sans
+        parcourir toute la largeur de la carte.
+        """
+        entry = self.row_runs.get(y)
+        if entry is None:
+            runs = self.current_map.terrain.row_runs(y)
+            entry = ([run[0] for run in runs], runs)
+            self.row_runs[y] = entry
+        starts, runs = entry
+        if x0 >= x1:
+            return []
+        first = max(bisect_right(starts, x0) - 1, 0)
+        last = bisect_right(starts, x1 - 1, first)
+        return runs[first:last]
+
+    def terrain_blocks(self, x0, y0, x1, y1):
+        """Rectangles (x0, y0, x1, y1, identifiant) de terrain identique couvrant une plage de tuiles
+
+        Les segments de chaque ligne sont coupés à la plage; avec `merge_rows`,
+        un segment identique à celui de la ligne précédente prolonge son rectangle.
+        """
+        blocks = []
+        open_blocks = {}  # (x0, x1, identifiant) -> première ligne
+        for y in range(y0, y1):
+            row_blocks = {}
+            for run_x0, run_x1, terrain_id in self.runs(y, x0, x1):
+                key = (max(run_x0, x0), min(run_x1, x1), terrain_id)
+                row_blocks[key] = open_blocks.pop(key, y) if self.merge_rows else y
+            for (bx0, bx1, terrain_id), start in open_blocks.items():
+                blocks.append((bx0, start, bx1, y, terrain_id))
+            open_blocks = row_blocks
+        for (bx0, bx1, terrain_id), start in open_blocks.items():
+            blocks.append((bx0, start, bx1, y1, terrain_id))
+        return blocks
+
+    def layout_tiles(self):
+        """Replace les rectangles de terrain et les lignes de la grille sur la zone visible (plus une marge)"""
+        scaled_tile_size = self.scaled_tile_size()
+        x0, y0, x1, y1 = self.visible_tile_range(self.render_margin)
+        blocks = self.terrain_blocks(x0, y0, x1, y1)
+
+        # Les blocs reflètent maintenant les tuiles peintes
+        if self.patch_items:
+            self.canvas.delete('patch')
+            self.patch_items = {}
+        needed = len(blocks)
+        grid_needed = (x1 - x0 + 1) + (y1 - y0 + 1) if x1 > x0 and y1 > y0 else 0
+
+        # Agrandir les pools si nécessaire (les éléments ne sont jamais détruits)
+        while len(self.tile_items) < needed:
+            item = self.canvas.create_rectangle(
+                0, 0, 0, 0,
+                outline='',
+                tags=('tile', 'terrain')
+            )
+            self.tile_items.append(item)
+            self.tile_item_colors.append(None)
+            self.canvas.tag_lower(item)
+        if len(self.grid_items) < grid_needed:
+            while len(self.grid_items) < grid_needed:
+                self.grid_items.append(self.canvas.create_line(
+                    0, 0, 0, 0,
+                    fill='black',
+                    width=1,
+                    tags=('tile', 'grid')
+                ))
+            # La grille reste juste au-dessus du terrain, sous les surcouches
+            if self.tile_items:
+                self.canvas.tag_raise('grid', 'terrain')
+
+        colors = self.tile_colors
+        for index, (bx0, by0, bx1, by1, terrain_id) in enumerate(blocks):
+            color = colors[terrain_id]
+            item = self.tile_items[index]
+            self.canvas.coords(
+                item,
+                self.pan_x + bx0 * scaled_tile_size,
+                self.pan_y + by0 * scaled_tile_size,
+                self.pan_x + bx1 * scaled_tile_size,
+                self.pan_y + by1 * scaled_tile_size
+            )
+            # Ne reconfigurer la couleur que si elle a changé
+            if self.tile_item_colors[index] != color:
+                self.canvas.itemconfigure(item, fill=color)
+                self.tile_item_colors[index] = color
+
+        # Lignes de la grille: une par colonne et par ligne de tuiles, pas une par tuile
+        if grid_needed:
+            left = self.pan_x + x0 * scaled_tile_size
+            top = self.pan_y + y0 * scaled_tile_size
+            right = self.pan_x + x1 * scaled_tile_size
+            bottom = self.pan_y + y1 * scaled_tile_size
+            lines = iter(self.grid_items)
+            for x in range(x0, x1 + 1):
                 screen_x = self.pan_x + x * scaled_tile_size
+                self.canvas.coords(next(lines), screen_x, top, screen_x, bottom)
+            for y in range(y0, y1 + 1):
                 screen_y = self.pan_y + y * scaled_tile_size
-
-                # Dessiner la tuile
+                self.canvas.coords(next(lines), left, screen_y, right, screen_y)
+
+        # Réafficher les éléments réutilisés et masquer le surplus
+        for item in self.tile_items[self.shown_items:needed]:
+            self.canvas.itemconfigure(item, state='normal')
+        for item in self.grid_items[self.shown_grid_items:grid_needed]:
+            self.canvas.itemconfigure(item, state='normal')
+        self.shown_items = max(self.shown_items, needed)
+        self.shown_grid_items = max(self.shown_grid_items, grid_needed)
+        self.hide_tiles(needed, grid_needed)
+
+        self.rendered_range = (x0, y0, x1, y1)
+        self.rendered_tile_size = scaled_tile_size
+
+    def hide_tiles(self, keep, grid_keep=0):
+        """Masque les rectangles de terrain au-delà des `keep` premiers et les lignes au-delà de `grid_keep`"""
+        for item in self.tile_items[keep:self.shown_items]:
+            self.canvas.itemconfigure(item, state='hidden')
+        self.shown_items = min(self.shown_items, keep)
+        for item in self.grid_items[grid_keep:self.shown_grid_items]:
+            self.canvas.itemconfigure(item, state='hidden')
+        self.shown_grid_items = min(self.shown_grid_items, grid_keep)
+
+    def layout_range(self):
+        """Place la surbrillance de la zone de déplacement sur ses tuiles"""
+        field = self.range_field
+        key = (field, field.version) if field else None
+        if key != self.range_key:
+            self.canvas.delete('range')
+            self.range_tiles = field.tiles() if field else []
+            self.range_items = [
                 self.canvas.create_rectangle(
-                    screen_x,
-                    screen_y,
-                    screen_x + scaled_tile_size,
-                    screen_y + scaled_tile_size,
-                    fill=color,
-                    outline='black',
-                    width=1
+                    0, 0, 0, 0, fill='#FFFF00', stipple='gray50', outline='', tags='range'
                 )
+                for _ in self.range_tiles
+            ]
+            self.range_key = key
+
+        scaled_tile_size = self.scaled_tile_size()
+        for item, (x, y) in zip(self.range_items, self.range_tiles):
+            screen_x = self.pan_x + x * scaled_tile_size
+            screen_y = self.pan_y + y * scaled_tile_size
+            self.canvas.coords(
+                item, screen_x, screen_y, screen_x + scaled_tile_size, screen_y + scaled_tile_size
+            )
 
-        # Mettre à jour le label de zoom
-        self.zoom_label.config(text=f"Zoom: {self.zoom_level:.2f}x")
+    def layout_hover(self):
+        """Place le rectangle de survol sur la tuile survolée (créé une seule fois)"""
+        if self.hover_item is None:
+            self.hover_item = self.canvas.create_rectangle(
+                0, 0, 0, 0, outline='white', width=2, state='hidden', tags='hover'
+            )
+        if self.hover_tile is None or not self.current_map:
+            self.canvas.itemconfigure(self.hover_item, state='hidden')
+            return
+
+        x, y = self.hover_tile
+        scaled_tile_size = self.scaled_tile_size()
+        screen_x = self.pan_x + x * scaled_tile_size
+        screen_y = self.pan_y + y * scaled_tile_size
+        self.canvas.coords(
+            self.hover_item, screen_x, screen_y, screen_x + scaled_tile_size, screen_y + scaled_tile_size
+        )
+        self.canvas.itemconfigure(self.hover_item, state='normal')
+        self.canvas.tag_raise(self.hover_item)
+
+    def update_hover(self, screen_x, screen_y):
+        """Met à jour la tuile survolée et la lecture d'état (temps constant)"""
+        tile = self.tile_at(screen_x, screen_y) if self.current_map else None
+        if tile == self.hover_tile:
+            return
+        self.hover_tile = tile
+        self.layout_hover()
+
+        if tile is None:
+            text = ""
+        else:
+            x, y = tile
+            text = f"Tuile ({x}, {y}): {self.current_map.terrain.get(x, y)}"
+            if self.range_field:
+                cost = self.range_field.cost_at(x, y)
+                if cost is not None:
+                    text += f" | Coût: {cost:g}"
+        self.status_label.config(text=text)
+
+    def on_mouse_move(self, event):
+        """Survol du canvas"""
+        self.update_hover(event.x, event.y)
+
+    def on_mouse_leave(self, event):
+        """La souris quitte le canvas"""
+        self.hover_tile = None
+        if self.hover_item is not None:
+            self.canvas.itemconfigure(self.hover_item, state='hidden')
+        self.status_label.config(text="")
+
+    def tile_at(self, screen_x, screen_y):
+        """Tuile (x, y) sous un point du canvas, ou None hors de la carte"""
+        scaled_tile_size = self.scaled_tile_size()
+        x = math.floor((screen_x - self.pan_x) / scaled_tile_size)
+        y = math.floor((screen_y - self.pan_y) / scaled_tile_size)
+        if 0 <= x < self.current_map.width and 0 <= y < self.current_map.height:
+            return x, y
+        return None
+
+    def on_right_click(self, event):
+        """Affiche la zone de déplacement depuis la tuile cliquée; la masque si on la resélectionne"""
+        if not self.current_map:
+            return
+        tile = self.tile_at(event.x, event.y)
+        if tile is None or (self.range_field and self.range_field.start == tile):
+            self.range_field = None
+        else:
+            self.range_field = self.ranges.field(tile, self.movement_points, self.movement_profile)
+        self.layout_range()
+        # La lecture d'état affiche le coût de déplacement
+        self.hover_tile = None
+        self.update_hover(event.x, event.y)
+
+    def pan_by(self, dx, dy):
+        """Déplace la vue; un simple `move` suffit tant que la marge couvre l'écran"""
+        self.pan_x += dx
+        self.pan_y += dy
+
+        if not self.current_map:
+            return
+
+        if self.rendered_range and self.rendered_tile_size == self.scaled_tile_size():
+            x0, y0, x1, y1 = self.visible_tile_range()
+            rx0, ry0, rx1, ry1 = self.rendered_range
+            if rx0 <= x0 and ry0 <= y0 and x1 <= rx1 and y1 <= ry1:
+                self.canvas.move('tile', dx, dy)
+                self.canvas.move('range', dx, dy)
+                self.canvas.move('hover', dx, dy)
+                return
+
+        self.draw_map()
+
+    def on_canvas_resize(self, event):
+        """Redessine quand le canvas change de taille"""
+        self.draw_map()
+
+    def schedule_refine(self):
+        """Programme la mise en page complète après une pause de la molette"""
+        self.cancel_refine()
+        self.refine_job = self.root.after(self.refine_delay_ms, self.refine_display)
+
+    def cancel_refine(self):
+        """Annule la mise en page différée en attente"""
+        if self.refine_job is not None:
+            self.root.after_cancel(self.refine_job)
+            self.refine_job = None
+
+    def refine_display(self):
+        """Mise en page finale, identique à un rendu direct"""
+        self.refine_job = None
+        self.draw_map()
 
     def on_mouse_press(self, event):
-        """Début du drag"""
+        """Début du drag, ou d'un trait de pinceau en mode édition"""
+        if self.edit_mode and self.current_map:
+            self.painting = True
+            self.editor.begin_stroke()
+            self.paint_at(event.x, event.y)
+        else:
+            self.start_pan(event)
+
+    def start_pan(self, event):
+        """Début du déplacement de la carte"""
         self.is_panning = True
         self.last_mouse_pos = (event.x, event.y)
 
     def on_mouse_drag(self, event):
-        """Déplacement avec la souris"""
-        if self.is_panning:
+        """Déplacement avec la souris (appliqué à la prochaine image)"""
+        if self.painting:
+            self.paint_at(event.x, event.y)
+        elif self.is_panning:
             dx = event.x - self.last_mouse_pos[0]
             dy = event.y - self.last_mouse_pos[1]
-            self.pan_x += dx
-            self.pan_y += dy
             self.last_mouse_pos = (event.x, event.y)
-            self.draw_map()
+            pending_dx, pending_dy = self.pending_pan
+            self.pending_pan = (pending_dx + dx, pending_dy + dy)
+            self.schedule_input()
 
     def on_mouse_release(self, event):
         """Fin du drag"""
         self.is_panning = False
+        if self.painting:
+            self.painting = False
+            self.editor.end_stroke()
+
+    def on_key(self, event):
+        """Touche E: mode édition; en édition, terrain, pinceau, annulation et enregistrement"""
+        if not self.current_map:
+            return
+        key = event.keysym.lower()
+        control = event.state & 0x4
+        editor = self.editor
+        if key == 'e' and not control:
+            self.on_mouse_release(event)
+            self.edit_mode = not self.edit_mode
+        elif not self.edit_mode:
+            return
+        elif control and key == 'z':
+            self.apply_terrain_changes(editor.undo())
+        elif control and key == 'y':
+            self.apply_terrain_changes(editor.redo())
+        elif control and key == 's':
+            self.save_map()
+        elif key.isdigit() and 1 <= int(key) <= len(wargame_terrain.TERRAIN_TYPES):
+            editor.brush_terrain = wargame_terrain.TERRAIN_TYPES[int(key) - 1]
+        elif key == 'bracketleft':
+            editor.brush_radius = max(editor.brush_radius - 1, 0)
+        elif key == 'bracketright':
+            editor.brush_radius = min(editor.brush_radius + 1, editor.max_brush_radius)
+        self.instructions.config(text=self.instructions_text())
+
+    def paint_at(self, screen_x, screen_y):
+        """Peint la tuile sous un point du canvas (et le chemin depuis le point précédent du trait)"""
+        tile = self.tile_at(screen_x, screen_y)
+        if tile is not None:
+            self.apply_terrain_changes(self.editor.paint(*tile))
+
+    def apply_terrain_changes(self, tiles):
+        """Répercute un changement de terrain sur les seuls éléments des tuiles modifiées"""
+        if not tiles:
+            return
+        terrain = self.current_map.terrain
+        if len(self.tile_colors) != len(terrain.palette):
+            # Terrain ajouté à la palette par l'édition
+            self.tile_colors = terrain.color_table(self.terrain_colors, '#FFFFFF')
+        for y in {y for _, y in tiles}:
+            self.row_runs.pop(y, None)
+
+        if self.rendered_range:
+            x0, y0, x1, y1 = self.rendered_range
+            scaled_tile_size = self.scaled_tile_size()
+            for x, y in tiles:
+                if not (x0 <= x < x1 and y0 <= y < y1):
+                    continue
+                color = self.tile_colors[terrain.get_id(x, y)]
+                item = self.patch_items.get((x, y))
+                if item is not None:
+                    self.canvas.itemconfigure(item, fill=color)
+                    continue
+                screen_x = self.pan_x + x * scaled_tile_size
+                screen_y = self.pan_y + y * scaled_tile_size
+                item = self.canvas.create_rectangle(
+                    screen_x, screen_y, screen_x + scaled_tile_size, screen_y + scaled_tile_size,
+                    fill=color, outline='', tags=('tile', 'patch')
+                )
+                # Au-dessus des blocs de terrain, sous la grille et les surcouches
+                self.canvas.tag_lower(item, 'grid')
+                self.patch_items[(x, y)] = item
+
+        # Zones de déplacement réparées autour des tuiles modifiées
+        self.ranges.update_tiles(tiles)
+        self.layout_range()
+
+        if self.hover_tile in tiles:
+            x, y = self.hover_tile
+            self.status_label.config(text=f"Tuile ({x}, {y}): {terrain.get(x, y)}")
+
+    def save_map(self):
+        """Enregistre le terrain modifié dans le fichier de la carte"""
+        try:
+            map_path = self.editor.save()
+        except (OSError, ValueError) as e:
+            print(f"Erreur lors de l'enregistrement de la map: {e}")
+            return
+        print(f"Map '{self.current_map.name}' enregistrée dans {map_path}")
+
+        # Miniature et libellés du catalogue à jour
+        self.catalog.refresh()
+        self.show_preview(map_path.stem)
 
     def on_mouse_wheel(self, event):
-        """Gestion du zoom avec la molette"""
+        """Gestion du zoom avec la molette (crans cumulés jusqu'à la prochaine image)"""
         if not self.current_map:
             return
 
-        # Position de la souris
-        mouse_x = event.x
-        mouse_y = event.y
+        # Zoom en fonction de la direction, vers la dernière position de la souris
+        self.pending_zoom_steps += 1 if event.delta > 0 else -1
+        self.zoom_anchor = (event.x, event.y)
+        self.schedule_input()
 
-        # Zoom en fonction de la direction
+    def schedule_input(self):
+        """Programme l'application des entrées en attente: dès que Tk est libre, au plus une fois par image"""
+        if self.input_job is not None:
+            return
+        delay_ms = self.frame_ms - (time.perf_counter() - self.last_input_flush) * 1000
+        if delay_ms <= 0:
+            self.input_job = self.root.after_idle(self.flush_input)
+        else:
+            self.input_job = self.root.after(int(math.ceil(delay_ms)), self.flush_input)
+
+    def flush_input(self):
+        """Applique en une fois le déplacement et les crans de molette accumulés"""
+        self.input_job = None
+        self.last_input_flush = time.perf_counter()
+
+        dx, dy = self.pending_pan
+        self.pending_pan = (0, 0)
+        if dx or dy:
+            self.pan_by(dx, dy)
+
+        steps = self.pending_zoom_steps
+        self.pending_zoom_steps = 0
+        if steps and self.current_map:
+            self.zoom_at(*self.zoom_anchor, steps)
+
+    def zoom_at(self, mouse_x, mouse_y, steps):
+        """Zoome de `steps` crans (négatif: dézoom) en gardant fixe le point sous la souris"""
         old_zoom = self.zoom_level
-
-        if event.delta > 0:  # Zoom in
-            self.zoom_level = min(self.zoom_level * 1.1, self.max_zoom)
-        else:  # Zoom out
-            self.zoom_level = max(self.zoom_level / 1.1, self.min_zoom)
+        self.zoom_level = min(max(self.zoom_level * 1.1 ** steps, self.min_zoom), self.max_zoom)
+        if self.zoom_level == old_zoom:
+            return
 
         # Ajuster le pan pour zoomer vers la position de la souris
         zoom_ratio = self.zoom_level / old_zoom
         self.pan_x = mouse_x - (mouse_x - self.pan_x) * zoom_ratio
         self.pan_y = mouse_y - (mouse_y - self.pan_y) * zoom_ratio
 
-        # Redessiner
-        self.draw_map()
+        # Redessiner: aperçu par simple mise à l'échelle des tuiles existantes
+        if self.progressive_zoom and self.rendered_range:
+            self.canvas.scale('tile', mouse_x, mouse_y, zoom_ratio, zoom_ratio)
+            self.canvas.scale('range', mouse_x, mouse_y, zoom_ratio, zoom_ratio)
+            self.canvas.scale('hover', mouse_x, mouse_y, zoom_ratio, zoom_ratio)
+            self.zoom_label.config(text=f"Zoom: {self.zoom_level:.2f}x")
+            self.schedule_refine()
+        else:
+            self.draw_map()
+
+    def enable_profiling(self, profiler):
+        """Mesure le rendu de la carte et affiche le résumé en haut du canvas"""
+        self.profiler = profiler
+        profiler.instrument(self, ('draw_map', 'pan_by'), ('draw_map', 'pan_by'))
+        profiler.on_frame = self.show_profile
+
+    def show_profile(self):
+        """Met à jour le texte du résumé de profilage, au-dessus des tuiles"""
+        text = "\n".join(self.profiler.summary())
+        if self.profile_item is None:
+            self.profile_item = self.canvas.create_text(
+                10, 10, text=text, anchor='nw', fill='white',
+                font=('Courier', 9), tags='profile'
+            )
+        else:
+            self.canvas.itemconfigure(self.profile_item, text=text)
+        self.canvas.tag_raise('profile')
 
     def run(self):
         """Lance l'application"""
         self.root.mainloop()
+        self.loader.shutdown()
+        if self.profiler is not None:
+            self.profiler.close()
+        for editor in self.editors.values():
+            if editor.has_unsaved_changes():
+                print(f"Modifications non enregistrées de la map '{editor.map.name}' perdues")
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Visualiseur de cartes de wargame (Tkinter)")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
     viewer = WargameViewer()
+    profiler = profiler_from_args(args)
+    if profiler is not None:
+        viewer.enable_profiling(profiler)
     viewer.run()
 
 
@@ -0,0 +1,165 @@
+"""Couche d'unités: stockage compact et index spatial
+
+Les unités sont rangées dans des tableaux parallèles (position, camp, type),
+indexés par identifiant; les identifiants des unités retirées sont
+réutilisés. Un hachage spatial par blocs de tuiles répond aux requêtes
+rectangulaires et de portée sans parcourir toutes les unités.
+"""
+from array import array
+
+from wargame_hex import offset_distance
+
+UNIT_KINDS = ('infantry', 'cavalry')
+
+# Points de mouvement et portée de vue par type d'unité
+UNIT_MOVEMENT = {'infantry': 6, 'cavalry': 10}
+UNIT_SIGHT = {'infantry': 5, 'cavalry': 7}
+
+
+class SpatialHash:
+    """Identifiants regroupés par bloc de `cell_size` x `cell_size` tuiles"""
+
+    def __init__(self, cell_size=16):
+        self.cell_size = cell_size
+        self.cells = {}  # (bx, by) -> ensemble d'identifiants
+
+    def cell(self, x, y):
+        """Bloc contenant la tuile (x, y)"""
+        return x // self.cell_size, y // self.cell_size
+
+    def insert(self, uid, x, y):
+        """Ajoute une unité au bloc de sa tuile"""
+        self.cells.setdefault(self.cell(x, y), set()).add(uid)
+
+    def remove(self, uid, x, y):
+        """Retire une unité du bloc de sa tuile"""
+        key = self.cell(x, y)
+        members = self.cells[key]
+        members.discard(uid)
+        if not members:
+            del self.cells[key]
+
+    def move(self, uid, old_x, old_y, x, y):
+        """Change une unité de bloc si nécessaire"""
+        if self.cell(old_x, old_y) != self.cell(x, y):
+            self.remove(uid, old_x, old_y)
+            self.insert(uid, x, y)
+
+    def candidates(self, x0, y0, x1, y1):
+        """Identifiants des blocs recouvrant un rectangle de tuiles (bornes exclusives)"""
+        if x1 <= x0 or y1 <= y0:
+            return
+        bx0, by0 = self.cell(x0, y0)
+        bx1, by1 = self.cell(x1 - 1, y1 - 1)
+        cells = self.cells
+        for by in range(by0, by1 + 1):
+            for bx in range(bx0, bx1 + 1):
+                members = cells.get((bx, by))
+                if members:
+                    yield from members
+
+
+class UnitLayer:
+    """Unités placées sur une carte, avec requêtes spatiales"""
+
+    def __init__(self, wargame_map, cell_size=16):
+        self.width = wargame_map.width
+        self.height = wargame_map.height
+        self.grid = wargame_map.grid
+        self.xs = array('i')
+        self.ys = array('i')
+        self.sides = array('B')
+        self.kinds = array('B')  # Index dans UNIT_KINDS
+        self.alive = bytearray()
+        self.free_ids = []
+        self.count = 0
+        self.index = SpatialHash(cell_size)
+
+    def add(self, x, y, side=0, kind='infantry'):
+        """Place une unité; retourne son identifiant"""
+        self.check_tile(x, y)
+        kind_id = UNIT_KINDS.index(kind)
+        if self.free_ids:
+            uid = self.free_ids.pop()
+            self.xs[uid] = x
+            self.ys[uid] = y
+            self.sides[uid] = side
+            self.kinds[uid] = kind_id
+            self.alive[uid] = 1
+        else:
+            uid = len(self.alive)
+            self.xs.append(x)
+            self.ys.append(y)
+            self.sides.append(side)
+            self.kinds.append(kind_id)
+            self.alive.append(1)
+        self.index.insert(uid, x, y)
+        self.count += 1
+        return uid
+
+    def remove(self, uid):
+        """Retire une unité; son identifiant pourra être réutilisé"""
+        self.check_unit(uid)
+        self.index.remove(uid, self.xs[uid], self.ys[uid])
+        self.alive[uid] = 0
+        self.free_ids.append(uid)
+        self.count -= 1
+
+    def move(self, uid, x, y):
+        """Déplace une unité; retourne son ancienne position"""
+        self.check_unit(uid)
+        self.check_tile(x, y)
+        old_x, old_y = self.xs[uid], self.ys[uid]
+        self.index.move(uid, old_x, old_y, x, y)
+        self.xs[uid] = x
+        self.ys[uid] = y
+        return old_x, old_y
+
+    def position(self, uid):
+        """Tuile (x, y) d'une unité"""
+        return self.xs[uid], self.ys[uid]
+
+    def side(self, uid):
+        """Camp d'une unité"""
+        return self.sides[uid]
+
+    def kind(self, uid):
+        """Type d'une unité (voir UNIT_KINDS)"""
+        return UNIT_KINDS[self.kinds[uid]]
+
+    def check_unit(self, uid):
+        """Vérifie qu'un identifiant désigne une unité présente"""
+        if not (0 <= uid < len(self.alive) and self.alive[uid]):
+            raise KeyError(f"Unité inconnue: {uid}")
+
+    def check_tile(self, x, y):
+        """Vérifie qu'une tuile est dans la carte"""
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise ValueError(f"Tuile ({x}, {y}) hors de la carte")
+
+    def units_in_rect(self, x0, y0, x1, y1):
+        """Unités dans un rectangle de tuiles (bornes exclusives)"""
+        xs, ys = self.xs, self.ys
+        return [
+            uid for uid in self.index.candidates(x0, y0, x1, y1)
+            if x0 <= xs[uid] < x1 and y0 <= ys[uid] < y1
+        ]
+
+    def units_at(self, x, y):
+        """Unités sur la tuile (x, y), par identifiant croissant"""
+        return sorted(self.units_in_rect(x, y, x + 1, y + 1))
+
+    def units_in_range(self, x, y, radius):
+        """Unités à au plus `radius` tuiles de (x, y): distance hexagonale, ou euclidienne"""
+        candidates = self.units_in_rect(x - radius, y - radius, x + radius + 1, y + radius + 1)
+        xs, ys = self.xs, self.ys
+        if self.grid == 'hex':
+            return [uid for uid in candidates if offset_distance(x, y, xs[uid], ys[uid]) <= radius]
+        return [uid for uid in candidates if (xs[uid] - x) ** 2 + (ys[uid] - y) ** 2 <= radius * radius]
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        alive = self.alive
+        return (uid for uid in range(len(alive)) if alive[uid])
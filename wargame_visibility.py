@@ -0,0 +1,324 @@
+"""Ligne de vue et brouillard de guerre
+
+Le champ de vision d'un observateur est calculé par projection d'ombres
+angulaires (shadowcasting): les tuiles sont parcourues par distance
+croissante depuis l'observateur, chaque tuile bloquante (montagne, forêt)
+projette derrière elle l'intervalle d'angles qu'elle couvre, et une tuile
+n'est visible que si son centre n'est pas dans l'ombre. Une tuile bloquante
+est visible dès qu'une partie de son contour l'est, pour que les murs restent
+éclairés. Le même parcours sert aux grilles carrées et hexagonales: seules
+la forme des tuiles et la table de parcours changent.
+
+Chaque camp a un masque de brouillard (tuile inexplorée, explorée ou
+visible) tenu à jour par compteurs: déplacer une unité ne touche que les
+tuiles de son ancien et de son nouveau champ de vision.
+"""
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+
+from wargame_hex import HexLayout, offset_distance
+from wargame_units import SpatialHash
+
+BLOCKING_TERRAIN = ('mountain', 'forest')
+DEFAULT_SIGHT = 6  # Portée de vue par défaut, en tuiles
+
+# États d'une tuile dans un masque de brouillard
+FOG_UNEXPLORED = 0
+FOG_EXPLORED = 1
+FOG_VISIBLE = 2
+
+TWO_PI = 2 * math.pi
+EPSILON = 1e-9
+
+
+def angle_pieces(center, corners):
+    """Intervalle d'angles couvert par une tuile, découpé pour rester dans [0, 2π)"""
+    deltas = [
+        (math.atan2(cy, cx) - center + math.pi) % TWO_PI - math.pi
+        for cx, cy in corners
+    ]
+    low = center + min(deltas)
+    high = center + max(deltas)
+    if low < 0:
+        return ((low + TWO_PI, TWO_PI), (0.0, high))
+    if high > TWO_PI:
+        return ((low, TWO_PI), (0.0, high - TWO_PI))
+    return ((low, high),)
+
+
+@lru_cache(maxsize=64)
+def sight_table(grid, radius, odd_row=False):
+    """Tuiles à portée de vue, par distance croissante: (dx, dy, angle du centre, intervalles)
+
+    Sur une grille hexagonale « odd-r », les décalages dépendent de la parité
+    de la ligne de l'observateur.
+    """
+    entries = []
+    if grid == 'hex':
+        layout = HexLayout(1)
+        row = 1 if odd_row else 0
+        origin_x, origin_y = layout.center(0, row)
+        for dy in range(-radius, radius + 1):
+            for dx in range(-radius - 1, radius + 2):
+                distance = offset_distance(0, row, dx, row + dy)
+                if distance == 0 or distance > radius:
+                    continue
+                x, y = layout.center(dx, row + dy)
+                x -= origin_x
+                y -= origin_y
+                corners = [(x + cx, y + cy) for cx, cy in layout.corners]
+                entries.append((x * x + y * y, dx, dy, x, y, corners))
+    else:
+        limit = (radius + 0.5) ** 2
+        for dy in range(-radius, radius + 1):
+            for dx in range(-radius, radius + 1):
+                distance = dx * dx + dy * dy
+                if distance == 0 or distance > limit:
+                    continue
+                corners = [(dx + cx, dy + cy) for cx in (-0.5, 0.5) for cy in (-0.5, 0.5)]
+                entries.append((distance, dx, dy, dx, dy, corners))
+
+    entries.sort(key=lambda entry: entry[0])
+    table = []
+    for _, dx, dy, x, y, corners in entries:
+        center = math.atan2(y, x) % TWO_PI
+        if center >= TWO_PI - EPSILON:
+            center = 0.0
+        table.append((dx, dy, center, angle_pieces(center, corners)))
+    return tuple(table)
+
+
+class ShadowLine:
+    """Ombres projetées autour d'un observateur: intervalles d'angles disjoints et triés"""
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+    def is_shadowed(self, angle):
+        """Vrai si la direction `angle` est strictement dans une ombre"""
+        k = bisect_right(self.starts, angle) - 1
+        if k >= 0 and self.starts[k] < angle < self.ends[k]:
+            return True
+        # La direction 0 est aussi 2π: dans l'ombre si les ombres se rejoignent de part et d'autre
+        return angle == 0 and bool(self.starts) and self.starts[0] <= EPSILON < self.ends[0] \
+            and self.ends[-1] >= TWO_PI - EPSILON
+
+    def is_covered(self, low, high):
+        """Vrai si tout l'intervalle [low, high] est dans l'ombre"""
+        k = bisect_right(self.starts, low + EPSILON) - 1
+        return k >= 0 and self.ends[k] >= high - EPSILON
+
+    def add(self, low, high):
+        """Ajoute une ombre, fusionnée avec celles qu'elle touche"""
+        i = bisect_left(self.ends, low - EPSILON)
+        j = bisect_right(self.starts, high + EPSILON)
+        if i < j:
+            low = min(low, self.starts[i])
+            high = max(high, self.ends[j - 1])
+        self.starts[i:j] = [low]
+        self.ends[i:j] = [high]
+
+    def is_full(self):
+        """Vrai si l'ombre fait le tour complet de l'observateur"""
+        return len(self.starts) == 1 and self.starts[0] <= EPSILON and self.ends[0] >= TWO_PI - EPSILON
+
+
+def field_of_view(blocks, width, height, grid, x, y, radius):
+    """Index des tuiles visibles depuis (x, y); `blocks[i]` est non nul pour une tuile bloquante"""
+    table = sight_table(grid, radius, grid == 'hex' and bool(y & 1))
+    shadows = ShadowLine()
+    visible = [y * width + x]
+
+    for dx, dy, center, pieces in table:
+        tx = x + dx
+        ty = y + dy
+        if not (0 <= tx < width and 0 <= ty < height):
+            continue
+        i = ty * width + tx
+        if blocks[i]:
+            if not all(shadows.is_covered(low, high) for low, high in pieces):
+                visible.append(i)
+                for low, high in pieces:
+                    shadows.add(low, high)
+                if shadows.is_full():
+                    break
+        elif not shadows.is_shadowed(center):
+            visible.append(i)
+    return visible
+
+
+class FogMask:
+    """Brouillard de guerre d'un camp: nombre d'observateurs par tuile et état de chaque tuile"""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.counts = array('H', bytes(2 * width * height))
+        self.states = bytearray(width * height)  # FOG_UNEXPLORED, FOG_EXPLORED ou FOG_VISIBLE
+        self.version = 0
+
+    def add(self, indices):
+        """Un observateur voit désormais ces tuiles"""
+        counts = self.counts
+        states = self.states
+        for i in indices:
+            counts[i] += 1
+            states[i] = FOG_VISIBLE
+        self.version += 1
+
+    def remove(self, indices):
+        """Un observateur ne voit plus ces tuiles (elles restent explorées)"""
+        counts = self.counts
+        states = self.states
+        for i in indices:
+            counts[i] -= 1
+            if not counts[i]:
+                states[i] = FOG_EXPLORED
+        self.version += 1
+
+    def state(self, x, y):
+        """État de la tuile (x, y)"""
+        return self.states[y * self.width + x]
+
+    def region(self, x0, y0, x1, y1):
+        """États d'un rectangle de tuiles, ligne par ligne (bornes exclusives)"""
+        if x0 == 0 and x1 == self.width:
+            return bytes(self.states[y0 * self.width:y1 * self.width])
+        return b''.join(
+            self.states[y * self.width + x0:y * self.width + x1] for y in range(y0, y1)
+        )
+
+
+class Visibility:
+    """Champs de vision des observateurs d'une carte et brouillard de chaque camp
+
+    Un observateur n'est recalculé que s'il bouge, si sa portée change ou si
+    le terrain change à sa portée. Les observateurs sont indexés par position
+    dans un hachage spatial: trouver ceux qu'un changement de terrain concerne
+    ne parcourt que les blocs voisins, pas tous les observateurs.
+    """
+
+    def __init__(self, wargame_map, blocking=BLOCKING_TERRAIN, cell_size=16):
+        self.terrain = wargame_map.terrain
+        self.width = wargame_map.width
+        self.height = wargame_map.height
+        self.grid = wargame_map.grid
+        self.blocking = set(blocking)
+        self.blocks = b''
+        self.refresh()
+        self.observers = {}  # identifiant -> (camp, x, y, portée, tuiles visibles)
+        self.index = SpatialHash(cell_size)  # Observateurs par position
+        self.radius_counts = {}  # Portée -> nombre d'observateurs
+        self.fogs = {}  # camp -> FogMask
+
+    def refresh(self):
+        """Recalcule les tuiles bloquantes de toute la carte"""
+        table = bytearray(256)
+        for terrain_id, name in enumerate(self.terrain.palette):
+            table[terrain_id] = name in self.blocking
+        self.blocks = bytearray(bytes(self.terrain.cells).translate(table))
+
+    def fog(self, side):
+        """Masque de brouillard d'un camp (créé vide au premier accès)"""
+        fog = self.fogs.get(side)
+        if fog is None:
+            fog = FogMask(self.width, self.height)
+            self.fogs[side] = fog
+        return fog
+
+    def set_observer(self, observer_id, side, x, y, radius=DEFAULT_SIGHT):
+        """Place ou déplace un observateur; son champ n'est recalculé que s'il a changé"""
+        previous = self.observers.get(observer_id)
+        if previous is not None:
+            if previous[:4] == (side, x, y, radius):
+                return previous[4]
+            self.fog(previous[0]).remove(previous[4])
+            self.index.move(observer_id, previous[1], previous[2], x, y)
+            self.count_radius(previous[3], -1)
+        else:
+            self.index.insert(observer_id, x, y)
+        self.count_radius(radius, 1)
+
+        visible = field_of_view(self.blocks, self.width, self.height, self.grid, x, y, radius)
+        self.observers[observer_id] = (side, x, y, radius, visible)
+        self.fog(side).add(visible)
+        return visible
+
+    def remove_observer(self, observer_id):
+        """Retire un observateur (ses tuiles restent explorées)"""
+        previous = self.observers.pop(observer_id, None)
+        if previous is not None:
+            self.fog(previous[0]).remove(previous[4])
+            self.index.remove(observer_id, previous[1], previous[2])
+            self.count_radius(previous[3], -1)
+
+    def count_radius(self, radius, delta):
+        """Tient à jour le nombre d'observateurs de chaque portée"""
+        count = self.radius_counts.get(radius, 0) + delta
+        if count:
+            self.radius_counts[radius] = count
+        else:
+            del self.radius_counts[radius]
+
+    def observer_at(self, x, y):
+        """Identifiant d'un observateur placé sur la tuile (x, y), ou None"""
+        for observer_id in self.index.candidates(x, y, x + 1, y + 1):
+            _, ox, oy, _, _ = self.observers[observer_id]
+            if (ox, oy) == (x, y):
+                return observer_id
+        return None
+
+    def observers_near(self, tiles):
+        """Observateurs dont la portée de vue couvre au moins une des tuiles (x, y)"""
+        if not self.radius_counts:
+            return []
+        # Le rectangle autour de chaque tuile couvre la plus grande portée
+        # (plus une tuile pour les décalages des lignes hexagonales)
+        reach = max(self.radius_counts) + 1
+        candidates = set()
+        for x, y in tiles:
+            candidates.update(self.index.candidates(x - reach, y - reach, x + reach + 1, y + reach + 1))
+
+        found = []
+        for observer_id in candidates:
+            _, ox, oy, radius, _ = self.observers[observer_id]
+            if any(self.in_range(ox, oy, x, y, radius) for x, y in tiles):
+                found.append(observer_id)
+        return found
+
+    def update_tiles(self, tiles):
+        """Prend en compte un changement de terrain; ne recalcule que les observateurs à portée
+
+        Retourne le nombre d'observateurs recalculés.
+        """
+        tiles = list(tiles)
+        palette = self.terrain.palette
+        changed = []
+        for x, y in tiles:
+            i = y * self.width + x
+            blocks = palette[self.terrain.cells[i]] in self.blocking
+            if bool(self.blocks[i]) != blocks:
+                self.blocks[i] = blocks
+                changed.append((x, y))
+        if not changed:
+            return 0
+
+        recomputed = 0
+        for observer_id in self.observers_near(changed):
+            side, ox, oy, radius, visible = self.observers[observer_id]
+            fog = self.fog(side)
+            fog.remove(visible)
+            visible = field_of_view(self.blocks, self.width, self.height, self.grid, ox, oy, radius)
+            fog.add(visible)
+            self.observers[observer_id] = (side, ox, oy, radius, visible)
+            recomputed += 1
+        return recomputed
+
+    def in_range(self, ox, oy, x, y, radius):
+        """Vrai si la tuile (x, y) est à portée de vue d'un observateur en (ox, oy)"""
+        if self.grid == 'hex':
+            return offset_distance(ox, oy, x, y) <= radius
+        return (x - ox) ** 2 + (y - oy) ** 2 <= (radius + 0.5) ** 2